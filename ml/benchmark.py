@@ -0,0 +1,269 @@
+"""
+Inference benchmark for ml/predict.py and the ml-api FastAPI app.
+
+Runs fully offline (the API is driven in-process through a TestClient,
+httpx required) and measures:
+  cli  - one-shot `predict.py '<json>'` wall time, import time, model load
+         time, peak RSS, and round-trip latency of the --worker mode
+  api  - import time, model load / warm-up time, single-row /predict
+         p50/p99, /predict_batch throughput per batch size, peak RSS
+
+Each target runs in its own child process so import time and peak RSS are
+its own. Results are JSON, so runs can be diffed across commits:
+
+    python benchmark.py --output bench.json
+    python benchmark.py --compare bench.json --tolerance 0.25
+
+With --compare the script exits 1 if any latency / time / memory figure
+got worse (or any throughput dropped) by more than the tolerance.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(BASE_DIR, "ml-api")
+PREDICT_PY = os.path.join(BASE_DIR, "predict.py")
+
+BATCH_SIZES = [1, 8, 64, 512]
+
+
+def sample_readings(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "maternal_hr": int(rng.integers(55, 130)),
+            "systolic_bp": int(rng.integers(90, 180)),
+            "diastolic_bp": int(rng.integers(50, 120)),
+            "fetal_hr": int(rng.integers(100, 180)),
+            "spo2": int(rng.integers(88, 100)),
+            "temperature": round(float(rng.uniform(36.0, 39.5)), 1),
+            "age": int(rng.integers(16, 45)),
+            "bs": round(float(rng.uniform(6.0, 15.0)), 1),
+        }
+        for _ in range(n)
+    ]
+
+
+def percentiles(samples_s):
+    ms = np.array(samples_s) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# -----------------------------
+# Child processes
+# -----------------------------
+def child_cli_load():
+    t0 = time.perf_counter()
+    import joblib  # noqa: F401
+    t1 = time.perf_counter()
+    sys.path.insert(0, BASE_DIR)
+    import predict  # noqa: F401  (loads all models at import)
+    t2 = time.perf_counter()
+    return {
+        "import_ms": round((t1 - t0) * 1000, 1),
+        "load_ms": round((t2 - t1) * 1000, 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def child_api(runs):
+    os.environ.setdefault("PREDICTION_CACHE_SIZE", "0")  # measure scoring, not the cache
+    os.environ.setdefault("MODEL_POLL_SECONDS", "3600")
+
+    t0 = time.perf_counter()
+    sys.path.insert(0, API_DIR)
+    import main
+    from fastapi.testclient import TestClient
+    import_ms = (time.perf_counter() - t0) * 1000
+
+    out = {"import_ms": round(import_ms, 1)}
+    with TestClient(main.app) as client:
+        while client.get("/ready").status_code != 200:
+            if main.startup["state"] == "failed":
+                raise RuntimeError(main.startup["error"])
+            time.sleep(0.01)
+        ready = client.get("/ready").json()
+        out["load_ms"] = round(ready["load_seconds"] * 1000, 1)
+        out["warmup_ms"] = round(ready["warmup_seconds"] * 1000, 1)
+
+        rows = sample_readings(runs)
+        lat = []
+        for row in rows:
+            t = time.perf_counter()
+            client.post("/predict", json=row).raise_for_status()
+            lat.append(time.perf_counter() - t)
+        out.update({f"single_{k}": v for k, v in percentiles(lat).items()})
+
+        out["batch"] = {}
+        for size in BATCH_SIZES:
+            payload = {"readings": sample_readings(size, seed=size)}
+            reps = max(3, min(50, 2000 // size))
+            t = time.perf_counter()
+            for _ in range(reps):
+                client.post("/predict_batch", json=payload).raise_for_status()
+            per_call = (time.perf_counter() - t) / reps
+            out["batch"][str(size)] = {
+                "call_ms": round(per_call * 1000, 3),
+                "rows_per_s": round(size / per_call, 1),
+            }
+
+    out["peak_rss_mb"] = peak_rss_mb()
+    return out
+
+
+def run_child(kind, runs):
+    proc = subprocess.run(
+        [sys.executable, __file__, "--child", kind, "--runs", str(runs)],
+        capture_output=True, text=True, cwd=BASE_DIR,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{kind} benchmark failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# -----------------------------
+# Parent-side measurements
+# -----------------------------
+def bench_cli(runs):
+    row = json.dumps(sample_readings(1)[0])
+    lat = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        subprocess.run([sys.executable, PREDICT_PY, row], capture_output=True, check=True)
+        lat.append(time.perf_counter() - t)
+    out = {f"oneshot_{k}": v for k, v in percentiles(lat).items()}
+    out.update(run_child("cli-load", runs))
+
+    proc = subprocess.Popen(
+        [sys.executable, PREDICT_PY, "--worker"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        text=True, bufsize=1,
+    )
+    try:
+        lat = []
+        for reading in sample_readings(max(runs, 50)):
+            t = time.perf_counter()
+            proc.stdin.write(json.dumps(reading) + "\n")
+            proc.stdin.flush()
+            proc.stdout.readline()
+            lat.append(time.perf_counter() - t)
+        # First call includes the worker's own model load
+        out.update({f"worker_{k}": v for k, v in percentiles(lat[1:]).items()})
+    finally:
+        proc.stdin.close()
+        proc.wait()
+    return out
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(d, prefix=""):
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(flatten(v, key + "."))
+        elif isinstance(v, (int, float)):
+            out[key] = v
+    return out
+
+
+def compare(current, baseline, tolerance):
+    """List of (metric, baseline, current, change) that regressed."""
+    cur, base = flatten(current["results"]), flatten(baseline["results"])
+    regressions = []
+    for key in sorted(set(cur) & set(base)):
+        old, new = base[key], cur[key]
+        if not old:
+            continue
+        change = (new - old) / old
+        higher_is_better = key.endswith("rows_per_s")
+        worse = change < -tolerance / (1 + tolerance) if higher_is_better else change > tolerance
+        print(f"{key:40s} {old:12.3f} -> {new:12.3f} ({change:+.1%}){'  REGRESSION' if worse else ''}")
+        if worse:
+            regressions.append((key, old, new, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark predict.py and ml-api")
+    parser.add_argument("--runs", type=int, default=20, help="single-row samples per target")
+    parser.add_argument("--only", choices=["cli", "api"], default=None)
+    parser.add_argument("--output", default=None, help="write results JSON here")
+    parser.add_argument("--compare", default=None, help="baseline JSON to check against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative slowdown before --compare fails")
+    parser.add_argument("--child", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == "cli-load":
+        print(json.dumps(child_cli_load()))
+        return
+    if args.child == "api":
+        print(json.dumps(child_api(args.runs)))
+        return
+
+    results = {}
+    if args.only in (None, "cli"):
+        print("[INFO] Benchmarking predict.py ...")
+        results["cli"] = bench_cli(args.runs)
+    if args.only in (None, "api"):
+        print("[INFO] Benchmarking ml-api (in-process) ...")
+        results["api"] = run_child("api", max(args.runs, 200))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[INFO] Saved results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"[ERROR] {len(regressions)} metric(s) regressed beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        print("[INFO] No regressions")
+
+
+if __name__ == "__main__":
+    main()
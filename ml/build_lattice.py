@@ -0,0 +1,189 @@
+"""
+Precompute the RF + logistic ML score over a dense lattice of inputs.
+
+    python build_lattice.py
+    python build_lattice.py --axis temperature=35:40:0.1 --dtype uint8
+
+ml-api inputs are mostly integers (age, BP, heart rate) plus a one-decimal
+temperature and a coarse blood sugar, so the ML half of the fusion
+    (P_rf(mid or high) + P_lr(mid or high)) / 2
+only ever sees a bounded lattice of the 6 LR features. Every point of that
+lattice is scored once, offline, and stored as one flat C-order array
+(float16, or uint8 codes of score * 255) that ml-api memory-maps and reads
+by index (LATTICE_MODE=1, inference.LatticeRiskModel). Requests off the
+lattice fall back to the regular models. The heuristic half stays exact:
+it is a few vectorized rules and the source of the "reason" text.
+
+Output (ml/models/):
+    maternal_risk_lattice/        values + axis_lo / axis_step / axis_size
+    maternal_risk_lattice.json    teacher hashes, axes, build time, size, exactness, latency
+
+Exactness is measured over every lattice point against the unquantized
+score: max ML score error, and how often the fused risk_score / risk_level
+(ml-api default fetal_hr / spo2) come out identical.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import model_registry
+import risk_rules
+from distill import FEATURES, dir_bytes, latency_ms, teacher_ml_scores
+from inference import LATTICE_MODEL_DIR, LatticeRiskModel, load_models, save_arrays
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+REPORT_FILE = LATTICE_MODEL_DIR + ".json"
+
+# feature -> (lo, hi, step), hi inclusive. Chosen so ml-api's defaults
+# (25, 120/80, bs 90, 36.8, HR 90) and the common clinical ranges are on the
+# lattice: ~20M points, ~40 MB as float16.
+DEFAULT_AXES = {
+    "age": (15, 49, 1),
+    "systolic_bp": (90, 180, 5),
+    "diastolic_bp": (50, 120, 5),
+    "bs": (70, 210, 20),
+    "temperature": (36.0, 39.0, 0.1),
+    "maternal_hr": (60, 130, 10),
+}
+# Heuristic-only inputs for the fused exactness figures (ml-api defaults)
+RULE_ONLY_DEFAULTS = {"fetal_hr": 140.0, "spo2": 98.0}
+DTYPES = {"float16": (np.float16, 1.0), "uint8": (np.uint8, 1 / 255)}
+
+
+def parse_axis(spec):
+    """"temperature=36:39:0.1" -> ("temperature", (36.0, 39.0, 0.1))."""
+    name, _, bounds = spec.partition("=")
+    if name not in DEFAULT_AXES:
+        raise argparse.ArgumentTypeError(f"unknown axis {name!r}, expected one of {FEATURES}")
+    try:
+        lo, hi, step = (float(v) for v in bounds.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected {name}=lo:hi:step, got {spec!r}")
+    if step <= 0 or hi < lo:
+        raise argparse.ArgumentTypeError(f"empty axis {spec!r}")
+    return name, (lo, hi, step)
+
+
+def axis_arrays(axes):
+    lo = np.array([axes[f][0] for f in FEATURES], dtype=float)
+    step = np.array([axes[f][2] for f in FEATURES], dtype=float)
+    hi = np.array([axes[f][1] for f in FEATURES], dtype=float)
+    size = np.floor((hi - lo) / step + 1e-9).astype(np.int64) + 1
+    return lo, step, size
+
+
+def lattice_points(lo, step, size, start, stop):
+    """Raw feature rows for flat (C-order) lattice indices start..stop."""
+    idx = np.column_stack(np.unravel_index(np.arange(start, stop), size))
+    # Rounded so 36.0 + 8 * 0.1 is the same double a client's 36.8 parses to
+    return np.round(lo + idx * step, 10)
+
+
+def quantize(scores, dtype, scale):
+    if dtype == np.uint8:
+        return np.rint(np.clip(scores, 0.0, 1.0) / scale).astype(np.uint8)
+    return scores.astype(dtype)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the ML score lattice")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--axis", type=parse_axis, action="append", default=[],
+                        metavar="NAME=LO:HI:STEP", help="override one axis (repeatable)")
+    parser.add_argument("--dtype", choices=sorted(DTYPES), default="float16")
+    parser.add_argument("--chunk-size", type=int, default=500_000)
+    args = parser.parse_args()
+
+    axes = dict(DEFAULT_AXES, **dict(args.axis))
+    lo, step, size = axis_arrays(axes)
+    n_points = int(np.prod(size))
+    dtype, scale = DTYPES[args.dtype]
+    print(f"[INFO] Lattice {' x '.join(map(str, size))} = {n_points:,} points ({args.dtype})")
+
+    teacher = load_models(args.models_dir, "auto")
+    teacher_artifacts = model_registry.teacher_hashes(args.models_dir)
+    values = np.empty(n_points, dtype=dtype)
+    max_ml_error = 0.0
+    score_matches = level_matches = 0
+
+    t0 = time.perf_counter()
+    for start in range(0, n_points, args.chunk_size):
+        stop = min(start + args.chunk_size, n_points)
+        x = lattice_points(lo, step, size, start, stop)
+        exact = teacher_ml_scores(teacher, x)
+        values[start:stop] = quantize(exact, dtype, scale)
+
+        stored = values[start:stop] * scale
+        columns = {f: x[:, i] for i, f in enumerate(FEATURES)}
+        columns.update({k: np.full(len(x), v) for k, v in RULE_ONLY_DEFAULTS.items()})
+        h_scores, _ = risk_rules.evaluate_rules(columns)
+        fused_exact = risk_rules.fuse(h_scores, exact)
+        fused_stored = risk_rules.fuse(h_scores, stored)
+        max_ml_error = max(max_ml_error, float(np.abs(exact - stored).max()))
+        score_matches += int((fused_exact == fused_stored).sum())
+        level_matches += int(
+            (risk_rules.risk_levels(fused_exact) == risk_rules.risk_levels(fused_stored)).sum()
+        )
+    build_seconds = time.perf_counter() - t0
+
+    out_path = os.path.join(args.models_dir, LATTICE_MODEL_DIR)
+    save_arrays(out_path, {
+        "values": values,
+        "axis_lo": lo,
+        "axis_step": step,
+        "axis_size": size,
+        "value_scale": np.array([scale]),
+    })
+    lattice = LatticeRiskModel.load(out_path)
+
+    rng = np.random.default_rng(0)
+    sample = rng.choice(n_points, size=min(10_000, n_points), replace=False)
+    x_bench = np.concatenate([lattice_points(lo, step, size, i, i + 1) for i in sample])
+    teacher_single, teacher_batch = latency_ms(lambda x: teacher_ml_scores(teacher, x), x_bench)
+    lattice_single, lattice_batch = latency_ms(lambda x: lattice.lookup(x)[0], x_bench)
+    if not lattice.lookup(x_bench)[1].all():
+        raise RuntimeError("Lattice points do not round-trip through lookup()")
+
+    report = {
+        "teacher": type(teacher).__name__,
+        # Checked by ml-api before serving the lattice (model_registry.derived_mismatch)
+        "teacher_artifacts": teacher_artifacts,
+        "features": FEATURES,
+        "axes": {f: list(axes[f]) + [int(size[i])] for i, f in enumerate(FEATURES)},
+        "points": n_points,
+        "dtype": args.dtype,
+        "bytes": dir_bytes(out_path),
+        "build_seconds": round(build_seconds, 2),
+        "exactness": {
+            "max_ml_score_error": round(max_ml_error, 6),
+            "risk_score_identical": round(score_matches / n_points, 6),
+            "risk_level_identical": round(level_matches / n_points, 6),
+        },
+        "latency_ms": {
+            "teacher_single_row": teacher_single,
+            "teacher_batch_10k": teacher_batch,
+            "lattice_single_row": lattice_single,
+            "lattice_batch_10k": lattice_batch,
+        },
+    }
+    with open(os.path.join(args.models_dir, REPORT_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+
+    ex, lat = report["exactness"], report["latency_ms"]
+    print(f"[INFO] Built in {build_seconds:.1f}s ({n_points / build_seconds:,.0f} points/s)")
+    print(f"[INFO] Exactness: ML score error max {ex['max_ml_score_error']:.5f}, "
+          f"risk_score identical {ex['risk_score_identical']:.2%}, "
+          f"risk_level identical {ex['risk_level_identical']:.2%}")
+    print(f"[INFO] ML half latency: single row {lat['teacher_single_row']:.3f} -> "
+          f"{lat['lattice_single_row']:.3f} ms, 10k rows {lat['teacher_batch_10k']:.1f} -> "
+          f"{lat['lattice_batch_10k']:.1f} ms")
+    print(f"[INFO] Saved {out_path} ({report['bytes'] / 1e6:.1f} MB) and {REPORT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Hash index for cross-source deduplication of training rows.
+
+Each row (features + label) is reduced to one uint64 hash. The index keeps
+only sorted unique hashes, a bitmask of the sources each hash was seen in
+and a copy count - 24 bytes per distinct row (plus 8 per row of the source
+being fed) and no row data - so it scales to millions of rows. Rows are
+fed in chunks, source by source.
+
+A row is a cross-source duplicate when an earlier source already had it.
+Repeats inside one source are counted but kept (they are real repeated
+measurements, not a second copy of a dataset).
+"""
+
+import numpy as np
+import pandas as pd
+
+MAX_SOURCES = 64  # one bit per source
+
+
+def row_hashes(X, y):
+    """uint64 hash per row of (X, y)."""
+    frame = pd.DataFrame(X)
+    frame["label"] = y
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+class DedupIndex:
+    def __init__(self, sources):
+        if len(sources) > MAX_SOURCES:
+            raise ValueError(f"At most {MAX_SOURCES} sources are supported")
+        self.sources = list(sources)
+        self.hashes = np.empty(0, dtype=np.uint64)   # sorted, unique
+        self.masks = np.empty(0, dtype=np.uint64)    # sources containing each hash
+        self.copies = np.empty(0, dtype=np.int64)    # total rows with each hash
+
+        n = len(self.sources)
+        self.rows_in = np.zeros(n, dtype=np.int64)
+        self.cross_dupes = np.zeros(n, dtype=np.int64)
+        self.within_dupes = np.zeros(n, dtype=np.int64)
+
+        # Hashes of the source being fed; merged into the index by end_source()
+        self._current = None
+        self._pending = []
+
+    def _lookup(self, hashes):
+        """(position, found) of each hash in the sorted index."""
+        if not len(self.hashes):
+            return np.zeros(len(hashes), dtype=np.intp), np.zeros(len(hashes), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.hashes, hashes), len(self.hashes) - 1)
+        return pos, self.hashes[pos] == hashes
+
+    def begin_source(self, source):
+        self._current = self.sources.index(source)
+        self._pending = []
+
+    def keep_mask(self, hashes):
+        """
+        Feed one chunk of the current source; True where the row is kept
+        (not already present in an earlier source).
+        """
+        i = self._current
+        _, found = self._lookup(hashes)
+        # Only hashes from *earlier* sources are in the index so far
+        self.rows_in[i] += len(hashes)
+        self.cross_dupes[i] += int(found.sum())
+        self._pending.append(np.sort(hashes))
+        return ~found
+
+    def end_source(self):
+        i = self._current
+        if not self._pending:
+            return
+        hashes, counts = np.unique(np.concatenate(self._pending), return_counts=True)
+        self._pending = []
+        self.within_dupes[i] += int((counts - 1).sum())
+
+        bit = np.uint64(1) << np.uint64(i)
+        pos, found = self._lookup(hashes)
+        self.masks[pos[found]] |= bit
+        self.copies[pos[found]] += counts[found]
+
+        new = ~found
+        merged = np.concatenate([self.hashes, hashes[new]])
+        order = np.argsort(merged, kind="stable")
+        self.hashes = merged[order]
+        self.masks = np.concatenate([self.masks, np.full(int(new.sum()), bit, np.uint64)])[order]
+        self.copies = np.concatenate([self.copies, counts[new]])[order]
+
+    def overlap(self):
+        """(n_sources, n_sources) distinct rows present in both i and j."""
+        n = len(self.sources)
+        bits = [(self.masks >> np.uint64(i)) & np.uint64(1) for i in range(n)]
+        return np.array([[int((bits[i] & bits[j]).sum()) for j in range(n)] for i in range(n)])
+
+    def report(self):
+        """JSON-able summary: per-source counts and pairwise overlap."""
+        overlap = self.overlap()
+        return {
+            "distinct_rows": int(len(self.hashes)),
+            "rows_in": int(self.rows_in.sum()),
+            "cross_source_duplicates": int(self.cross_dupes.sum()),
+            "sources": [
+                {
+                    "file": name,
+                    "rows_in": int(self.rows_in[i]),
+                    "cross_source_duplicates": int(self.cross_dupes[i]),
+                    "within_source_duplicates": int(self.within_dupes[i]),
+                    "distinct_rows": int(overlap[i, i]),
+                }
+                for i, name in enumerate(self.sources)
+            ],
+            "overlap": {
+                f"{self.sources[i]} & {self.sources[j]}": int(overlap[i, j])
+                for i in range(len(self.sources))
+                for j in range(i + 1, len(self.sources))
+                if overlap[i, j]
+            },
+        }
@@ -0,0 +1,237 @@
+"""
+Distil the RF + logistic half of the ml-api fusion into one compact tree.
+
+    python distill.py
+    python distill.py --samples 2000000 --max-leaf-nodes 65536
+
+ml-api's risk_score is
+    fuse(heuristic, (P_rf(mid or high) + P_lr(mid or high)) / 2)
+The heuristic is a handful of vectorized threshold rules (and the source of
+the "reason" text), so it stays exact. The expensive part - two scalers, a
+200-tree forest and a logistic model - only depends on the 6 LR features and
+is replaced by a single regression tree trained on the teacher's output over
+  - a dense uniform sweep of plausible vitals,
+  - ml-api's default reading with random subsets of vitals swept (what
+    most requests look like),
+  - every training-corpus row and jittered neighbours of it (the forest is
+    sharpest around the points it was fitted on).
+
+Output (ml/models/):
+    maternal_risk_distilled/        one-tree forest for inference.DistilledRiskModel
+    maternal_risk_distilled.json    teacher hashes, sweep box, fidelity / latency / size
+
+Fidelity is measured on fresh uniform and API-default sweeps (heuristic-only
+inputs fetal_hr / spo2 varied too), on the training corpus and on fresh
+neighbours of it: max / mean |risk_score| error and risk_level agreement.
+ml-api serves the student with DISTILLED_MODE=1.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import model_registry
+import risk_rules
+from export_numpy_models import flatten_forest
+from inference import DISTILLED_MODEL_DIR, DistilledRiskModel, load_models, save_arrays
+from training_data import load_training_data
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+REPORT_FILE = DISTILLED_MODEL_DIR + ".json"
+
+# Same order as the logistic model / inference.DistilledRiskModel
+FEATURES = ["age", "systolic_bp", "diastolic_bp", "bs", "temperature", "maternal_hr"]
+# Sweep box (and the clip range at serve time). The corpus has BS in mmol/L
+# and BodyTemp in Fahrenheit while ml-api defaults to bs=90 (mg/dL) and
+# temperature=36.8 (Celsius), so both unit ranges are covered.
+SWEEP_LO = np.array([10, 70, 40, 3, 35, 40], dtype=float)
+SWEEP_HI = np.array([60, 200, 130, 300, 104, 160], dtype=float)
+# ml-api's default reading: most requests only override a few vitals
+API_DEFAULTS = np.array([25, 120, 80, 90, 36.8, 90], dtype=float)
+# Neighbourhood of a corpus row: years, mmHg, mmHg, BS, degrees, bpm
+JITTER_SD = np.array([1.0, 2.0, 2.0, 0.3, 0.3, 2.0])
+# Heuristic-only inputs, varied in the fidelity sweep
+RULE_ONLY_LO = {"fetal_hr": 90.0, "spo2": 85.0}
+RULE_ONLY_HI = {"fetal_hr": 190.0, "spo2": 100.0}
+
+
+def teacher_ml_scores(models, x_lr):
+    """ml-api's ML half of the fusion for raw (n, 6) LR features."""
+    map_val = (x_lr[:, 1] + 2 * x_lr[:, 2]) / 3
+    pulse_pressure = x_lr[:, 1] - x_lr[:, 2]
+    rf_probs = models.rf_proba(np.column_stack([x_lr, map_val, pulse_pressure]))
+    lr_probs = models.logreg_proba(x_lr)
+    return risk_rules.ml_scores([rf_probs, lr_probs])
+
+
+def sweep(n, rng):
+    return SWEEP_LO + (SWEEP_HI - SWEEP_LO) * rng.random((n, len(FEATURES)))
+
+
+def api_like(n, rng, p_override=0.5):
+    """ml-api defaults with each vital independently swept with p_override."""
+    x = np.tile(API_DEFAULTS, (n, 1))
+    override = rng.random(x.shape) < p_override
+    x[override] = sweep(n, rng)[override]
+    return x
+
+
+def jitter(rows, copies, rng):
+    """copies noisy neighbours per row (noise sd JITTER_SD, in feature units)."""
+    noise = rng.normal(0.0, 1.0, (len(rows) * copies, len(FEATURES))) * JITTER_SD
+    return np.clip(np.repeat(rows, copies, axis=0) + noise, SWEEP_LO, SWEEP_HI)
+
+
+def fidelity(x_lr, rule_only, teacher_ml, student_ml):
+    """Fused risk_score / risk_level agreement for the same heuristic inputs."""
+    columns = {k: x_lr[:, i] for i, k in enumerate(FEATURES)}
+    columns.update(rule_only)
+    h_scores, _ = risk_rules.evaluate_rules(columns)
+    teacher = risk_rules.fuse(h_scores, teacher_ml)
+    student = risk_rules.fuse(h_scores, student_ml)
+    err = np.abs(teacher - student)
+    return {
+        "rows": int(len(x_lr)),
+        "max_score_error": round(float(err.max()), 4),
+        "mean_score_error": round(float(err.mean()), 5),
+        "level_agreement": round(float(
+            (risk_rules.risk_levels(teacher) == risk_rules.risk_levels(student)).mean()
+        ), 5),
+        "max_ml_score_error": round(float(np.abs(teacher_ml - student_ml).max()), 4),
+    }
+
+
+def latency_ms(fn, x, repeat=20):
+    fn(x[:1])
+    t0 = time.perf_counter()
+    for i in range(repeat):
+        fn(x[i:i + 1])
+    single = (time.perf_counter() - t0) / repeat * 1000
+    t0 = time.perf_counter()
+    fn(x)
+    return round(single, 4), round((time.perf_counter() - t0) * 1000, 2)
+
+
+def dir_bytes(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path) for name in files
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distil the fused RF + logistic score")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--samples", type=int, default=1_000_000,
+                        help="uniform sweep points to train on")
+    parser.add_argument("--api-samples", type=int, default=500_000,
+                        help="points around ml-api's default reading")
+    parser.add_argument("--corpus-copies", type=int, default=200,
+                        help="jittered neighbours per corpus row (where the forest is sharpest)")
+    parser.add_argument("--max-leaf-nodes", type=int, default=16384)
+    parser.add_argument("--eval-samples", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from sklearn.tree import DecisionTreeRegressor
+
+    teacher = load_models(args.models_dir, "auto")
+    teacher_artifacts = model_registry.teacher_hashes(args.models_dir)
+    rng = np.random.default_rng(args.seed)
+
+    corpus = np.clip(load_training_data().X, SWEEP_LO, SWEEP_HI)
+    x_train = np.vstack([
+        sweep(args.samples, rng),
+        api_like(args.api_samples, rng),
+        corpus,
+        jitter(corpus, args.corpus_copies, rng),
+    ])
+    t0 = time.perf_counter()
+    y_train = teacher_ml_scores(teacher, x_train)
+    print(f"[INFO] Teacher scored {len(x_train):,} sweep / API-default / corpus rows "
+          f"in {time.perf_counter() - t0:.1f}s")
+
+    t0 = time.perf_counter()
+    tree = DecisionTreeRegressor(
+        max_leaf_nodes=args.max_leaf_nodes, min_samples_leaf=5, random_state=args.seed
+    ).fit(x_train, y_train)
+    print(f"[INFO] Student: {tree.get_n_leaves()} leaves, depth {tree.get_depth()}, "
+          f"fitted in {time.perf_counter() - t0:.1f}s")
+
+    out_path = os.path.join(args.models_dir, DISTILLED_MODEL_DIR)
+    # A one-tree forest, same arrays and traversal as the NumPy export
+    arrays = flatten_forest([tree], proba=False)
+    arrays["sweep_lo"] = SWEEP_LO
+    arrays["sweep_hi"] = SWEEP_HI
+    save_arrays(out_path, arrays)
+    student = DistilledRiskModel.load(out_path)
+
+    # Fresh sweep (heuristic-only inputs varied too) and the real corpus
+    x_eval = sweep(args.eval_samples, rng)
+    rule_only = {
+        k: RULE_ONLY_LO[k] + (RULE_ONLY_HI[k] - RULE_ONLY_LO[k]) * rng.random(len(x_eval))
+        for k in RULE_ONLY_LO
+    }
+    near = jitter(corpus, 5, rng)
+    x_api = api_like(args.eval_samples, rng)
+    default_rules = {"fetal_hr": np.full(len(corpus), 140.0), "spo2": np.full(len(corpus), 98.0)}
+    report = {
+        "teacher": type(teacher).__name__,
+        # Checked by ml-api before serving the student (model_registry.derived_mismatch)
+        "teacher_artifacts": teacher_artifacts,
+        "features": FEATURES,
+        "sweep_lo": SWEEP_LO.tolist(),
+        "sweep_hi": SWEEP_HI.tolist(),
+        "train_rows": int(len(x_train)),
+        "leaves": int(tree.get_n_leaves()),
+        "depth": int(tree.get_depth()),
+        "fidelity_sweep": fidelity(
+            x_eval, rule_only, teacher_ml_scores(teacher, x_eval), student.ml_scores(x_eval)
+        ),
+        "fidelity_corpus": fidelity(
+            corpus, default_rules, teacher_ml_scores(teacher, corpus), student.ml_scores(corpus)
+        ),
+        "fidelity_api_like": fidelity(
+            x_api, {k: v[:len(x_api)] for k, v in rule_only.items()},
+            teacher_ml_scores(teacher, x_api), student.ml_scores(x_api),
+        ),
+        # Fresh neighbours, not the ones trained on
+        "fidelity_corpus_neighbourhood": fidelity(
+            near, {k: np.repeat(v, 5) for k, v in default_rules.items()},
+            teacher_ml_scores(teacher, near), student.ml_scores(near),
+        ),
+    }
+
+    x_bench = x_eval[:10_000]
+    teacher_single, teacher_batch = latency_ms(lambda x: teacher_ml_scores(teacher, x), x_bench)
+    student_single, student_batch = latency_ms(student.ml_scores, x_bench)
+    report["latency_ms"] = {
+        "teacher_single_row": teacher_single,
+        "teacher_batch_10k": teacher_batch,
+        "student_single_row": student_single,
+        "student_batch_10k": student_batch,
+    }
+    report["student_bytes"] = dir_bytes(out_path)
+
+    with open(os.path.join(args.models_dir, REPORT_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name in ("fidelity_sweep", "fidelity_api_like", "fidelity_corpus",
+                 "fidelity_corpus_neighbourhood"):
+        r = report[name]
+        print(f"[INFO] {name}: {r['rows']:,} rows, risk_score error max {r['max_score_error']:.2f} "
+              f"mean {r['mean_score_error']:.4f}, level agreement {r['level_agreement']:.2%}")
+    lat = report["latency_ms"]
+    print(f"[INFO] ML half latency: single row {lat['teacher_single_row']:.3f} -> "
+          f"{lat['student_single_row']:.3f} ms, 10k rows {lat['teacher_batch_10k']:.1f} -> "
+          f"{lat['student_batch_10k']:.1f} ms")
+    print(f"[INFO] Saved {out_path} ({report['student_bytes'] / 1e6:.2f} MB) "
+          f"and {REPORT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Export the trained RF + logistic artifacts in ml/models/ to plain arrays
+for the sklearn-free NumpyRiskModel (inference.py).
+
+Output (ml/models/maternal_risk_numpy/, one <name>.npy per array):
+    rf_scaler_mean / rf_scaler_scale      StandardScaler for the 8 RF features
+    rf_roots                              root node index of every tree
+    rf_feature / rf_threshold             split per node (all trees concatenated)
+    rf_children                           [left, right] per node, interleaved;
+                                          leaves point at themselves
+    rf_leaf                               leaf flag per node
+    rf_value                              per-node class probabilities
+    lr_scaler_mean / lr_scaler_scale      StandardScaler for the 6 LR features
+    lr_scaler_n                           samples the LR scaler was fitted on
+    lr_coef_folded / lr_intercept_folded  logistic weights with scaler folded in
+    classes
+
+Before anything is written, the arrays are checked against the sklearn
+models on every row of ml/data_multi/ and on a random sweep; if
+probabilities differ by more than --tolerance the script exits non-zero and
+the existing export is left untouched (ml-api loads it first).
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from inference import (
+    NUMPY_MODEL_DIR,
+    NumpyRiskModel,
+    SklearnRiskModel,
+    save_arrays,
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data_multi")
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+
+LR_FEATURES = ["Age", "SystolicBP", "DiastolicBP", "BS", "BodyTemp", "HeartRate"]
+
+
+def flatten_forest(estimators, proba=True):
+    """
+    Fitted sklearn trees -> one set of node arrays for inference.FlatForest.
+    proba=False keeps a regressor's leaf values as they are.
+    """
+    roots, feature, threshold, children, leaves, value = [], [], [], [], [], []
+    offset = 0
+
+    for est in estimators:
+        tree = est.tree_
+        leaf = tree.children_left == -1
+        own = np.arange(tree.node_count) + offset
+
+        roots.append(offset)
+        leaves.append(leaf)
+        feature.append(np.where(leaf, 0, tree.feature))
+        # +inf keeps a leaf on its "left" (= itself) child during traversal
+        threshold.append(np.where(leaf, np.inf, tree.threshold))
+
+        pair = np.empty((tree.node_count, 2), dtype=np.int64)
+        pair[:, 0] = np.where(leaf, own, tree.children_left + offset)
+        pair[:, 1] = np.where(leaf, own, tree.children_right + offset)
+        children.append(pair.ravel())
+
+        v = tree.value[:, 0, :].astype(float)
+        if proba:
+            # Same normalisation as DecisionTreeClassifier.predict_proba
+            norm = v.sum(axis=1, keepdims=True)
+            norm[norm == 0] = 1.0
+            v = v / norm
+        value.append(v)
+
+        offset += tree.node_count
+
+    return {
+        "rf_roots": np.array(roots, dtype=np.int32),
+        "rf_feature": np.concatenate(feature).astype(np.int32),
+        "rf_threshold": np.concatenate(threshold).astype(np.float64),
+        "rf_children": np.concatenate(children).astype(np.int32),
+        "rf_leaf": np.concatenate(leaves),
+        "rf_value": np.concatenate(value),
+    }
+
+
+def export_arrays(ref):
+    arrays = flatten_forest(ref.rf_model.estimators_)
+    arrays["rf_scaler_mean"] = ref.rf_scaler.mean_.astype(float)
+    arrays["rf_scaler_scale"] = ref.rf_scaler.scale_.astype(float)
+
+    mean = ref.logreg_scaler.mean_.astype(float)
+    scale = ref.logreg_scaler.scale_.astype(float)
+    coef = ref.logreg_model.coef_.astype(float)
+    intercept = ref.logreg_model.intercept_.astype(float)
+
+    arrays["lr_scaler_mean"] = mean
+    arrays["lr_scaler_scale"] = scale
+    # Sample count behind the scaler, for seeding online_logreg.py
+    arrays["lr_scaler_n"] = np.array([np.max(ref.logreg_scaler.n_samples_seen_)], dtype=float)
+    arrays["lr_coef_folded"] = coef / scale
+    arrays["lr_intercept_folded"] = intercept - (coef * (mean / scale)).sum(axis=1)
+
+    arrays["classes"] = np.asarray(ref.rf_model.classes_)
+    return arrays
+
+
+def parity_inputs(n_random=5000, seed=0):
+    """Training corpus rows + a uniform sweep of plausible vitals."""
+    frames = [pd.read_csv(p) for p in glob.glob(os.path.join(DATA_DIR, "*.csv"))]
+    corpus = pd.concat(frames, ignore_index=True)[LR_FEATURES].dropna().values.astype(float)
+
+    rng = np.random.default_rng(seed)
+    lo = np.array([10, 70, 40, 5, 35, 40], dtype=float)
+    hi = np.array([60, 200, 130, 20, 104, 160], dtype=float)
+    sweep = np.round(lo + (hi - lo) * rng.random((n_random, len(lo))), 1)
+
+    x_lr = np.vstack([corpus, sweep])
+    map_val = (x_lr[:, 1] + 2 * x_lr[:, 2]) / 3
+    pulse_pressure = x_lr[:, 1] - x_lr[:, 2]
+    x_rf = np.column_stack([x_lr, map_val, pulse_pressure])
+    return x_rf, x_lr
+
+
+def check_parity(ref, fast, tolerance):
+    x_rf, x_lr = parity_inputs()
+
+    rf_diff = np.abs(ref.rf_proba(x_rf) - fast.rf_proba(x_rf)).max()
+    lr_diff = np.abs(ref.logreg_proba(x_lr) - fast.logreg_proba(x_lr)).max()
+    print(f"[INFO] Parity over {len(x_rf)} rows: "
+          f"RF max |dp| = {rf_diff:.2e}, LR max |dp| = {lr_diff:.2e}")
+
+    # Latency: single row and whole sweep
+    for name, model in (("sklearn", ref), ("numpy", fast)):
+        t0 = time.perf_counter()
+        for i in range(50):
+            model.rf_proba(x_rf[i:i + 1])
+            model.logreg_proba(x_lr[i:i + 1])
+        single_ms = (time.perf_counter() - t0) / 50 * 1000
+
+        t0 = time.perf_counter()
+        model.rf_proba(x_rf)
+        model.logreg_proba(x_lr)
+        batch_ms = (time.perf_counter() - t0) * 1000
+        print(f"[INFO] {name:8s} single row {single_ms:8.3f} ms, "
+              f"batch of {len(x_rf)} {batch_ms:8.1f} ms")
+
+    return max(rf_diff, lr_diff) <= tolerance
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--tolerance", type=float, default=1e-9)
+    args = parser.parse_args()
+
+    ref = SklearnRiskModel(args.models_dir)
+    arrays = export_arrays(ref)
+
+    if not check_parity(ref, NumpyRiskModel(arrays), args.tolerance):
+        print(f"[ERROR] Export differs from sklearn by more than {args.tolerance}; "
+              f"nothing written")
+        sys.exit(1)
+    print("[INFO] Parity OK")
+
+    out_path = os.path.join(args.models_dir, NUMPY_MODEL_DIR)
+    save_arrays(out_path, arrays)
+    size = sum(a.nbytes for a in arrays.values())
+    print(f"[INFO] Saved NumPy model to {out_path} "
+          f"({len(arrays['rf_roots'])} trees, {len(arrays['rf_feature'])} nodes, "
+          f"{size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
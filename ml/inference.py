@@ -0,0 +1,279 @@
+"""
+Serve-time inference for the fused RF + logistic model.
+
+NumpyRiskModel evaluates the exported arrays (see export_numpy_models.py),
+memory-mapped read-only from disk, with plain NumPy - no scikit-learn / joblib import at serve time, no
+per-call estimator validation and no joblib thread dispatch for the forest.
+
+SklearnRiskModel wraps the original joblib artifacts behind the same
+interface. It is the reference for the parity check and the fallback when
+no export exists yet.
+
+Both expose:
+    rf_proba(x_rf)      (n, 8) raw features -> (n, n_classes)
+    logreg_proba(x_lr)  (n, 6) raw features -> (n, n_classes)
+and the two halves of each, so callers can time the scaler separately:
+    rf_transform / rf_predict, logreg_transform / logreg_predict
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+RF_MODEL_FILE = "maternal_risk_rf_pso_multi.joblib"
+RF_SCALER_FILE = "maternal_risk_scaler_multi.joblib"
+LOGREG_MODEL_FILE = "maternal_risk_logreg.joblib"
+LOGREG_SCALER_FILE = "maternal_risk_logreg_scaler.joblib"
+
+# Directory of plain .npy files (one per array) so every uvicorn worker can
+# memory-map the same read-only pages instead of unpickling its own copy.
+NUMPY_MODEL_DIR = "maternal_risk_numpy"
+# Single-tree student of the RF + logistic score (distill.py), same format
+DISTILLED_MODEL_DIR = "maternal_risk_distilled"
+# ML score over a dense integer / one-decimal input lattice (build_lattice.py)
+LATTICE_MODEL_DIR = "maternal_risk_lattice"
+
+
+def softmax_rows(z):
+    """In-place row softmax (same steps as sklearn.utils.extmath.softmax)."""
+    z -= z.max(axis=1, keepdims=True)
+    np.exp(z, out=z)
+    z /= z.sum(axis=1, keepdims=True)
+    return z
+
+
+class FlatForest:
+    """
+    Trees flattened into one set of node arrays by
+    export_numpy_models.flatten_forest, walked all at once.
+    """
+
+    COMPACT_EVERY = 4
+
+    def __init__(self, arrays):
+        self.rf_roots = arrays["rf_roots"]
+        self.rf_feature = arrays["rf_feature"]
+        self.rf_threshold = arrays["rf_threshold"]
+        self.rf_children = arrays["rf_children"]
+        self.rf_leaf = arrays["rf_leaf"]
+        self.rf_value = arrays["rf_value"]
+
+    def rf_predict(self, x):
+        n_rows, n_features = x.shape
+        n_trees = len(self.rf_roots)
+        flat_x = x.ravel()
+
+        # One entry per (tree, row) pair, tree-major; all trees walked at once.
+        # Leaves loop back to themselves, so a few extra steps are harmless and
+        # finished pairs only need to be dropped every COMPACT_EVERY steps.
+        node = np.repeat(self.rf_roots, n_rows).astype(np.intp)
+        row_base = np.tile(np.arange(n_rows, dtype=np.intp) * n_features, n_trees)
+
+        active = np.flatnonzero(~self.rf_leaf[node])
+        cur = node[active]
+        base = row_base[active]
+        while active.size:
+            for _ in range(self.COMPACT_EVERY):
+                go_right = flat_x[base + self.rf_feature[cur]] > self.rf_threshold[cur]
+                cur = self.rf_children[2 * cur + go_right]
+            node[active] = cur
+            keep = ~self.rf_leaf[cur]
+            active, cur, base = active[keep], cur[keep], base[keep]
+
+        return self.rf_value[node].reshape(n_trees, n_rows, -1).sum(axis=0) / n_trees
+
+
+class NumpyRiskModel(FlatForest):
+    def __init__(self, arrays):
+        super().__init__(arrays)
+        self.rf_mean = arrays["rf_scaler_mean"]
+        self.rf_scale = arrays["rf_scaler_scale"]
+
+        # Logistic weights with the StandardScaler folded in:
+        #   coef @ ((x - mean) / scale) + b  ==  (coef / scale) @ x + b'
+        self.lr_coef = arrays["lr_coef_folded"]
+        self.lr_intercept = arrays["lr_intercept_folded"]
+
+        self.classes = arrays["classes"]
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        return cls(load_arrays(path, mmap_mode))
+
+    def rf_transform(self, x):
+        # sklearn trees compare float32 features against float64 thresholds
+        return ((np.asarray(x, dtype=float) - self.rf_mean) / self.rf_scale).astype(np.float32)
+
+    def logreg_transform(self, x):
+        # Scaler is folded into lr_coef / lr_intercept
+        return np.asarray(x, dtype=float)
+
+    def logreg_predict(self, x):
+        # einsum (not BLAS gemm) keeps each row independent of batch size
+        z = np.einsum("ij,kj->ik", x, self.lr_coef)
+        z += self.lr_intercept
+        return softmax_rows(z)
+
+    def rf_proba(self, x):
+        return self.rf_predict(self.rf_transform(x))
+
+    def logreg_proba(self, x):
+        return self.logreg_predict(self.logreg_transform(x))
+
+
+class SklearnRiskModel:
+    def __init__(self, models_dir):
+        import joblib
+
+        self.rf_model = joblib.load(os.path.join(models_dir, RF_MODEL_FILE))
+        self.rf_scaler = joblib.load(os.path.join(models_dir, RF_SCALER_FILE))
+        self.logreg_model = joblib.load(os.path.join(models_dir, LOGREG_MODEL_FILE))
+        self.logreg_scaler = joblib.load(os.path.join(models_dir, LOGREG_SCALER_FILE))
+
+        self.classes = self.rf_model.classes_
+
+    def rf_transform(self, x):
+        return self.rf_scaler.transform(x)
+
+    def rf_predict(self, x):
+        return self.rf_model.predict_proba(x)
+
+    def logreg_transform(self, x):
+        return self.logreg_scaler.transform(x)
+
+    def logreg_predict(self, x):
+        z = np.einsum("ij,kj->ik", x, self.logreg_model.coef_)
+        z += self.logreg_model.intercept_
+        return softmax_rows(z)
+
+    def rf_proba(self, x):
+        return self.rf_predict(self.rf_transform(x))
+
+    def logreg_proba(self, x):
+        return self.logreg_predict(self.logreg_transform(x))
+
+
+class DistilledRiskModel(FlatForest):
+    """
+    One regression tree standing in for the RF + logistic half of the
+    fusion (see distill.py), stored as a one-tree forest:
+    (n, 6) raw LR features -> ML score in [0, 1].
+    Inputs are clipped to the box the student was trained on.
+    """
+
+    def __init__(self, arrays):
+        super().__init__(arrays)
+        self.lo = arrays["sweep_lo"]
+        self.hi = arrays["sweep_hi"]
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        return cls(load_arrays(path, mmap_mode))
+
+    def ml_scores(self, x):
+        # sklearn trees compare float32 features against float64 thresholds
+        x = np.clip(np.asarray(x, dtype=float), self.lo, self.hi).astype(np.float32)
+        return self.rf_predict(x)[:, 0]
+
+
+class LatticeRiskModel:
+    """
+    The RF + logistic ML score precomputed over a dense lattice of the 6 raw
+    LR features (see build_lattice.py). Rows sitting exactly on a lattice
+    point are a table read; everything else goes to `fallback` (a
+    NumpyRiskModel / SklearnRiskModel / DistilledRiskModel).
+    """
+
+    # Slack for one-decimal inputs arriving as e.g. 36.800000000000004
+    ON_GRID_TOL = 1e-6
+
+    def __init__(self, arrays, fallback=None):
+        self.lo = arrays["axis_lo"]
+        self.step = arrays["axis_step"]
+        self.size = arrays["axis_size"].astype(np.intp)
+        # uint8 codes (value = code * value_scale) or float16 scores
+        self.values = arrays["values"]
+        self.value_scale = float(arrays["value_scale"][0])
+        self.fallback = fallback
+
+    @classmethod
+    def load(cls, path, fallback=None, mmap_mode="r"):
+        return cls(load_arrays(path, mmap_mode), fallback)
+
+    def lookup(self, x):
+        """
+        (n, 6) raw LR features -> (ML scores, on-lattice mask). Scores of
+        off-lattice rows are NaN.
+        """
+        x = np.asarray(x, dtype=float)
+        pos = (x - self.lo) / self.step
+        idx = np.rint(pos)
+        hit = (
+            (np.abs(pos - idx) * self.step <= self.ON_GRID_TOL)
+            & (idx >= 0) & (idx < self.size)
+        ).all(axis=1)
+        scores = np.full(len(x), np.nan)
+        if hit.any():
+            flat = np.ravel_multi_index(idx[hit].astype(np.intp).T, self.size)
+            scores[hit] = self.values[flat] * self.value_scale
+        return scores, hit
+
+
+def load_arrays(path, mmap_mode="r"):
+    """Every <name>.npy in `path` -> {name: array}."""
+    return {
+        name[:-len(".npy")]: np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+        for name in os.listdir(path)
+        if name.endswith(".npy")
+    }
+
+
+def save_arrays(path, arrays):
+    """
+    Write one .npy per array into `path`, replacing it atomically: a reader
+    (or a worker mid-start) sees either the old directory or the new one.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp_dir, name + ".npy"), np.ascontiguousarray(arr))
+
+    if os.path.exists(path):
+        old_dir = tempfile.mkdtemp(prefix=".old-", dir=parent)
+        os.rename(path, os.path.join(old_dir, "arrays"))
+        os.rename(tmp_dir, path)
+        shutil.rmtree(old_dir)
+    else:
+        os.rename(tmp_dir, path)
+
+
+def load_risk_model(models_dir):
+    """Exported NumPy arrays (memory-mapped) if present, otherwise joblib."""
+    numpy_dir = os.path.join(models_dir, NUMPY_MODEL_DIR)
+    if os.path.isdir(numpy_dir):
+        return NumpyRiskModel.load(numpy_dir)
+    return SklearnRiskModel(models_dir)
+
+
+def load_models(models_dir, engine):
+    """
+    Models for offline batch scoring: engine "numpy", "sklearn" or "auto".
+    "auto" prefers the joblib models: on chunks of thousands of rows
+    sklearn's compiled tree traversal beats the NumPy export, which is
+    tuned for small serve-time batches.
+    """
+    if engine == "numpy":
+        return load_risk_model(models_dir)
+    if engine == "auto":
+        try:
+            import joblib  # noqa: F401
+        except ImportError:
+            return load_risk_model(models_dir)
+        if not os.path.exists(os.path.join(models_dir, RF_MODEL_FILE)):
+            return load_risk_model(models_dir)
+    models = SklearnRiskModel(models_dir)
+    # Single-threaded: the batch scripts parallelise across processes, if at all
+    models.rf_model.n_jobs = 1
+    return models
@@ -0,0 +1,204 @@
+"""
+Vectorized risk-score forecasting for many patients at once (POST /forecast).
+
+Each patient's recent risk_score history is right-aligned into one
+NaN-padded (patients, history) matrix, and three trend models are fitted to
+every row together - the recursions loop over the history columns, never
+over patients:
+
+  - linear:        least-squares line through (hours, score)
+  - ewma:          exponentially weighted level, flat forecast
+  - damped_trend:  Holt's linear trend with a damped slope
+
+The reported score is the mean of the three forecasts, each clipped to
+[0, 1] first; the band around it is band_z * the pooled standard deviation
+of their forecast errors (residual spread grown with the horizon as each
+model's prediction-interval formula says), clipped to [0, 1].
+
+Without timestamps the readings are taken to be one hour apart. The
+smoothing models step in units of the patient's median reading interval.
+"""
+
+import numpy as np
+
+HORIZON_HOURS = (1, 3, 6, 12)
+# Longest horizon a request may ask for (one week)
+MAX_HORIZON_HOURS = 168
+# Readings per patient used for the fit (the backend used its last 12)
+MAX_HISTORY = 12
+
+EWMA_ALPHA = 0.5
+DAMPED_ALPHA = 0.5
+DAMPED_BETA = 0.3
+DAMPED_PHI = 0.9
+# Floor on the reading interval, so near-duplicate timestamps can't turn a
+# horizon into millions of smoothing steps
+MIN_STEP_HOURS = 1 / 60
+
+# 80% band
+BAND_Z = 1.2816
+# Error sd used when a model has too few points to estimate one, and a
+# floor so a flat history doesn't get a zero-width band
+NO_DATA_SD = 0.1
+MIN_SD = 0.02
+
+# (upper bound, level) - the backend's forecast levels
+LEVEL_BOUNDS = ((0.35, "normal"), (0.7, "warning"))
+TOP_LEVEL = "critical"
+
+MODELS = ("linear", "ewma", "damped_trend")
+METHOD = "trend_ensemble_v1"
+
+
+def pad_histories(scores, hours=None, max_history=MAX_HISTORY):
+    """
+    Right-align the last max_history points of each history.
+    scores: list of score lists; hours: None or, per patient, None or the
+    readings' times in hours (any origin; sorted here).
+    Returns (y, x, mask), each (n_patients, width); x is hours relative to
+    the patient's latest reading (<= 0), NaN where mask is False.
+    """
+    width = max(1, min(max_history, max((len(s) for s in scores), default=1)))
+    y = np.full((len(scores), width), np.nan)
+    x = np.full((len(scores), width), np.nan)
+    for i, s in enumerate(scores):
+        if not len(s):
+            continue
+        h = hours[i] if hours is not None else None
+        if h is None:
+            s = s[-width:]
+            y[i, width - len(s):] = s
+            x[i, width - len(s):] = np.arange(1 - len(s), 1)
+        else:
+            h = np.asarray(h, dtype=float)
+            order = np.argsort(h, kind="stable")[-width:]
+            y[i, width - len(order):] = np.asarray(s, dtype=float)[order]
+            x[i, width - len(order):] = h[order] - h[order[-1]]
+    return y, x, ~np.isnan(y)
+
+
+def _sd(sse, dof):
+    sd = np.sqrt(np.divide(sse, dof, out=np.full(sse.shape, np.nan), where=dof > 0))
+    return np.maximum(np.where(dof > 0, sd, NO_DATA_SD), MIN_SD)
+
+
+def fit_linear(y, x, mask, horizons):
+    """(forecast, sd), each (patients, horizons)."""
+    n = mask.sum(axis=1)
+    safe_n = np.maximum(n, 1)
+    x0 = np.where(mask, x, 0.0)
+    y0 = np.where(mask, y, 0.0)
+    x_mean = x0.sum(axis=1) / safe_n
+    y_mean = y0.sum(axis=1) / safe_n
+    dx = np.where(mask, x - x_mean[:, None], 0.0)
+    dy = np.where(mask, y - y_mean[:, None], 0.0)
+    sxx = (dx * dx).sum(axis=1)
+    slope = np.divide((dx * dy).sum(axis=1), sxx, out=np.zeros(len(y)), where=sxx > 0)
+
+    resid = np.where(mask, dy - slope[:, None] * dx, 0.0)
+    sd = _sd((resid * resid).sum(axis=1), n - 2)
+
+    h = np.asarray(horizons, dtype=float)[None, :]
+    forecast = y_mean[:, None] + slope[:, None] * (h - x_mean[:, None])
+    # Prediction interval: grows with the distance from the fitted points
+    lever = np.divide((h - x_mean[:, None]) ** 2, sxx[:, None],
+                      out=np.zeros(forecast.shape), where=sxx[:, None] > 0)
+    return forecast, sd[:, None] * np.sqrt(1 + 1 / safe_n[:, None] + lever)
+
+
+def _smooth(y, mask, alpha, beta, phi):
+    """
+    Holt's damped-trend recursion over the columns (beta=0 with phi=0 is
+    plain EWMA). Returns level, trend and the one-step-ahead error sd.
+    """
+    level = np.full(len(y), np.nan)
+    trend = np.zeros(len(y))
+    sse = np.zeros(len(y))
+    n_err = np.zeros(len(y))
+    for j in range(y.shape[1]):
+        obs = mask[:, j]
+        first = obs & np.isnan(level)
+        update = obs & ~first
+
+        prev_level = level.copy()
+        predicted = prev_level + phi * trend
+        err = np.where(update, y[:, j] - predicted, 0.0)
+        sse += err * err
+        n_err += update
+
+        level = np.where(first, y[:, j], level)
+        level = np.where(update, predicted + alpha * err, level)
+        trend = np.where(update, beta * (level - prev_level) + (1 - beta) * phi * trend, trend)
+    # One-step errors are out-of-sample: no degrees of freedom lost
+    return level, trend, _sd(sse, n_err)
+
+
+def _step_hours(x, mask):
+    """Median reading interval per patient (1 hour if unknown, >= MIN_STEP_HOURS)."""
+    gaps = np.where(mask[:, 1:] & mask[:, :-1], np.diff(x, axis=1), np.nan)
+    gaps[~(gaps > 0)] = np.nan
+    known = ~np.isnan(gaps).all(axis=1)
+    step = np.ones(len(x))
+    step[known] = np.nanmedian(gaps[known], axis=1)
+    return np.maximum(step, MIN_STEP_HOURS)
+
+
+def fit_ewma(y, mask, steps):
+    level, _, sd = _smooth(y, mask, EWMA_ALPHA, 0.0, 0.0)
+    forecast = np.repeat(level[:, None], steps.shape[1], axis=1)
+    # Simple exponential smoothing: var(h) = sd^2 (1 + (h - 1) alpha^2)
+    return forecast, sd[:, None] * np.sqrt(1 + np.maximum(steps - 1, 0) * EWMA_ALPHA ** 2)
+
+
+def fit_damped_trend(y, mask, steps):
+    level, trend, sd = _smooth(y, mask, DAMPED_ALPHA, DAMPED_BETA, DAMPED_PHI)
+    phi = DAMPED_PHI
+    # phi + phi^2 + ... + phi^h, for fractional h too
+    damped_sum = phi * (1 - phi ** steps) / (1 - phi)
+    forecast = level[:, None] + damped_sum * trend[:, None]
+    # ETS(A,Ad,N): var(h) = sd^2 (1 + sum_{j<h} c_j^2) with
+    #   c_j = alpha (1 + beta phi (1 - phi^j) / (1 - phi)) = alpha (a - b phi^j)
+    # so the sum is three geometric series, in closed form for any h
+    b = DAMPED_BETA * phi / (1 - phi)
+    a = 1 + b
+    m = np.maximum(np.ceil(steps) - 1, 0)
+    geo1 = phi * (1 - phi ** m) / (1 - phi)
+    geo2 = phi ** 2 * (1 - phi ** (2 * m)) / (1 - phi ** 2)
+    cum = DAMPED_ALPHA ** 2 * (m * a * a - 2 * a * b * geo1 + b * b * geo2)
+    return forecast, sd[:, None] * np.sqrt(1 + cum)
+
+
+def risk_levels(scores):
+    levels = np.full(scores.shape, TOP_LEVEL, dtype=object)
+    for bound, level in reversed(LEVEL_BOUNDS):
+        levels[scores < bound] = level
+    levels[np.isnan(scores)] = None
+    return levels
+
+
+def forecast_matrix(y, x, mask, horizons=HORIZON_HOURS, band_z=BAND_Z):
+    """
+    All models for all patients in one pass. Returns a dict of
+    (patients, horizons) arrays: score / lower / upper / level, plus one
+    forecast array per model name. Patients without history get NaN.
+    """
+    steps = np.asarray(horizons, dtype=float)[None, :] / _step_hours(x, mask)[:, None]
+    fits = dict(zip(MODELS, (
+        fit_linear(y, x, mask, horizons),
+        fit_ewma(y, mask, steps),
+        fit_damped_trend(y, mask, steps),
+    )))
+    # Each model is clipped before averaging, so the score is the mean of
+    # the per-model values reported next to it (and the band centres on it)
+    out = {name: np.clip(f, 0.0, 1.0) for name, (f, _) in fits.items()}
+    score = np.mean([out[name] for name in MODELS], axis=0)
+    sd = np.sqrt(np.mean([s * s for _, s in fits.values()], axis=0))
+    empty = ~mask.any(axis=1)
+
+    out["score"] = score
+    out["lower"] = np.clip(score - band_z * sd, 0.0, 1.0)
+    out["upper"] = np.clip(score + band_z * sd, 0.0, 1.0)
+    for key in out:
+        out[key][empty] = np.nan
+    out["level"] = risk_levels(out["score"])
+    return out
@@ -1,20 +1,100 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import Optional
+from collections import namedtuple
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, confloat, validator
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Union
 import numpy as np
-import joblib
+import json
+import logging
 import os
+import sys
+import threading
+import time
 
-app = FastAPI(title="Fetal Risk ML API")
+PROCESS_START = time.monotonic()
+
+logger = logging.getLogger("uvicorn.error")
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MODELS_DIR = os.path.join(BASE_DIR, "..", "models")
+ML_DIR = os.path.join(BASE_DIR, "..")
+MODELS_DIR = os.path.join(ML_DIR, "models")
+
+# Shared with ml/predict.py
+sys.path.insert(0, ML_DIR)
+import model_registry  # noqa: E402
+import risk_rules  # noqa: E402
+from inference import (  # noqa: E402
+    DISTILLED_MODEL_DIR, LATTICE_MODEL_DIR, DistilledRiskModel, LatticeRiskModel, load_risk_model,
+)
+from prediction_cache import PredictionCache  # noqa: E402
+import metrics  # noqa: E402
+import forecast  # noqa: E402
+from micro_batcher import MicroBatcher  # noqa: E402
+import ndjson_stream  # noqa: E402
+import online_logreg  # noqa: E402
+
+# Registry used when it has an ACTIVE version, else the flat models/ dir
+REGISTRY_DIR = model_registry.REGISTRY_DIR
+# How often the registry's ACTIVE pointer is checked for a new version
+MODEL_POLL_SECONDS = float(os.environ.get("MODEL_POLL_SECONDS", "10"))
+
+LEGACY_VERSION = "heuristic + RF + logistic (calibrated)"
+
+# Batch sizes pushed through score_batch() before the server reports ready
+WARMUP_BATCH_SIZES = [
+    int(n) for n in os.environ.get("WARMUP_BATCH_SIZES", "1,32").split(",") if n.strip()
+]
+# How long /predict waits for a still-loading model before answering 503
+READY_WAIT_SECONDS = float(os.environ.get("READY_WAIT_SECONDS", "2.0"))
+
+# Concurrent /predict calls are coalesced into one vectorized call.
+# MICROBATCH_MAX_SIZE <= 1 turns this off (one score_batch per request).
+MICROBATCH_MAX_SIZE = int(os.environ.get("MICROBATCH_MAX_SIZE", "64"))
+MICROBATCH_WAIT_MS = float(os.environ.get("MICROBATCH_WAIT_MS", "2"))
+
+# /predict_stream scores this many lines per vectorized call; together with
+# the line cap this bounds memory per stream regardless of upload size
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", "512"))
+STREAM_MAX_LINE_BYTES = int(os.environ.get("STREAM_MAX_LINE_BYTES", "65536"))
+
+# Incrementally updated logistic model (ml/online_logreg.py). Served next to
+# the fused score when a checkpoint exists; POST /online_update feeds it.
+ONLINE_MODEL_PATH = os.environ.get(
+    "ONLINE_MODEL_PATH", os.path.join(MODELS_DIR, online_logreg.ONLINE_MODEL_DIR)
+)
+
+# Opt-in fast mode: serve the distilled single-tree student (ml/distill.py)
+# in place of the RF + logistic models, from the same model directory
+DISTILLED_MODE = os.environ.get("DISTILLED_MODE", "0") == "1"
 
-rf_model = joblib.load(os.path.join(MODELS_DIR, "maternal_risk_rf_pso_multi.joblib"))
-rf_scaler = joblib.load(os.path.join(MODELS_DIR, "maternal_risk_scaler_multi.joblib"))
+# Opt-in table lookup: readings on the precomputed ML score lattice
+# (ml/build_lattice.py) skip the models; the rest use the models above
+LATTICE_MODE = os.environ.get("LATTICE_MODE", "0") == "1"
 
-logreg_model = joblib.load(os.path.join(MODELS_DIR, "maternal_risk_logreg.joblib"))
-logreg_scaler = joblib.load(os.path.join(MODELS_DIR, "maternal_risk_logreg_scaler.joblib"))
+ModelBundle = namedtuple("ModelBundle", ["version", "models", "manifest"])
+
+# Loaded in the background (see lifespan) so uvicorn binds immediately.
+# Swapped as one reference, so a request always sees a single consistent bundle.
+active = None
+online = None
+ready = threading.Event()
+startup = {
+    "state": "starting",
+    "version": None,
+    "load_seconds": None,
+    "warmup_seconds": None,
+    "startup_seconds": None,
+    "error": None,
+}
+reloads = {
+    "count": 0,
+    "last_version": None,
+    "last_seconds": None,
+    "last_error": None,
+}
 
 class RiskInput(BaseModel):
     maternal_hr: Optional[float] = 90
@@ -30,94 +110,782 @@ class RiskInput(BaseModel):
     class Config:
         extra = "allow"
 
-@app.get("/health")
-def health():
-    return {"status": "ok"}
+# -----------------------------
+# Vectorized scoring
+# -----------------------------
+INPUT_FIELDS = list(RiskInput.__fields__.keys())
+INPUT_DEFAULTS = {name: field.default for name, field in RiskInput.__fields__.items()}
+
+# Repeated dashboard polls re-send identical vitals; 0 disables the cache
+cache = PredictionCache(
+    INPUT_FIELDS,
+    max_size=int(os.environ.get("PREDICTION_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.environ.get("PREDICTION_CACHE_TTL", "300")),
+)
 
 # -----------------------------
-# Heuristic (continuous)
+# Metrics (GET /metrics, Prometheus text format)
 # -----------------------------
-def heuristic(f):
-    score = 0.1
-    reasons = []
+# With several uvicorn workers (serve.py) each one snapshots its metrics
+# into this directory and /metrics merges them; unset = this process only
+METRICS = metrics.Registry(os.environ.get("METRICS_MULTIPROC_DIR") or None)
+REQUEST_SECONDS = metrics.Histogram(
+    "ml_api_request_seconds", "End-to-end HTTP request latency.", METRICS)
+STAGE_SECONDS = metrics.Histogram(
+    "ml_api_stage_seconds", "Latency of each scoring stage (per call, whole batch).", METRICS)
+REQUESTS_TOTAL = metrics.Counter(
+    "ml_api_requests_total", "HTTP requests by path and status code.", METRICS)
+ERRORS_TOTAL = metrics.Counter(
+    "ml_api_errors_total", "Requests that raised or returned 5xx.", METRICS)
+STREAM_LINES = metrics.Counter(
+    "ml_api_stream_lines_total", "/predict_stream input lines by outcome.", METRICS)
+PREDICTIONS_TOTAL = metrics.Counter(
+    "ml_api_predictions_total", "Scored readings by returned risk_level.", METRICS)
+IN_FLIGHT = metrics.Gauge(
+    "ml_api_in_flight_requests", "HTTP requests currently being handled.", METRICS)
+STARTUP_SECONDS = metrics.Gauge(
+    "ml_api_startup_seconds", "Model load / warm-up / process-start-to-ready time.", METRICS,
+    multiprocess_mode="max")
+CACHE_EVENTS = metrics.Counter(
+    "ml_api_prediction_cache_events_total", "Prediction cache lookups by outcome.", METRICS)
+CACHE_ENTRIES = metrics.Gauge(
+    "ml_api_prediction_cache_entries", "Entries currently in the prediction cache.", METRICS)
+MODEL_RELOADS = metrics.Counter(
+    "ml_api_model_reloads_total", "Successful hot model swaps.", METRICS)
+ONLINE_ROWS = metrics.Counter(
+    "ml_api_online_update_rows_total", "Labelled readings ingested by /online_update.", METRICS)
+LATTICE_ROWS = metrics.Counter(
+    "ml_api_lattice_rows_total", "LATTICE_MODE rows by outcome (hit = table read).", METRICS)
+MICROBATCH_SIZE = metrics.Histogram(
+    "ml_api_microbatch_size", "Requests coalesced per /predict micro-batch.", METRICS,
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+MICROBATCH_QUEUE_WAIT = metrics.Histogram(
+    "ml_api_microbatch_queue_wait_seconds", "Time a /predict request waited to be batched.",
+    METRICS)
+MICROBATCH_WINDOW = metrics.Gauge(
+    "ml_api_microbatch_window_seconds", "Collection window used for the latest micro-batch.",
+    METRICS, multiprocess_mode="max")
+MICROBATCH_DEPTH = metrics.Gauge(
+    "ml_api_microbatch_queue_depth", "/predict requests waiting for a micro-batch.", METRICS)
 
-    if f["systolic_bp"] >= 160 or f["diastolic_bp"] >= 110:
-        score += 0.35
-        reasons.append("Severe hypertension")
-    elif f["systolic_bp"] >= 140 or f["diastolic_bp"] >= 90:
-        score += 0.2
-        reasons.append("Elevated blood pressure")
+STAGES = {
+    name: STAGE_SECONDS.labels(stage=name)
+    for name in (
+        "parse_validate", "input_matrix", "cache_lookup", "heuristic", "features",
+        "rf_scaler", "rf_predict_proba", "logreg_scaler", "logreg_predict_proba",
+        "distilled_predict", "lattice_lookup", "online_predict_proba", "fusion", "serialize",
+    )
+}
 
-    if f["fetal_hr"] < 110 or f["fetal_hr"] > 170:
-        score += 0.25
-        reasons.append("Abnormal fetal heart rate")
 
-    if f["spo2"] < 94:
-        score += 0.2
-        reasons.append("Low maternal oxygen saturation")
+def collect_state():
+    for phase in ("load_seconds", "warmup_seconds", "startup_seconds"):
+        if startup[phase] is not None:
+            STARTUP_SECONDS.set(startup[phase], phase=phase[:-len("_seconds")])
+    stats = cache.stats()
+    for event in ("hits", "misses", "bypassed_off_grid", "evictions", "expirations", "invalidations"):
+        CACHE_EVENTS.set_total(stats[event], event=event)
+    CACHE_ENTRIES.set(stats["size"])
+    MODEL_RELOADS.set_total(reloads["count"])
+    if batcher is not None:
+        MICROBATCH_DEPTH.set(batcher.depth)
 
-    if f["temperature"] >= 38:
-        score += 0.15
-        reasons.append("Maternal fever")
 
-    return min(score, 1.0), reasons
+METRICS.add_collector(collect_state)
 
-@app.post("/predict")
-def predict(data: RiskInput):
-    f = data.dict()
-
-    h_score, h_reasons = heuristic(f)
-
-    map_val = (f["systolic_bp"] + 2 * f["diastolic_bp"]) / 3
-    pulse_pressure = f["systolic_bp"] - f["diastolic_bp"]
-
-    x_rf = np.array([[
-        f["age"],
-        f["systolic_bp"],
-        f["diastolic_bp"],
-        f["bs"],
-        f["temperature"],
-        f["maternal_hr"],
-        map_val,
-        pulse_pressure
-    ]])
-
-    x_lr = np.array([[
-        f["age"],
-        f["systolic_bp"],
-        f["diastolic_bp"],
-        f["bs"],
-        f["temperature"],
-        f["maternal_hr"]
-    ]])
-
-    rf_probs = rf_model.predict_proba(rf_scaler.transform(x_rf))[0]
-    lr_probs = logreg_model.predict_proba(logreg_scaler.transform(x_lr))[0]
-
-    rf_score = rf_probs[1:].sum() if len(rf_probs) > 1 else rf_probs[0]
-    lr_score = lr_probs[1:].sum() if len(lr_probs) > 1 else lr_probs[0]
-
-    ml_score = np.mean([rf_score, lr_score])
-
-    # 🔥 RESTORED FUSION (like before deploy)
-    final_score = round((0.45 * h_score) + (0.55 * ml_score), 2)
-
-    if final_score >= 0.75:
-        level = "critical"
-    elif final_score >= 0.35:
-        level = "warning"
+
+def record_microbatch(size, queue_waits, window):
+    MICROBATCH_SIZE.observe(size)
+    for wait in queue_waits:
+        MICROBATCH_QUEUE_WAIT.observe(wait)
+    MICROBATCH_WINDOW.set(window)
+
+
+def record_predictions(results):
+    for r in results:
+        PREDICTIONS_TOTAL.inc(risk_level=r["risk_level"])
+
+
+def input_matrix(records):
+    """Stack request dicts into an (n, len(INPUT_FIELDS)) float matrix."""
+    return np.array(
+        [
+            [INPUT_DEFAULTS[k] if r.get(k) is None else r[k] for k in INPUT_FIELDS]
+            for r in records
+        ],
+        dtype=float,
+    ).reshape(len(records), len(INPUT_FIELDS))
+
+
+def score_batch(records, bundle=None, use_cache=True):
+    """
+    Score N readings with one call per scaler/model.
+    Returns one response dict per record, in input order.
+
+    Rows found in the prediction cache are not re-scored; the misses go
+    through score_matrix() together as one smaller batch.
+    """
+    bundle = bundle or active
+    # One online model for the whole call: the cache key and the scores
+    # must come from the same one, even if /online_update swaps it meanwhile
+    online_model = online
+    t = time.perf_counter()
+    raw = input_matrix(records)
+    t = STAGES["input_matrix"].lap(t)
+    if not (use_cache and cache.enabled):
+        return score_matrix(raw, bundle, online_model)
+
+    keys = cache.keys_for((bundle.version, online_version(online_model)), raw)
+    results = cache.get_many(keys)
+    missing = [i for i, r in enumerate(results) if r is None]
+    STAGES["cache_lookup"].lap(t)
+    if missing:
+        scored = score_matrix(raw[missing], bundle, online_model)
+        cache.put_many([keys[i] for i in missing], scored)
+        for i, result in zip(missing, scored):
+            results[i] = result
+    # Shallow copies so callers can't mutate cached entries
+    return [dict(r) for r in results]
+
+
+def model_ml_scores(models, x_lr, x_rf):
+    """ML half of the fusion -> (ml_scores, rf_probs, lr_probs); probs None if distilled."""
+    t = time.perf_counter()
+    if isinstance(models, DistilledRiskModel):
+        # DISTILLED_MODE: one tree stands in for both scalers, RF and logistic
+        ml_scores = models.ml_scores(x_lr)
+        STAGES["distilled_predict"].lap(t)
+        return ml_scores, None, None
+
+    x_rf = models.rf_transform(x_rf)
+    t = STAGES["rf_scaler"].lap(t)
+    rf_probs = models.rf_predict(x_rf)
+    t = STAGES["rf_predict_proba"].lap(t)
+    x_lr = models.logreg_transform(x_lr)
+    t = STAGES["logreg_scaler"].lap(t)
+    lr_probs = models.logreg_predict(x_lr)
+    STAGES["logreg_predict_proba"].lap(t)
+
+    return risk_rules.ml_scores([rf_probs, lr_probs]), rf_probs, lr_probs
+
+
+def served_version(bundle):
+    """
+    bundle.version, suffixed with the approximation standing in for the full
+    models (e.g. "+distilled", "+lattice"), so clients can tell them apart.
+    """
+    models = bundle.models
+    suffix = ""
+    if isinstance(models, LatticeRiskModel):
+        suffix += "+lattice"
+        models = models.fallback
+    if isinstance(models, DistilledRiskModel):
+        suffix += "+distilled"
+    return bundle.version + suffix
+
+
+def online_version(model):
+    """Cache-key part for the online model's ml_online_* fields."""
+    return None if model is None else model.version
+
+
+def score_matrix(raw, bundle, online_model=None):
+    """
+    Score an (n, len(INPUT_FIELDS)) input matrix with `bundle` (and
+    `online_model`, if any, for the ml_online_* fields).
+    """
+    models = bundle.models
+    t = time.perf_counter()
+    col = {k: raw[:, i] for i, k in enumerate(INPUT_FIELDS)}
+
+    h_scores, h_masks = risk_rules.evaluate_rules(col)
+    t = STAGES["heuristic"].lap(t)
+
+    map_val = (col["systolic_bp"] + 2 * col["diastolic_bp"]) / 3
+    pulse_pressure = col["systolic_bp"] - col["diastolic_bp"]
+
+    x_lr = np.column_stack([
+        col["age"],
+        col["systolic_bp"],
+        col["diastolic_bp"],
+        col["bs"],
+        col["temperature"],
+        col["maternal_hr"],
+    ])
+    x_rf = np.column_stack([x_lr, map_val, pulse_pressure])
+    t = STAGES["features"].lap(t)
+
+    online_probs = online_model.predict_proba(x_lr) if online_model is not None else None
+    t = STAGES["online_predict_proba"].lap(t)
+
+    if isinstance(models, LatticeRiskModel):
+        # LATTICE_MODE: on-lattice rows are a table read, the others are scored
+        # by the fallback. Per-model probabilities aren't in the table, so
+        # every row reports them as null.
+        ml_scores, hit = models.lookup(x_lr)
+        t = STAGES["lattice_lookup"].lap(t)
+        n_hits = int(hit.sum())
+        LATTICE_ROWS.inc(n_hits, outcome="hit")
+        LATTICE_ROWS.inc(len(hit) - n_hits, outcome="miss")
+        if n_hits < len(hit):
+            miss = ~hit
+            ml_scores[miss], _, _ = model_ml_scores(models.fallback, x_lr[miss], x_rf[miss])
+        rf_probs = lr_probs = None
     else:
-        level = "normal"
+        ml_scores, rf_probs, lr_probs = model_ml_scores(models, x_lr, x_rf)
+    t = time.perf_counter()
+
+    final_scores = risk_rules.fuse(h_scores, ml_scores)
+    levels = risk_rules.risk_levels(final_scores)
+    reasons = risk_rules.reasons_from_masks(h_masks)
+    t = STAGES["fusion"].lap(t)
+
+    version = served_version(bundle)
+    results = [
+        {
+            "risk_level": levels[i],
+            "risk_score": float(final_scores[i]),
+            "reason": reasons[i],
+            "model_version": version,
+            # Filled in below when the full models scored the row
+            "ml_risk_level": None,
+            "ml_class_probabilities": None,
+            "ml_logreg_risk_level": None,
+            "ml_logreg_class_probabilities": None,
+        }
+        for i in range(len(raw))
+    ]
+    if rf_probs is not None:
+        rf_cls = rf_probs.argmax(axis=1)
+        lr_cls = lr_probs.argmax(axis=1)
+        for i, result in enumerate(results):
+            result["ml_risk_level"] = int(rf_cls[i])
+            result["ml_class_probabilities"] = rf_probs[i].tolist()
+            result["ml_logreg_risk_level"] = int(lr_cls[i])
+            result["ml_logreg_class_probabilities"] = lr_probs[i].tolist()
+    if online_probs is not None:
+        online_cls = online_probs.argmax(axis=1)
+        for i, result in enumerate(results):
+            result["ml_online_risk_level"] = int(online_cls[i])
+            result["ml_online_class_probabilities"] = online_probs[i].tolist()
+    STAGES["serialize"].lap(t)
+    return results
+
+
+# -----------------------------
+# Background load + warm-up
+# -----------------------------
+def warmup_records(n):
+    """n readings cycling through every heuristic rule and risk band."""
+    variants = [
+        {},
+        {"systolic_bp": 165, "diastolic_bp": 112},
+        {"systolic_bp": 145, "diastolic_bp": 92},
+        {"fetal_hr": 100},
+        {"fetal_hr": 180},
+        {"spo2": 90},
+        {"temperature": 38.6},
+        {"systolic_bp": 170, "fetal_hr": 100, "spo2": 88, "temperature": 39.0},
+    ]
+    return [dict(INPUT_DEFAULTS, **variants[i % len(variants)]) for i in range(n)]
+
+
+def load_models(path):
+    models = load_scoring_models(path)
+    if LATTICE_MODE:
+        lattice = os.path.join(path, LATTICE_MODEL_DIR)
+        if not os.path.isdir(lattice):
+            logger.warning("[ML] LATTICE_MODE is set but %s has no %s; scoring every row",
+                           path, LATTICE_MODEL_DIR)
+        else:
+            stale = model_registry.derived_mismatch(path, LATTICE_MODEL_DIR)
+            if stale is None:
+                return LatticeRiskModel.load(lattice, fallback=models)
+            logger.warning("[ML] Not serving %s from %s: %s; scoring every row",
+                           LATTICE_MODEL_DIR, path, stale)
+    return models
+
+
+def load_scoring_models(path):
+    if DISTILLED_MODE:
+        distilled = os.path.join(path, DISTILLED_MODEL_DIR)
+        if not os.path.isdir(distilled):
+            logger.warning("[ML] DISTILLED_MODE is set but %s has no %s; serving the full models",
+                           path, DISTILLED_MODEL_DIR)
+        else:
+            stale = model_registry.derived_mismatch(path, DISTILLED_MODEL_DIR)
+            if stale is None:
+                return DistilledRiskModel.load(distilled)
+            logger.warning("[ML] Not serving %s from %s: %s; serving the full models",
+                           DISTILLED_MODEL_DIR, path, stale)
+    # NumPy export (export_numpy_models.py) if present, else the joblib models
+    return load_risk_model(path)
+
+
+def bundle_dir(bundle):
+    """Directory the bundle's artifacts were loaded from."""
+    if bundle.manifest is None:
+        return MODELS_DIR
+    return model_registry.version_dir(bundle.version, REGISTRY_DIR)
+
+
+def load_bundle(version):
+    """Load a registry version (checksum-verified), or the flat models/ dir."""
+    if version is None:
+        return ModelBundle(LEGACY_VERSION, load_models(MODELS_DIR), None)
+    manifest = model_registry.verify(version, REGISTRY_DIR)
+    path = model_registry.version_dir(version, REGISTRY_DIR)
+    return ModelBundle(version, load_models(path), manifest)
+
+
+def refresh_online():
+    """Swap in the online model's checkpoint if another process updated it."""
+    global online
+    version = online_logreg.checkpoint_version(ONLINE_MODEL_PATH)
+    if version is None or (online is not None and online.version == version):
+        return
+    try:
+        online = online_logreg.OnlineLogReg.load(ONLINE_MODEL_PATH)
+    except (OSError, KeyError, ValueError):
+        # Caught mid-swap; the next poll retries
+        logger.warning("[ML] Could not load online model from %s", ONLINE_MODEL_PATH)
+        return
+    cache.clear()
+    logger.info("[ML] Online model at update %d (%s)", online.n_updates, online.version)
+
+
+def warm_up(bundle):
+    for n in WARMUP_BATCH_SIZES:
+        score_batch(warmup_records(n), bundle, use_cache=False)
+
+
+def load_and_warm_up():
+    global active
+    try:
+        t0 = time.monotonic()
+        startup["state"] = "starting"
+        startup["error"] = None
+        startup["version"] = model_registry.active_version(REGISTRY_DIR)
+        bundle = load_bundle(startup["version"])
+        refresh_online()
+        startup["load_seconds"] = round(time.monotonic() - t0, 4)
+
+        startup["state"] = "warming_up"
+        t0 = time.monotonic()
+        warm_up(bundle)
+        startup["warmup_seconds"] = round(time.monotonic() - t0, 4)
+    except Exception as e:
+        startup["state"] = "failed"
+        startup["error"] = f"{type(e).__name__}: {e}"
+        logger.exception("[ML] Model load/warm-up failed")
+        return
+
+    active = bundle
+    startup["startup_seconds"] = round(time.monotonic() - PROCESS_START, 4)
+    startup["state"] = "ready"
+    ready.set()
+    logger.info(
+        "[ML] Ready (%s): load %.3fs, warm-up %.3fs, process start -> ready %.3fs",
+        bundle.version, startup["load_seconds"], startup["warmup_seconds"],
+        startup["startup_seconds"],
+    )
+
+
+def watch_registry():
+    """
+    Poll the registry's ACTIVE pointer; load + warm up a new version off the
+    request path, then swap it in. Publishing, activating and rolling back
+    (model_registry.py) all show up here as a changed ACTIVE.
+    """
+    global active
+    failed = None
+    while True:
+        time.sleep(MODEL_POLL_SECONDS)
+        refresh_online()
+        try:
+            version = model_registry.active_version(REGISTRY_DIR)
+        except OSError:
+            continue
+        if not ready.is_set():
+            # The first load failed: try again once a different version is
+            # activated (a fixed publish, or a rollback)
+            if startup["state"] == "failed" and version != startup["version"]:
+                logger.info("[ML] Retrying start-up load with %s", version)
+                load_and_warm_up()
+            continue
+        if version is None or version == active.version or version == failed:
+            continue
+
+        t0 = time.monotonic()
+        try:
+            bundle = load_bundle(version)
+            warm_up(bundle)
+        except Exception as e:
+            failed = version
+            reloads["last_error"] = f"{version}: {type(e).__name__}: {e}"
+            logger.exception("[ML] Reload of %s failed; still serving %s", version, active.version)
+            continue
+
+        previous, active = active.version, bundle
+        cache.clear()
+        failed = None
+        reloads["count"] += 1
+        reloads["last_version"] = version
+        reloads["last_seconds"] = round(time.monotonic() - t0, 4)
+        reloads["last_error"] = None
+        logger.info("[ML] Swapped model %s -> %s in %.3fs", previous, version, reloads["last_seconds"])
+
+
+batcher = None
 
+
+@asynccontextmanager
+async def lifespan(app):
+    global batcher
+    threading.Thread(target=load_and_warm_up, name="model-loader", daemon=True).start()
+    threading.Thread(target=watch_registry, name="model-watcher", daemon=True).start()
+    METRICS.start()
+    if MICROBATCH_MAX_SIZE > 1:
+        batcher = MicroBatcher(
+            score_batch,
+            max_batch_size=MICROBATCH_MAX_SIZE,
+            max_wait_s=MICROBATCH_WAIT_MS / 1000,
+            on_batch=record_microbatch,
+        )
+        batcher.start()
+    yield
+    if batcher is not None:
+        await batcher.stop()
+        batcher = None
+    METRICS.flush()
+
+
+class MetricsMiddleware:
+    """Pure ASGI (no BaseHTTPMiddleware overhead): latency, status, in-flight."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        t0 = time.perf_counter()
+        scope.setdefault("state", {})["t0"] = t0
+        path = scope["path"] if scope["path"] in ROUTE_PATHS else "other"
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            ERRORS_TOTAL.inc(path=path, kind="exception")
+            raise
+        finally:
+            IN_FLIGHT.dec()
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, path=path)
+            REQUESTS_TOTAL.inc(path=path, status=str(status[0]))
+        if status[0] >= 500:
+            ERRORS_TOTAL.inc(path=path, kind=f"http_{status[0]}")
+
+
+app = FastAPI(title="Fetal Risk ML API", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+
+
+def not_ready():
+    """None once models are usable, else the 503 to return."""
+    if ready.wait(READY_WAIT_SECONDS):
+        return None
+    return JSONResponse(
+        status_code=503,
+        content={"error": "Model not ready", **startup},
+        headers={"Retry-After": "1"},
+    )
+
+
+async def not_ready_async():
+    if ready.is_set():
+        return None
+    return await run_in_threadpool(not_ready)
+
+
+# Liveness: the process is up and serving HTTP
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+
+# Readiness: models loaded and warmed up
+@app.get("/ready")
+def readiness():
+    if not ready.is_set():
+        return JSONResponse(status_code=503, content=startup)
+    return startup
+
+
+@app.get("/model")
+def model_info():
+    bundle = active
     return {
-        "risk_level": level,
-        "risk_score": final_score,
-        "reason": "; ".join(h_reasons) if h_reasons else "Vitals within normal ranges",
-        "model_version": "heuristic + RF + logistic (calibrated)",
+        "model_version": served_version(bundle) if bundle else None,
+        "distilled": isinstance(
+            getattr(bundle.models, "fallback", bundle.models), DistilledRiskModel
+        ) if bundle else None,
+        "lattice": isinstance(bundle.models, LatticeRiskModel) if bundle else None,
+        "manifest": bundle.manifest if bundle else None,
+        "reloads": reloads,
+        "online": {
+            "updates": online.n_updates,
+            "version": online.version,
+            "samples_seen": int(online.scaler_n),
+        } if online is not None else None,
+    }
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(METRICS.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/cache")
+def cache_stats():
+    return cache.stats()
+
+
+class BatchRiskInput(BaseModel):
+    readings: List[RiskInput]
+
+
+def parsed(request):
+    """Record time from request arrival to a validated body."""
+    t0 = request.scope.get("state", {}).get("t0")
+    if t0 is not None:
+        STAGES["parse_validate"].lap(t0)
+
+
+class LabelledRiskInput(RiskInput):
+    risk_level: Union[int, str]
 
-        "ml_risk_level": int(np.argmax(rf_probs)),
-        "ml_class_probabilities": rf_probs.tolist(),
 
-        "ml_logreg_risk_level": int(np.argmax(lr_probs)),
-        "ml_logreg_class_probabilities": lr_probs.tolist(),
+class OnlineUpdateInput(BaseModel):
+    readings: List[LabelledRiskInput]
+
+
+@app.post("/online_update")
+def online_update(data: OnlineUpdateInput, request: Request):
+    """
+    One incremental update of the online logistic model from labelled
+    readings; checkpointed before returning, so every worker picks it up.
+    The first update seeds the model from the active version's logistic
+    weights (409 if it has none).
+    """
+    global online
+    parsed(request)
+    unavailable = not_ready()
+    if unavailable:
+        return unavailable
+    if not data.readings:
+        return {"updates": online.n_updates if online is not None else 0, "rows": 0}
+    try:
+        y = online_logreg.encode_labels([r.risk_level for r in data.readings])
+    except ValueError as e:
+        return JSONResponse(status_code=422, content={"error": str(e)})
+
+    raw = input_matrix([r.dict() for r in data.readings])
+    x = raw[:, [INPUT_FIELDS.index(k) for k in online_logreg.FEATURES]]
+
+    t0 = time.perf_counter()
+    try:
+        model = online_logreg.update_checkpoint(
+            ONLINE_MODEL_PATH, x, y, seed_dir=bundle_dir(active)
+        )
+    except online_logreg.NotSeededError as e:
+        return JSONResponse(status_code=409, content={"error": str(e)})
+    online = model
+    cache.clear()
+    ONLINE_ROWS.inc(len(y))
+    return {
+        "updates": model.n_updates,
+        "rows": len(y),
+        "samples_seen": int(model.scaler_n),
+        "seconds": round(time.perf_counter() - t0, 4),
     }
+
+
+class PatientHistory(BaseModel):
+    patient_id: Optional[Union[int, str]] = None
+    # Oldest first; `times` (same length) if the readings aren't hourly
+    scores: List[float]
+    times: Optional[List[datetime]] = None
+
+    @validator("times", each_item=True)
+    def naive_times_are_utc(cls, t):
+        # Mixed aware / naive timestamps can't be compared or sorted
+        return t.replace(tzinfo=timezone.utc) if t.tzinfo is None else t
+
+
+class ForecastInput(BaseModel):
+    patients: List[PatientHistory]
+    horizons: List[confloat(gt=0, le=forecast.MAX_HORIZON_HOURS)] = list(forecast.HORIZON_HOURS)
+
+
+@app.post("/forecast")
+def forecast_risk(data: ForecastInput, request: Request):
+    """
+    Risk trajectory for many patients in one call: linear / EWMA /
+    damped-trend fits over each score history (see forecast.py), averaged,
+    with an uncertainty band, at every horizon.
+    """
+    parsed(request)
+    for i, p in enumerate(data.patients):
+        if p.times is not None and len(p.times) != len(p.scores):
+            return JSONResponse(status_code=422, content={
+                "error": f"patients[{i}]: {len(p.times)} times for {len(p.scores)} scores"
+            })
+
+    hours = [
+        None if p.times is None else [t.timestamp() / 3600 for t in p.times]
+        for p in data.patients
+    ]
+    y, x, mask = forecast.pad_histories([p.scores for p in data.patients], hours)
+    out = forecast.forecast_matrix(y, x, mask, data.horizons)
+
+    # Rounded in bulk and handed out as plain lists: per-element float()
+    # and FastAPI's recursive encoder cost far more than the fits
+    columns = {k: np.round(out[k], 3).tolist() for k in ("score", "lower", "upper", *forecast.MODELS)}
+    levels = out["level"].tolist()
+    history_points = mask.sum(axis=1).tolist()
+
+    results = []
+    for i, p in enumerate(data.patients):
+        base_time = max(p.times) if p.times else None
+        points = [] if not p.scores else [
+            {
+                "horizon_hours": h,
+                "at": (base_time + timedelta(hours=h)).isoformat() if base_time else None,
+                "risk_score": columns["score"][i][j],
+                "risk_level": levels[i][j],
+                "lower": columns["lower"][i][j],
+                "upper": columns["upper"][i][j],
+                "models": {m: columns[m][i][j] for m in forecast.MODELS},
+            }
+            for j, h in enumerate(data.horizons)
+        ]
+        results.append({
+            "patient_id": p.patient_id,
+            "base_time": base_time.isoformat() if base_time else None,
+            "history_points": history_points[i],
+            "method": forecast.METHOD,
+            "points": points,
+        })
+    return JSONResponse(content={"forecasts": results})
+
+
+@app.post("/predict")
+async def predict(data: RiskInput, request: Request):
+    parsed(request)
+    unavailable = await not_ready_async()
+    if unavailable:
+        return unavailable
+    if batcher is not None:
+        result = await batcher.submit(data.dict())
+    else:
+        result = (await run_in_threadpool(score_batch, [data.dict()]))[0]
+    record_predictions([result])
+    return result
+
+
+@app.post("/predict_batch")
+def predict_batch(data: BatchRiskInput, request: Request):
+    parsed(request)
+    unavailable = not_ready()
+    if unavailable:
+        return unavailable
+    if not data.readings:
+        return {"results": []}
+    results = score_batch([r.dict() for r in data.readings])
+    record_predictions(results)
+    return {"results": results}
+
+
+def stream_line_error(exc):
+    if hasattr(exc, "errors"):
+        return "; ".join(
+            ".".join(str(p) for p in err["loc"]) + ": " + err["msg"] for err in exc.errors()
+        )
+    return str(exc)
+
+
+def parse_stream_line(line):
+    """Validated reading dict for one NDJSON line; raises ValueError/TypeError."""
+    obj = json.loads(line)
+    if not isinstance(obj, dict):
+        raise TypeError("expected a JSON object")
+    return RiskInput(**obj).dict()
+
+
+async def score_stream(chunks):
+    """
+    NDJSON in -> NDJSON out. Lines are validated as they arrive, scored
+    STREAM_CHUNK_SIZE at a time and written back in input order, each
+    tagged with its 1-based "line" (and the input "id", if any). Bad lines
+    come back as {"line": n, "error": ...} and the stream carries on.
+    """
+    bundle = active  # one model version for the whole stream
+    pending = []  # (line_no, record or None, error or None)
+
+    async def flush():
+        records = [record for _, record, _ in pending if record is not None]
+        # Bulk rows are mostly one-offs: score them exactly, don't churn the cache
+        results = await run_in_threadpool(score_batch, records, bundle, False) if records else []
+        record_predictions(results)
+        STREAM_LINES.inc(len(records), outcome="scored")
+        STREAM_LINES.inc(len(pending) - len(records), outcome="error")
+
+        scored = iter(results)
+        out = []
+        for line_no, record, error in pending:
+            if record is None:
+                row = {"line": line_no, "error": error}
+            else:
+                row = {"line": line_no, **next(scored)}
+                if record.get("id") is not None:
+                    row["id"] = record["id"]
+            out.append(json.dumps(row) + "\n")
+        pending.clear()
+        return "".join(out).encode()
+
+    async for line_no, line in ndjson_stream.iter_lines(chunks, STREAM_MAX_LINE_BYTES):
+        if line is None:
+            pending.append((line_no, None, f"line exceeds {STREAM_MAX_LINE_BYTES} bytes"))
+        elif not line.strip():
+            continue
+        else:
+            try:
+                pending.append((line_no, parse_stream_line(line), None))
+            except (ValueError, TypeError) as e:
+                pending.append((line_no, None, stream_line_error(e)))
+        if len(pending) >= STREAM_CHUNK_SIZE:
+            yield await flush()
+    if pending:
+        yield await flush()
+
+
+@app.post("/predict_stream")
+async def predict_stream(request: Request):
+    """Bulk scoring: chunked NDJSON readings in, NDJSON results streamed back."""
+    unavailable = await not_ready_async()
+    if unavailable:
+        return unavailable
+    return ndjson_stream.NDJSONStreamResponse(score_stream(request.stream()))
+
+
+# Known paths only, so unknown URLs can't blow up label cardinality
+ROUTE_PATHS = {route.path for route in app.routes}
@@ -0,0 +1,307 @@
+"""
+Minimal Prometheus metrics (text exposition format 0.0.4) for ml-api.
+
+Kept dependency-free and cheap enough to leave on in production: an
+observation is a bisect plus a few additions under a lock.
+
+Multi-worker mode (Registry(multiprocess_dir=...), set up by serve.py):
+every worker writes a snapshot of its metrics to <dir>/<pid>.json every
+flush_seconds and when it renders. A scrape, served by whichever worker,
+writes its own snapshot and then merges all of them: counters and
+histograms are summed (including workers that have exited), gauges are
+summed or max-ed over live workers. Since each file only ever grows, merged
+counters never go down between scrapes; other workers' numbers can lag by
+up to flush_seconds.
+"""
+
+from bisect import bisect_left
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Seconds; spans a cache hit (~30us) up to a large batch
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+
+def _label_str(labels, extra=None):
+    items = list(labels)
+    if extra:
+        items.append(extra)
+    if not items:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in items
+    )
+    return "{" + body + "}"
+
+
+def _fmt(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, registry):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        self._values = {}
+        registry.register(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in sorted(items):
+            lines.extend(self._render_one(labels, value))
+        return lines
+
+    def _render_one(self, labels, value):
+        return [f"{self.name}{_label_str(labels)} {_fmt(value)}"]
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(map(list, labels)), value] for labels, value in self._values.items()]
+
+    def merge(self, snapshots):
+        """{labels: value} over the given per-worker snapshots."""
+        merged = {}
+        for items in snapshots:
+            for labels, value in items:
+                key = tuple(tuple(pair) for pair in labels)
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def render_merged(self, merged):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(merged.items()):
+            lines.extend(self._render_one(labels, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value, **labels):
+        """For collectors mirroring a count kept elsewhere (never decreases)."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+    # Multi-worker merge over live workers: "sum" or "max"
+    MODES = {"sum": sum, "max": max}
+
+    def __init__(self, name, help_text, registry, multiprocess_mode="sum"):
+        super().__init__(name, help_text, registry)
+        self.multiprocess_mode = multiprocess_mode
+
+    def merge(self, snapshots):
+        combine = self.MODES[self.multiprocess_mode]
+        values = {}
+        for items in snapshots:
+            for labels, value in items:
+                values.setdefault(tuple(tuple(pair) for pair in labels), []).append(value)
+        return {key: combine(v) for key, v in values.items()}
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, registry, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, registry)
+        self.buckets = tuple(buckets)
+
+    def labels(self, **labels):
+        """Pre-bound child; skips building the label key on every observation."""
+        return _BoundHistogram(self, tuple(sorted(labels.items())))
+
+    def observe(self, value, **labels):
+        self._observe(tuple(sorted(labels.items())), value)
+
+    def _observe(self, key, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                [list(map(list, labels)), [state[0][:], state[1], state[2]]]
+                for labels, state in self._values.items()
+            ]
+
+    def merge(self, snapshots):
+        merged = {}
+        for items in snapshots:
+            for labels, (counts, total, n) in items:
+                key = tuple(tuple(pair) for pair in labels)
+                state = merged.setdefault(key, [[0] * len(counts), 0.0, 0])
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+                state[2] += n
+        return merged
+
+    def _render_one(self, labels, state):
+        counts, total, n = state[0][:], state[1], state[2]
+        lines = []
+        cumulative = 0
+        for bound, c in zip(self.buckets + (float("inf"),), counts):
+            cumulative += c
+            lines.append(
+                f"{self.name}_bucket{_label_str(labels, ('le', _fmt(bound)))} {cumulative}"
+            )
+        lines.append(f"{self.name}_sum{_label_str(labels)} {_fmt(total)}")
+        lines.append(f"{self.name}_count{_label_str(labels)} {n}")
+        return lines
+
+
+class _BoundHistogram:
+    __slots__ = ("_hist", "_key")
+
+    def __init__(self, hist, key):
+        self._hist = hist
+        self._key = key
+
+    def observe(self, value):
+        self._hist._observe(self._key, value)
+
+    def lap(self, t0):
+        """Observe perf_counter() - t0 and return the new perf_counter()."""
+        now = time.perf_counter()
+        self._hist._observe(self._key, now - t0)
+        return now
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    def __init__(self, multiprocess_dir=None, flush_seconds=1.0):
+        self._metrics = []
+        self._collectors = []
+        self.multiprocess_dir = multiprocess_dir
+        self.flush_seconds = flush_seconds
+        self._flusher = None
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def add_collector(self, fn):
+        """fn() is called before every render (refresh gauges from state)."""
+        self._collectors.append(fn)
+
+    def render(self):
+        for fn in self._collectors:
+            fn()
+        if self.multiprocess_dir is not None:
+            return self._render_multiprocess()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    # -----------------------------
+    # Multi-worker mode
+    # -----------------------------
+    def start(self):
+        """Begin periodic snapshots (no-op without multiprocess_dir)."""
+        if self.multiprocess_dir is None or self._flusher is not None:
+            return
+        os.makedirs(self.multiprocess_dir, exist_ok=True)
+        self._flusher = threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            self.flush()
+
+    def flush(self):
+        """Write this process's snapshot to <multiprocess_dir>/<pid>.json."""
+        if self.multiprocess_dir is None:
+            return
+        for fn in self._collectors:
+            fn()
+        self._write_snapshot()
+
+    def _write_snapshot(self):
+        snapshot = {m.name: m.snapshot() for m in self._metrics}
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=self.multiprocess_dir)
+        with os.fdopen(fd, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, os.path.join(self.multiprocess_dir, f"{os.getpid()}.json"))
+
+    def _read_snapshots(self):
+        """[(pid, alive, snapshot)] for every worker that has written one."""
+        out = []
+        for name in os.listdir(self.multiprocess_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.multiprocess_dir, name)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            pid = int(name[:-len(".json")])
+            out.append((pid, _alive(pid), snapshot))
+        return out
+
+    def _render_multiprocess(self):
+        self._write_snapshot()
+        workers = self._read_snapshots()
+        lines = []
+        for metric in self._metrics:
+            snapshots = [
+                snapshot.get(metric.name, [])
+                for _, alive, snapshot in workers
+                # A dead worker's counts still happened; its gauges are gone
+                if alive or metric.kind != "gauge"
+            ]
+            lines.extend(metric.render_merged(metric.merge(snapshots)))
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,109 @@
+"""
+Asyncio micro-batcher for concurrent /predict calls.
+
+Each request parks a future in a queue. One background task drains the
+queue into batches, bounded by max_batch_size and by a short collection
+window, and scores each batch with a single vectorized call on a worker
+thread. The event loop keeps accepting requests while that call runs.
+Every request gets its own row back.
+
+The window adapts to load. When recent batches are all singletons,
+nobody else is waiting, so a lone request is dispatched immediately and
+pays no added latency. Once requests overlap, the batcher waits up to
+max_wait_s to let a batch fill.
+"""
+
+import asyncio
+import time
+
+
+class MicroBatcher:
+    def __init__(self, score_fn, max_batch_size=64, max_wait_s=0.002, on_batch=None):
+        """
+        score_fn(records) -> results, same order; runs in the default executor.
+        on_batch(size, queue_waits_s, window_s) is called after every batch.
+        """
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_s
+        self.on_batch = on_batch
+
+        self._queue = []  # (record, future, enqueued_at)
+        self._wakeup = None
+        self._task = None
+        self._avg_batch = 1.0  # EWMA of recent batch sizes
+
+    @property
+    def window_s(self):
+        return self.max_wait_s if self._avg_batch >= 1.5 else 0.0
+
+    @property
+    def depth(self):
+        return len(self._queue)
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for _, future, _ in self._queue:
+            if not future.done():
+                future.cancel()
+        self._queue.clear()
+
+    async def submit(self, record):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((record, future, time.perf_counter()))
+        self._wakeup.set()
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._queue:
+                continue
+
+            window = self.window_s
+            if window and len(self._queue) < self.max_batch_size:
+                deadline = self._queue[0][2] + window
+                while len(self._queue) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    self._wakeup.clear()
+
+            batch = self._queue[:self.max_batch_size]
+            del self._queue[:self.max_batch_size]
+            if self._queue:
+                self._wakeup.set()  # leftovers go straight into the next batch
+
+            started = time.perf_counter()
+            waits = [started - enqueued for _, _, enqueued in batch]
+            try:
+                results = await loop.run_in_executor(
+                    None, self.score_fn, [record for record, _, _ in batch]
+                )
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future, _), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+
+            self._avg_batch = 0.8 * self._avg_batch + 0.2 * len(batch)
+            if self.on_batch is not None:
+                self.on_batch(len(batch), waits, window)
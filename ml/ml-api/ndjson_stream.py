@@ -0,0 +1,63 @@
+"""
+NDJSON request/response streaming for the bulk-scoring endpoint.
+
+The request body is consumed chunk by chunk as it arrives and split into
+lines without ever holding more than one (bounded) partial line, and the
+response is sent as it is produced - so a multi-GB upload is scored with
+constant memory.
+"""
+
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+
+MEDIA_TYPE = "application/x-ndjson"
+
+
+async def iter_lines(chunks, max_line_bytes):
+    """
+    Yield (line_no, bytes) for every line of an async iterator of byte
+    chunks; line_no is 1-based. Lines longer than max_line_bytes are
+    dropped as they stream in and yielded as (line_no, None).
+    """
+    buf = bytearray()
+    line_no = 0
+    oversized = False
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        buf += chunk
+        start = 0
+        while True:
+            end = buf.find(b"\n", start)
+            if end < 0:
+                break
+            line_no += 1
+            yield line_no, None if oversized else bytes(buf[start:end])
+            oversized = False
+            start = end + 1
+        del buf[:start]
+        if len(buf) > max_line_bytes:
+            oversized = True
+            buf.clear()
+    if buf or oversized:
+        yield line_no + 1, None if oversized else bytes(buf)
+
+
+class NDJSONStreamResponse(StreamingResponse):
+    """
+    StreamingResponse whose body iterator reads the request body itself.
+
+    The stock class (ASGI spec < 2.4, which uvicorn reports) listens on
+    `receive` for a disconnect while streaming, which would swallow request
+    body chunks. Here the body iterator is the only reader of `receive`;
+    a client disconnect surfaces there as ClientDisconnect and just ends
+    the response.
+    """
+
+    media_type = MEDIA_TYPE
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except ClientDisconnect:
+            pass
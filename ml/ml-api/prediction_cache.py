@@ -0,0 +1,125 @@
+"""
+In-process LRU + TTL cache of /predict results.
+
+Vitals come from the `readings` table as integers (temperature with one
+decimal), and dashboards re-post the latest reading on every poll, so the
+same feature vectors arrive over and over. A hit skips the rules, both
+scalers and both models.
+
+Keys are (model version, normalised feature vector), where the version
+identifies every model behind a cached result (in ml-api: the registry
+version and the online model's checkpoint). Only vectors already
+on the stored grid (see QUANTUM_DECIMALS) are cached - anything finer is
+scored exactly every time, so a cached answer is always the answer the
+model would have given.
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+import numpy as np
+
+# Decimal places the readings table stores per field
+QUANTUM_DECIMALS = {
+    "maternal_hr": 0,
+    "systolic_bp": 0,
+    "diastolic_bp": 0,
+    "fetal_hr": 0,
+    "fetal_movement_count": 0,
+    "spo2": 0,
+    "temperature": 1,
+    "age": 0,
+    "bs": 1,
+}
+
+
+class PredictionCache:
+    def __init__(self, fields, max_size=4096, ttl_seconds=300.0):
+        self.fields = list(fields)
+        self.decimals = np.array([QUANTUM_DECIMALS.get(f, 1) for f in self.fields])
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+
+        self._data = OrderedDict()  # key -> (expires_at, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def keys_for(self, version, raw):
+        """
+        One key per row of the (n, len(fields)) input matrix; None where the
+        row is off-grid and must not be cached.
+        """
+        on_grid = np.ones(len(raw), dtype=bool)
+        for decimals in np.unique(self.decimals):
+            cols = self.decimals == decimals
+            on_grid &= (np.round(raw[:, cols], decimals) == raw[:, cols]).all(axis=1)
+        # + 0.0 folds -0.0 into 0.0 so they share a key
+        rows = (raw + 0.0).tolist()
+        return [(version, tuple(row)) if ok else None for row, ok in zip(rows, on_grid)]
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        out = []
+        with self._lock:
+            for key in keys:
+                if key is None:
+                    self.bypassed += 1
+                    out.append(None)
+                    continue
+                entry = self._data.get(key)
+                if entry is not None and entry[0] < now:
+                    del self._data[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    out.append(None)
+                else:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    out.append(entry[1])
+        return out
+
+    def put_many(self, keys, results):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, result in zip(keys, results):
+                if key is None:
+                    continue
+                self._data[key] = (expires_at, result)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop everything (model swapped - old-version keys can never hit)."""
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "bypassed_off_grid": self.bypassed,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
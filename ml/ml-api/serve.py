@@ -0,0 +1,65 @@
+"""
+Multi-worker launcher for the ML API.
+
+    python serve.py                 # one worker per available CPU
+    WEB_CONCURRENCY=2 python serve.py
+
+Each worker memory-maps the same exported model arrays
+(models/maternal_risk_numpy/*.npy, read-only), so the forest lives once in
+the page cache however many workers run, and a new worker starts without
+unpickling anything.
+
+With more than one worker, /metrics is aggregated over all of them through
+snapshot files in METRICS_MULTIPROC_DIR (a fresh temp dir unless set; see
+metrics.py), so counters don't depend on which worker answers a scrape.
+"""
+
+import os
+import shutil
+import tempfile
+
+import uvicorn
+
+
+def available_cpus():
+    """CPUs this process may use: affinity mask, capped by a cgroup v2 quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def main():
+    workers = int(os.environ.get("WEB_CONCURRENCY", available_cpus()))
+    metrics_dir = None
+    if workers > 1:
+        metrics_dir = os.environ.get("METRICS_MULTIPROC_DIR")
+        if metrics_dir:
+            # Snapshots of a previous run's workers would be summed in
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+            os.makedirs(metrics_dir)
+        else:
+            metrics_dir = tempfile.mkdtemp(prefix="ml-api-metrics-")
+            os.environ["METRICS_MULTIPROC_DIR"] = metrics_dir
+    try:
+        uvicorn.run(
+            "main:app",
+            host=os.environ.get("HOST", "0.0.0.0"),
+            port=int(os.environ.get("PORT", "8000")),
+            workers=workers,
+        )
+    finally:
+        if metrics_dir is not None:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
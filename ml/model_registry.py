@@ -0,0 +1,338 @@
+"""
+Versioned model registry for the fused RF + logistic model.
+
+Layout (ml/models/registry/):
+    <version>/               one immutable directory per published model set
+        manifest.json        version, features, metrics, per-file sha256, checksum
+        maternal_risk_*.joblib / *_meta.json / maternal_risk_numpy/
+    ACTIVE                   name of the version ml-api should serve
+    HISTORY                  one activated version per line (for rollback)
+
+Training scripts keep writing to ml/models/; publishing snapshots that
+directory into a new version. ml-api polls ACTIVE and hot-swaps.
+
+Usage:
+    python model_registry.py publish [--activate] [--metrics '{"f1": 0.9}']
+    python model_registry.py list
+    python model_registry.py activate <version>
+    python model_registry.py rollback
+    python model_registry.py verify <version>
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+REGISTRY_DIR = os.environ.get("MODEL_REGISTRY_DIR", os.path.join(MODELS_DIR, "registry"))
+
+MANIFEST_FILE = "manifest.json"
+ACTIVE_FILE = "ACTIVE"
+HISTORY_FILE = "HISTORY"
+
+ARTIFACTS = [
+    "maternal_risk_rf_pso_multi.joblib",
+    "maternal_risk_scaler_multi.joblib",
+    "maternal_risk_meta_multi.json",
+    "maternal_risk_logreg.joblib",
+    "maternal_risk_logreg_scaler.joblib",
+    "maternal_risk_logreg_meta.json",
+    "maternal_risk_numpy",
+    # Written by train_all.py
+    "maternal_risk_rf_pso_tuned.joblib",
+    "maternal_risk_scaler_pso_tuned.joblib",
+    "maternal_risk_meta_pso_tuned.json",
+    "training_run.json",
+    # Written by distill.py
+    "maternal_risk_distilled",
+    "maternal_risk_distilled.json",
+    # Written by build_lattice.py
+    "maternal_risk_lattice",
+    "maternal_risk_lattice.json",
+]
+# The models the derived artifacts below are built from (joblib + NumPy export)
+TEACHER_ARTIFACTS = [
+    "maternal_risk_rf_pso_multi.joblib",
+    "maternal_risk_scaler_multi.joblib",
+    "maternal_risk_logreg.joblib",
+    "maternal_risk_logreg_scaler.joblib",
+    "maternal_risk_numpy",
+]
+# Built from the models above, so stale once they change. Artifact -> its
+# report, whose "teacher_artifacts" records the teacher's hashes
+# (teacher_hashes) at build time; the NumPy export has no report (its
+# parity is checked when it is written).
+DERIVED_ARTIFACTS = {
+    "maternal_risk_numpy": None,
+    "maternal_risk_distilled": "maternal_risk_distilled.json",
+    "maternal_risk_lattice": "maternal_risk_lattice.json",
+}
+RF_META_FILE = "maternal_risk_meta_multi.json"
+LOGREG_META_FILE = "maternal_risk_logreg_meta.json"
+
+
+class RegistryError(Exception):
+    pass
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_hashes(version_dir):
+    """relative path -> sha256 for every artifact file under version_dir."""
+    hashes = {}
+    for root, _, files in os.walk(version_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, version_dir).replace(os.sep, "/")
+            if rel != MANIFEST_FILE:
+                hashes[rel] = _sha256(path)
+    return dict(sorted(hashes.items()))
+
+
+def teacher_hashes(models_dir):
+    """relative path -> sha256 for the TEACHER_ARTIFACTS present in models_dir."""
+    hashes = {}
+    for name in TEACHER_ARTIFACTS:
+        path = os.path.join(models_dir, name)
+        if os.path.isdir(path):
+            hashes.update({f"{name}/{rel}": digest for rel, digest in file_hashes(path).items()})
+        elif os.path.exists(path):
+            hashes[name] = _sha256(path)
+    return hashes
+
+
+def derived_mismatch(models_dir, name):
+    """
+    None if derived artifact `name` in models_dir was built from the models
+    next to it, else the reason it can't be trusted. Teacher files missing
+    now (e.g. joblib in the ml-api image) are skipped; at least one must
+    still be there and every one that is must be unchanged.
+    """
+    recorded = _read_json(os.path.join(models_dir, DERIVED_ARTIFACTS[name])).get("teacher_artifacts")
+    if not recorded:
+        return f"{DERIVED_ARTIFACTS[name]} records no teacher_artifacts"
+    current = teacher_hashes(models_dir)
+    common = sorted(recorded.keys() & current.keys())
+    if not common:
+        return "none of the models it was built from are present"
+    changed = [rel for rel in common if current[rel] != recorded[rel]]
+    if changed:
+        return "built from other models (" + ", ".join(changed) + " changed since)"
+    return None
+
+
+def remove_derived(models_dir, keep=()):
+    """Delete the derived artifacts (and reports) in models_dir not in `keep`."""
+    for name, report in DERIVED_ARTIFACTS.items():
+        if name in keep:
+            continue
+        path = os.path.join(models_dir, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+            print(f"[INFO] Removed {path} (not rebuilt for these models)")
+        if report and os.path.exists(os.path.join(models_dir, report)):
+            os.remove(os.path.join(models_dir, report))
+
+
+def combined_checksum(hashes):
+    lines = "".join(f"{rel}:{digest}\n" for rel, digest in sorted(hashes.items()))
+    return hashlib.sha256(lines.encode()).hexdigest()
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_atomic(path, text):
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def version_dir(version, registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, version)
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(
+        v for v in os.listdir(registry_dir)
+        if os.path.exists(os.path.join(registry_dir, v, MANIFEST_FILE))
+    )
+
+
+def load_manifest(version, registry_dir=REGISTRY_DIR):
+    path = os.path.join(version_dir(version, registry_dir), MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise RegistryError(f"Unknown model version: {version}")
+    return _read_json(path)
+
+
+def active_version(registry_dir=REGISTRY_DIR):
+    path = os.path.join(registry_dir, ACTIVE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read().strip() or None
+
+
+def verify(version, registry_dir=REGISTRY_DIR):
+    """Raise RegistryError unless the files on disk match the manifest."""
+    manifest = load_manifest(version, registry_dir)
+    hashes = file_hashes(version_dir(version, registry_dir))
+    if hashes != manifest["files"] or combined_checksum(hashes) != manifest["checksum"]:
+        raise RegistryError(f"Checksum mismatch for model version {version}")
+    return manifest
+
+
+def publish(source_dir=MODELS_DIR, metrics=None, activate_now=False, registry_dir=REGISTRY_DIR):
+    """Snapshot the artifacts in source_dir into a new immutable version."""
+    os.makedirs(registry_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=registry_dir)
+
+    # Built from other models than the ones being published: leave them out
+    stale = set()
+    for name, report in DERIVED_ARTIFACTS.items():
+        if report and os.path.isdir(os.path.join(source_dir, name)):
+            reason = derived_mismatch(source_dir, name)
+            if reason:
+                print(f"[WARN] Not publishing {name}: {reason}")
+                stale.update((name, report))
+
+    copied = []
+    for name in ARTIFACTS:
+        src = os.path.join(source_dir, name)
+        if name in stale:
+            continue
+        if os.path.isdir(src):
+            shutil.copytree(src, os.path.join(tmp_dir, name))
+        elif os.path.exists(src):
+            shutil.copy2(src, os.path.join(tmp_dir, name))
+        else:
+            continue
+        copied.append(name)
+
+    if not copied:
+        shutil.rmtree(tmp_dir)
+        raise RegistryError(f"No model artifacts found in {source_dir}")
+
+    rf_meta = _read_json(os.path.join(source_dir, RF_META_FILE))
+    lr_meta = _read_json(os.path.join(source_dir, LOGREG_META_FILE))
+
+    hashes = file_hashes(tmp_dir)
+    checksum = combined_checksum(hashes)
+    version = time.strftime("%Y%m%d-%H%M%S", time.gmtime()) + "-" + checksum[:8]
+
+    manifest = {
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "features": {
+            "rf": rf_meta.get("features"),
+            "logreg": lr_meta.get("features"),
+        },
+        "label_mapping": rf_meta.get("label_mapping") or lr_meta.get("label_mapping"),
+        "metrics": dict(
+            {k: v for k, v in rf_meta.items() if k.startswith("best_") or k == "n_samples"},
+            **(metrics or {}),
+        ),
+        "files": hashes,
+        "checksum": checksum,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    os.rename(tmp_dir, version_dir(version, registry_dir))
+    if activate_now:
+        activate(version, registry_dir)
+    return version
+
+
+def activate(version, registry_dir=REGISTRY_DIR):
+    verify(version, registry_dir)
+    with open(os.path.join(registry_dir, HISTORY_FILE), "a") as f:
+        f.write(version + "\n")
+    _write_atomic(os.path.join(registry_dir, ACTIVE_FILE), version + "\n")
+
+
+def rollback(registry_dir=REGISTRY_DIR):
+    """
+    Re-activate the version that was active before the current one.
+    HISTORY works as a stack, so repeated rollbacks keep walking back.
+    """
+    current = active_version(registry_dir)
+    path = os.path.join(registry_dir, HISTORY_FILE)
+    history = []
+    if os.path.exists(path):
+        with open(path) as f:
+            history = [line.strip() for line in f if line.strip()]
+
+    while history and history[-1] == current:
+        history.pop()
+    if not history:
+        raise RegistryError("No earlier model version to roll back to")
+
+    previous = history[-1]
+    verify(previous, registry_dir)
+    _write_atomic(path, "".join(v + "\n" for v in history))
+    _write_atomic(os.path.join(registry_dir, ACTIVE_FILE), previous + "\n")
+    return previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Versioned model registry")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("publish", help="snapshot ml/models/ as a new version")
+    p.add_argument("--source", default=MODELS_DIR)
+    p.add_argument("--metrics", default=None, help="extra metrics as a JSON object")
+    p.add_argument("--activate", action="store_true")
+
+    sub.add_parser("list")
+    p = sub.add_parser("activate")
+    p.add_argument("version")
+    sub.add_parser("rollback")
+    p = sub.add_parser("verify")
+    p.add_argument("version")
+
+    args = parser.parse_args()
+    try:
+        if args.cmd == "publish":
+            metrics = json.loads(args.metrics) if args.metrics else None
+            version = publish(args.source, metrics, args.activate)
+            print(f"[INFO] Published {version}" + (" (active)" if args.activate else ""))
+        elif args.cmd == "list":
+            current = active_version()
+            for v in list_versions():
+                print(("* " if v == current else "  ") + v)
+        elif args.cmd == "activate":
+            activate(args.version)
+            print(f"[INFO] Active version: {args.version}")
+        elif args.cmd == "rollback":
+            print(f"[INFO] Rolled back to {rollback()}")
+        elif args.cmd == "verify":
+            verify(args.version)
+            print(f"[INFO] {args.version} OK")
+    except RegistryError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+"""
+Incrementally updated multinomial logistic model.
+
+    python online_logreg.py init                      # seed from the batch logistic model
+    python online_logreg.py update labelled.csv       # ingest newly labelled readings
+    python online_logreg.py status
+
+The batch model (train_logreg_multi.py) is refit over the whole corpus.
+This one is updated in place from mini-batches of labelled readings:
+
+  - the feature scaler is a running mean / variance (Chan's parallel
+    update), so it never needs the history;
+  - the weights take softmax-regression SGD steps on each batch, with
+    class weights from running class counts ("balanced", like the batch
+    model). When the scaler statistics move, the weights are first
+    re-expressed for the new scaling so the model's raw-feature decision
+    function is unchanged, then the gradient step is taken.
+
+An update costs O(batch x features x classes), whatever the history size.
+
+The model always starts from the batch model's weights and scaler - the
+joblib artifacts or, where scikit-learn isn't installed (the ml-api
+image), the NumPy export (inference.NUMPY_MODEL_DIR). With neither there
+is nothing to update (NotSeededError): an all-zero model fitted on one
+mini-batch is not worth serving.
+
+State is a directory of .npy files (models/online_logreg/) written with
+inference.save_arrays, i.e. swapped atomically. update_checkpoint() holds
+an exclusive file lock for load -> update -> save, so the CLI and any
+number of ml-api workers can feed updates without losing one. ml-api picks
+up new checkpoints by polling checkpoint_version(): the update count plus
+a content hash, so a re-seeded model is noticed even at the same count.
+
+Labelled CSV columns: age, systolic_bp, diastolic_bp, bs, temperature,
+maternal_hr and risk_level (0/1/2 or "low risk" / "mid risk" / "high risk").
+"""
+
+import argparse
+import fcntl
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+
+from inference import (
+    LOGREG_MODEL_FILE,
+    LOGREG_SCALER_FILE,
+    NUMPY_MODEL_DIR,
+    load_arrays,
+    save_arrays,
+    softmax_rows,
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+ONLINE_MODEL_DIR = "online_logreg"
+LOCK_FILE = ONLINE_MODEL_DIR + ".lock"
+
+# Same inputs (and order) as the batch logistic model
+FEATURES = ["age", "systolic_bp", "diastolic_bp", "bs", "temperature", "maternal_hr"]
+LABEL_FIELD = "risk_level"
+LABELS = {"low risk": 0, "mid risk": 1, "high risk": 2}
+LABEL_ALIASES = dict(LABELS, low=0, mid=1, medium=1, high=2)
+
+LEARNING_RATE = 0.05
+ALPHA = 1e-4  # L2 penalty
+EPOCHS = 1    # passes over each incoming batch
+MINIBATCH = 64
+# Scaler sample count assumed for exports that predate lr_scaler_n
+SEED_SAMPLES = 1000
+
+
+class NotSeededError(Exception):
+    pass
+
+
+def encode_labels(values):
+    """0/1/2 or label names -> int array; ValueError on anything else."""
+    codes = []
+    for v in values:
+        if isinstance(v, str):
+            key = v.strip().lower()
+            if key.isdigit():
+                v = int(key)
+            elif key in LABEL_ALIASES:
+                v = LABEL_ALIASES[key]
+            else:
+                raise ValueError(f"Unknown risk label: {v!r}")
+        if int(v) != v or not 0 <= int(v) < len(LABELS):
+            raise ValueError(f"Unknown risk label: {v!r}")
+        codes.append(int(v))
+    return np.array(codes, dtype=np.int64)
+
+
+class OnlineLogReg:
+    def __init__(self, arrays):
+        self.coef = np.array(arrays["coef"], dtype=float)              # (k, d), standardized space
+        self.intercept = np.array(arrays["intercept"], dtype=float)    # (k,)
+        self.classes = np.array(arrays["classes"])
+        self.scaler_n = float(np.asarray(arrays["scaler_n"]).item())
+        self.scaler_mean = np.array(arrays["scaler_mean"], dtype=float)
+        self.scaler_m2 = np.array(arrays["scaler_m2"], dtype=float)
+        self.class_counts = np.array(arrays["class_counts"], dtype=float)
+        self.n_updates = int(np.asarray(arrays["n_updates"]).item())
+        # Content hash written by save(); None until saved or after an update
+        self.checkpoint_id = (
+            str(np.asarray(arrays["checkpoint_id"]).item()) if "checkpoint_id" in arrays else None
+        )
+
+    @classmethod
+    def empty(cls, n_features=len(FEATURES), n_classes=len(LABELS)):
+        return cls({
+            "coef": np.zeros((n_classes, n_features)),
+            "intercept": np.zeros(n_classes),
+            "classes": np.arange(n_classes),
+            "scaler_n": 0.0,
+            "scaler_mean": np.zeros(n_features),
+            "scaler_m2": np.zeros(n_features),
+            "class_counts": np.zeros(n_classes),
+            "n_updates": 0,
+        })
+
+    @classmethod
+    def from_batch_model(cls, models_dir=MODELS_DIR):
+        """Start from train_logreg_multi.py's model and scaler."""
+        import joblib
+
+        model = joblib.load(os.path.join(models_dir, LOGREG_MODEL_FILE))
+        scaler = joblib.load(os.path.join(models_dir, LOGREG_SCALER_FILE))
+        n = float(np.max(scaler.n_samples_seen_))
+        online = cls.empty(len(scaler.mean_), len(model.classes_))
+        online.coef = model.coef_.astype(float).copy()
+        online.intercept = model.intercept_.astype(float).copy()
+        online.classes = model.classes_.copy()
+        online.scaler_n = n
+        online.scaler_mean = scaler.mean_.astype(float).copy()
+        online.scaler_m2 = scaler.var_.astype(float) * n
+        # Balanced weights until real counts accumulate
+        online.class_counts = np.full(len(model.classes_), n / len(model.classes_))
+        return online
+
+    @classmethod
+    def from_numpy_export(cls, models_dir=MODELS_DIR):
+        """Start from the logistic half of export_numpy_models.py's arrays."""
+        arrays = load_arrays(os.path.join(models_dir, NUMPY_MODEL_DIR), mmap_mode=None)
+        mean = arrays["lr_scaler_mean"].astype(float)
+        scale = arrays["lr_scaler_scale"].astype(float)
+        coef_folded = arrays["lr_coef_folded"].astype(float)
+        n = float(arrays["lr_scaler_n"].item()) if "lr_scaler_n" in arrays else SEED_SAMPLES
+
+        online = cls.empty(len(mean), len(coef_folded))
+        # Undo the folding: back to weights on standardized features
+        online.coef = coef_folded * scale
+        online.intercept = arrays["lr_intercept_folded"].astype(float) + coef_folded @ mean
+        online.classes = np.array(arrays["classes"])
+        online.scaler_n = n
+        online.scaler_mean = mean
+        online.scaler_m2 = scale ** 2 * n
+        online.class_counts = np.full(len(coef_folded), n / len(coef_folded))
+        return online
+
+    @classmethod
+    def seed(cls, models_dir=MODELS_DIR):
+        """from_batch_model, else from_numpy_export; NotSeededError if neither exists."""
+        try:
+            return cls.from_batch_model(models_dir)
+        except (ImportError, OSError):
+            pass
+        try:
+            return cls.from_numpy_export(models_dir)
+        except (OSError, KeyError) as e:
+            raise NotSeededError(f"No batch logistic model or NumPy export in {models_dir}") from e
+
+    @classmethod
+    def load(cls, path):
+        return cls({
+            name[:-len(".npy")]: np.load(os.path.join(path, name))
+            for name in os.listdir(path)
+            if name.endswith(".npy")
+        })
+
+    def arrays(self):
+        return {
+            "coef": self.coef,
+            "intercept": self.intercept,
+            "classes": self.classes,
+            "scaler_n": np.array(self.scaler_n),
+            "scaler_mean": self.scaler_mean,
+            "scaler_m2": self.scaler_m2,
+            "class_counts": self.class_counts,
+            "n_updates": np.array(self.n_updates),
+        }
+
+    @property
+    def version(self):
+        """
+        "<n_updates>-<content hash>": changes with every update and with a
+        re-seed, even one that ends up at the same update count.
+        """
+        return format_version(self.n_updates, self.checkpoint_id)
+
+    def save(self, path):
+        arrays = self.arrays()
+        self.checkpoint_id = content_hash(arrays)
+        arrays["checkpoint_id"] = np.array(self.checkpoint_id)
+        save_arrays(path, arrays)
+
+    # -----------------------------
+    # Scaling
+    # -----------------------------
+    @property
+    def scale(self):
+        if self.scaler_n == 0:
+            return np.ones_like(self.scaler_mean)
+        scale = np.sqrt(self.scaler_m2 / self.scaler_n)
+        # StandardScaler leaves constant features unscaled
+        return np.where(scale == 0, 1.0, scale)
+
+    def _update_scaler(self, x):
+        """Merge the batch into the running mean / M2 (Chan et al.)."""
+        n_b = len(x)
+        mean_b = x.mean(axis=0)
+        m2_b = ((x - mean_b) ** 2).sum(axis=0)
+        n = self.scaler_n + n_b
+        delta = mean_b - self.scaler_mean
+        self.scaler_mean = self.scaler_mean + delta * (n_b / n)
+        self.scaler_m2 = self.scaler_m2 + m2_b + delta ** 2 * (self.scaler_n * n_b / n)
+        self.scaler_n = n
+
+    # -----------------------------
+    # Learning / prediction
+    # -----------------------------
+    def folded(self):
+        """(coef, intercept) acting on raw features, scaler folded in."""
+        coef = self.coef / self.scale
+        return coef, self.intercept - coef @ self.scaler_mean
+
+    def predict_proba(self, x):
+        coef, intercept = self.folded()
+        # einsum (not BLAS gemm) keeps each row independent of batch size
+        z = np.einsum("ij,kj->ik", np.asarray(x, dtype=float), coef)
+        z += intercept
+        return softmax_rows(z)
+
+    def partial_fit(self, x, y, learning_rate=LEARNING_RATE, alpha=ALPHA,
+                    epochs=EPOCHS, minibatch=MINIBATCH, seed=None):
+        """One incremental update from raw features x (n, d) and labels y (n,)."""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y)
+        if not len(x):
+            return self
+
+        # Re-express the weights for the new scaling, keeping the raw-space
+        # decision function  (coef / scale) @ x + intercept - ...  unchanged
+        coef_raw, _ = self.folded()
+        old_mean = self.scaler_mean
+        self._update_scaler(x)
+        self.intercept = self.intercept + coef_raw @ (self.scaler_mean - old_mean)
+        self.coef = coef_raw * self.scale
+
+        idx = np.searchsorted(self.classes, y)
+        self.class_counts += np.bincount(idx, minlength=len(self.classes))
+        counts = np.maximum(self.class_counts, 1.0)
+        class_weight = counts.sum() / (len(counts) * counts)
+
+        xs = (x - self.scaler_mean) / self.scale
+        onehot = np.eye(len(self.classes))[idx]
+        rng = np.random.default_rng(self.n_updates if seed is None else seed)
+        for _ in range(epochs):
+            order = rng.permutation(len(xs))
+            for start in range(0, len(xs), minibatch):
+                rows = order[start:start + minibatch]
+                p = softmax_rows(xs[rows] @ self.coef.T + self.intercept)
+                w = class_weight[idx[rows]]
+                g = (p - onehot[rows]) * w[:, None]
+                self.coef -= learning_rate * (g.T @ xs[rows] / w.sum() + alpha * self.coef)
+                self.intercept -= learning_rate * g.sum(axis=0) / w.sum()
+
+        self.n_updates += 1
+        self.checkpoint_id = None
+        return self
+
+
+# -----------------------------
+# Checkpoint helpers (shared with ml-api)
+# -----------------------------
+def content_hash(arrays):
+    """sha256 over the arrays' names, dtypes, shapes and bytes."""
+    h = hashlib.sha256()
+    for name in sorted(arrays):
+        arr = np.ascontiguousarray(arrays[name])
+        h.update(f"{name}:{arr.dtype.str}:{arr.shape};".encode())
+        h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+def checkpoint_version(path):
+    """OnlineLogReg.version of the checkpoint at path (None if there is none)."""
+    try:
+        n_updates = int(np.load(os.path.join(path, "n_updates.npy")).item())
+        id_path = os.path.join(path, "checkpoint_id.npy")
+        checkpoint_id = str(np.load(id_path).item()) if os.path.exists(id_path) else None
+    except (OSError, ValueError):
+        return None
+    return format_version(n_updates, checkpoint_id)
+
+
+def format_version(n_updates, checkpoint_id):
+    if checkpoint_id is None:
+        return str(n_updates)
+    return f"{n_updates}-{checkpoint_id[:12]}"
+
+
+def update_checkpoint(path, x, y, seed_dir=None, **fit_options):
+    """
+    Load the latest checkpoint, apply one update and save it, holding an
+    exclusive lock so concurrent updaters are applied one after another.
+    Without a checkpoint the model is first seeded from seed_dir
+    (OnlineLogReg.seed); NotSeededError if that isn't possible.
+    Returns the updated model.
+    """
+    lock_path = os.path.join(os.path.dirname(os.path.abspath(path)), LOCK_FILE)
+    with open(lock_path, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if os.path.isdir(path):
+                model = OnlineLogReg.load(path)
+            elif seed_dir is not None:
+                model = OnlineLogReg.seed(seed_dir)
+            else:
+                raise NotSeededError(f"No online model at {path}; run 'init' first")
+            model.partial_fit(x, y, **fit_options)
+            model.save(path)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+    return model
+
+
+def read_labelled_chunks(path, chunk_size):
+    """(x, y, dropped rows) per chunk of a labelled readings CSV."""
+    import pandas as pd
+
+    for frame in pd.read_csv(path, chunksize=chunk_size):
+        missing = [c for c in FEATURES + [LABEL_FIELD] if c not in frame]
+        if missing:
+            sys.exit(f"[ERROR] {path} is missing columns: {missing}")
+        x = frame[FEATURES].apply(pd.to_numeric, errors="coerce")
+        complete = x.notna().all(axis=1) & frame[LABEL_FIELD].notna()
+        yield (
+            x[complete].to_numpy(dtype=float),
+            encode_labels(frame.loc[complete, LABEL_FIELD].tolist()),
+            int((~complete).sum()),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally updated logistic model")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    sub.add_parser("init", help="seed from the batch logistic model (or its NumPy export)")
+    p = sub.add_parser("update", help="ingest a labelled readings CSV in mini-batches")
+    p.add_argument("csv")
+    p.add_argument("--batch-size", type=int, default=1000,
+                   help="rows per update (and per checkpoint)")
+    p.add_argument("--learning-rate", type=float, default=LEARNING_RATE)
+    p.add_argument("--epochs", type=int, default=EPOCHS)
+    sub.add_parser("status")
+    args = parser.parse_args()
+
+    path = os.path.join(args.models_dir, ONLINE_MODEL_DIR)
+
+    if args.cmd == "init":
+        try:
+            model = OnlineLogReg.seed(args.models_dir)
+        except NotSeededError as e:
+            sys.exit(f"[ERROR] {e}")
+        print(f"[INFO] Seeded from the batch logistic model ({model.scaler_n:.0f} samples)")
+        model.save(path)
+        print(f"[INFO] Saved {path}")
+
+    elif args.cmd == "update":
+        rows = dropped = 0
+        t0 = time.perf_counter()
+        for x, y, n_dropped in read_labelled_chunks(args.csv, args.batch_size):
+            dropped += n_dropped
+            if not len(x):
+                continue
+            t = time.perf_counter()
+            try:
+                model = update_checkpoint(path, x, y, seed_dir=args.models_dir,
+                                          learning_rate=args.learning_rate, epochs=args.epochs)
+            except NotSeededError as e:
+                sys.exit(f"[ERROR] {e}")
+            rows += len(x)
+            print(f"[INFO] Update {model.n_updates}: {len(x)} rows in "
+                  f"{(time.perf_counter() - t) * 1000:.1f}ms")
+        print(f"[INFO] Ingested {rows} rows in {time.perf_counter() - t0:.2f}s"
+              + (f" ({dropped} incomplete rows skipped)" if dropped else ""))
+
+    elif args.cmd == "status":
+        if not os.path.isdir(path):
+            sys.exit(f"[ERROR] No online model at {path}; run 'init' first")
+        model = OnlineLogReg.load(path)
+        print(f"[INFO] {path}: {model.n_updates} updates, "
+              f"{model.scaler_n:.0f} samples seen, class counts {model.class_counts.tolist()}")
+
+
+if __name__ == "__main__":
+    main()
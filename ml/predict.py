@@ -5,6 +5,8 @@ import traceback
 import numpy as np
 import joblib
 
+import risk_rules
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 
@@ -17,34 +19,6 @@ rf_scaler = safe_load(os.path.join(MODELS_DIR, "maternal_risk_scaler_multi.jobli
 logreg_model = safe_load(os.path.join(MODELS_DIR, "maternal_risk_logreg.joblib"))
 logreg_scaler = safe_load(os.path.join(MODELS_DIR, "maternal_risk_logreg_scaler.joblib"))
 
-CLASS_SCORE = {0: 0.1, 1: 0.55, 2: 0.9}
-
-def heuristic(features):
-    score = 0.1
-    reasons = []
-
-    if features["systolic_bp"] >= 160 or features["diastolic_bp"] >= 110:
-        score += 0.35
-        reasons.append("Severe hypertension detected")
-
-    elif features["systolic_bp"] >= 140 or features["diastolic_bp"] >= 90:
-        score += 0.2
-        reasons.append("Elevated blood pressure")
-
-    if features["fetal_hr"] < 110 or features["fetal_hr"] > 170:
-        score += 0.25
-        reasons.append("Abnormal fetal heart rate")
-
-    if features["spo2"] < 94:
-        score += 0.2
-        reasons.append("Low maternal oxygen saturation")
-
-    if features["temperature"] >= 38:
-        score += 0.15
-        reasons.append("Maternal fever detected")
-
-    return min(score, 1.0), reasons
-
 def model_predict(model, scaler, x):
     if not model or not scaler:
         return None, None
@@ -53,22 +27,29 @@ def model_predict(model, scaler, x):
     cls = int(np.argmax(probs))
     return cls, probs.tolist()
 
-try:
-    data = json.loads(sys.argv[1])
+def field(data, name, default):
+    # null means "not measured", same as leaving the field out (as in ml-api)
+    value = data.get(name)
+    return default if value is None else value
+
 
+def predict(data):
     features = {
-        "maternal_hr": float(data.get("maternal_hr", 90)),
-        "systolic_bp": float(data.get("systolic_bp", 120)),
-        "diastolic_bp": float(data.get("diastolic_bp", 80)),
-        "fetal_hr": float(data.get("fetal_hr", 140)),
-        "fetal_movement_count": int(data.get("fetal_movement_count", 10)),
-        "spo2": float(data.get("spo2", 98)),
-        "temperature": float(data.get("temperature", 36.8)),
-        "age": float(data.get("age", 25)),
-        "bs": float(data.get("bs", 90)),
+        "maternal_hr": float(field(data, "maternal_hr", 90)),
+        "systolic_bp": float(field(data, "systolic_bp", 120)),
+        "diastolic_bp": float(field(data, "diastolic_bp", 80)),
+        "fetal_hr": float(field(data, "fetal_hr", 140)),
+        "fetal_movement_count": int(field(data, "fetal_movement_count", 10)),
+        "spo2": float(field(data, "spo2", 98)),
+        "temperature": float(field(data, "temperature", 36.8)),
+        "age": float(field(data, "age", 25)),
+        "bs": float(field(data, "bs", 90)),
     }
 
-    heuristic_score, heuristic_reasons = heuristic(features)
+    h_scores, h_masks = risk_rules.evaluate_rules(
+        {k: np.array([v], dtype=float) for k, v in features.items()}
+    )
+    heuristic_score = h_scores[0]
 
     map_val = (features["systolic_bp"] + 2 * features["diastolic_bp"]) / 3
     pulse_pressure = features["systolic_bp"] - features["diastolic_bp"]
@@ -84,35 +65,21 @@ try:
         pulse_pressure,
     ]
     rf_cls, rf_probs = model_predict(rf_model, rf_scaler, ml_x)
-    lr_cls, lr_probs = model_predict(logreg_model, logreg_scaler, ml_x)
-
-    ml_scores = []
-    if rf_cls is not None:
-        ml_scores.append(CLASS_SCORE[rf_cls])
-    if lr_cls is not None:
-        ml_scores.append(CLASS_SCORE[lr_cls])
+    # Logistic model is trained on the 6 base features only (no MAP / PP)
+    lr_cls, lr_probs = model_predict(logreg_model, logreg_scaler, ml_x[:6])
 
-    ml_score = np.mean(ml_scores) if ml_scores else heuristic_score
+    # Same ML score as ml-api: class probabilities, not the argmax class
+    probs = [np.array([p]) for p in (rf_probs, lr_probs) if p is not None]
+    ml_score = risk_rules.ml_scores(probs)[0] if probs else heuristic_score
 
     # 🔥 FINAL FUSION
-    final_score = round(
-        (0.4 * heuristic_score) + (0.6 * ml_score),
-        2
-    )
-
-    if final_score >= 0.75:
-        level = "critical"
-    elif final_score >= 0.35:
-        level = "warning"
-    else:
-        level = "normal"
-
-    reasons = heuristic_reasons or ["Vitals within acceptable ranges"]
+    final_score = float(risk_rules.fuse(heuristic_score, ml_score))
+    level = risk_rules.risk_levels(final_score)[()]
 
-    print(json.dumps({
+    return {
         "risk_level": level,
         "risk_score": final_score,
-        "reason": "; ".join(reasons),
+        "reason": risk_rules.reasons_from_masks(h_masks)[0],
         "model_version": "heuristic + RF + logistic (fused)",
 
         "ml_risk_level": rf_cls,
@@ -120,14 +87,57 @@ try:
 
         "ml_logreg_risk_level": lr_cls,
         "ml_logreg_class_probabilities": lr_probs,
-    }))
+    }
+
 
-except Exception as e:
-    print(json.dumps({
+def failure(e):
+    return {
         "risk_level": "critical",
         "risk_score": 1.0,
         "reason": "ML system failure",
         "model_version": "error",
         "error": str(e),
         "trace": traceback.format_exc()
-    }))
+    }
+
+
+def run_worker(stdin=sys.stdin, stdout=sys.stdout):
+    """
+    Resident co-process mode: models stay loaded, one JSON request per input
+    line, one JSON result per output line (same order, flushed per line).
+
+    Requests may be pipelined - write as many lines as you like before
+    reading results. If a request carries an "id" it is echoed back so
+    callers can match results without relying on order.
+    """
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        data = None
+        try:
+            data = json.loads(line)
+            result = predict(data)
+        except Exception as e:
+            result = failure(e)
+        if isinstance(data, dict) and "id" in data:
+            result["id"] = data["id"]
+        stdout.write(json.dumps(result) + "\n")
+        stdout.flush()
+
+
+def main():
+    # python predict.py --worker        -> JSON lines over stdin/stdout
+    # python predict.py '<json vitals>' -> one-shot (original contract)
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        run_worker()
+        return
+
+    try:
+        print(json.dumps(predict(json.loads(sys.argv[1]))))
+    except Exception as e:
+        print(json.dumps(failure(e)))
+
+
+if __name__ == "__main__":
+    main()
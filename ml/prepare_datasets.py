@@ -1,4 +1,7 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 
 BASE_DIR = os.path.dirname(__file__)
@@ -8,17 +11,21 @@ OUT_DIR = os.path.join(BASE_DIR, "data_multi")
 os.makedirs(RAW_DIR, exist_ok=True)
 os.makedirs(OUT_DIR, exist_ok=True)
 
-TARGET_COLS = [
+FEATURE_COLS = [
     "Age",
     "SystolicBP",
     "DiastolicBP",
     "BS",
     "BodyTemp",
     "HeartRate",
-    "RiskLevel",
 ]
+LABEL_COL = "RiskLevel"
+TARGET_COLS = FEATURE_COLS + [LABEL_COL]
+
+# Rows per read; keeps memory flat for large hospital exports
+CHUNK_ROWS = 200_000
 
-# Unified risk label mapping
+# Unified risk label mapping (keys are stripped + lower-cased raw labels)
 RISK_MAP = {
     "low": "low risk",
     "low risk": "low risk",
@@ -33,251 +40,209 @@ RISK_MAP = {
     "severe": "high risk",
     "high risk": "high risk",
 }
+RISK_LEVELS = ["low risk", "mid risk", "high risk"]
+
+# UCI and the Kaggle mirror already use (nearly) canonical names
+BASIC_ALIASES = {
+    "Age": ["Age"],
+    "SystolicBP": ["SystolicBP"],
+    "DiastolicBP": ["DiastolicBP"],
+    "BS": ["BS"],
+    "BodyTemp": ["BodyTemp"],
+    "HeartRate": ["HeartRate"],
+    "RiskLevel": ["RiskLevel", "Risk", "HealthRisk"],
+}
 
+# One entry per raw file. Canonical column -> candidate raw names, matched
+# ignoring case, spaces and underscores (first hit wins).
+#   derived:    used when the canonical column can't be resolved;
+#               value = clip(column + offset, lower=min)
+#   labels:     normalised raw label -> canonical label; others are dropped
+#   on_missing: "error" raises, "skip" warns and skips the source
+SOURCES = [
+    {
+        "name": "uci",
+        "description": "UCI Maternal Health Risk dataset",
+        "raw": "maternal_health_uci.csv",
+        "out": "maternal_health_uci_clean.csv",
+        "aliases": BASIC_ALIASES,
+        "derived": {},
+        "labels": RISK_MAP,
+        "on_missing": "error",
+    },
+    {
+        "name": "kaggle_basic",
+        "description": "Kaggle Maternal Health Risk dataset",
+        "raw": "maternal_health_kaggle.csv",
+        "out": "maternal_health_kaggle_clean.csv",
+        "aliases": BASIC_ALIASES,
+        "derived": {},
+        "labels": RISK_MAP,
+        "on_missing": "error",
+    },
+    {
+        "name": "mendeley",
+        "description": "Mendeley Maternal Health Risk Assessment dataset",
+        "raw": "maternal_health_assessment_mendeley.csv",
+        "out": "maternal_health_mendeley_clean.csv",
+        "aliases": {
+            "Age": ["Age"],
+            "SystolicBP": ["SystolicBP", "SystolicBloodPressure", "Systolic BP"],
+            "DiastolicBP": ["DiastolicBP", "DiastolicBloodPressure", "Diastolic BP"],
+            "BS": ["BS", "BloodSugar", "BloodGlucose"],
+            "BodyTemp": ["BodyTemp", "BodyTemperature", "Body Temp"],
+            "HeartRate": ["HeartRate", "Pulse", "Heart Rate"],
+            "RiskLevel": ["RiskLevel", "Risk", "HealthRisk", "Risk level"],
+        },
+        "derived": {
+            "DiastolicBP": {"from": "SystolicBP", "offset": -40, "min": 40},
+        },
+        "labels": RISK_MAP,
+        "on_missing": "error",
+    },
+    {
+        "name": "kaggle_mlready",
+        "description": "Kaggle ML-ready Maternal Health Risk Assessment dataset",
+        "raw": "maternal_health_assessment_mlready.csv",
+        "out": "maternal_health_mlready_clean.csv",
+        "aliases": {
+            "Age": ["age"],
+            "SystolicBP": ["systolicbp", "systolicbloodpressure"],
+            "DiastolicBP": ["diastolicbp", "diastolicbloodpressure"],
+            "BS": ["bs", "bloodsugar", "bloodglucose"],
+            "BodyTemp": ["bodytemp", "bodytemperature", "temperature"],
+            "HeartRate": ["heartrate", "pulse"],
+            "RiskLevel": ["risklevel", "risk", "healthrisk"],
+        },
+        "derived": {},
+        "labels": RISK_MAP,
+        "on_missing": "skip",
+    },
+]
 
-def normalize_risk_label(x):
-    if pd.isna(x):
-        return None
-    s = str(x).strip().lower()
-    return RISK_MAP.get(s, None)
-
-
-def process_uci():
-    """
-    Maternal Health Risk Data Set from UCI.
-    Usually already has the right columns:
-      Age, SystolicBP, DiastolicBP, BS, BodyTemp, HeartRate, RiskLevel
-    """
-    path = os.path.join(RAW_DIR, "maternal_health_uci.csv")
-    if not os.path.exists(path):
-        print("[WARN] UCI file not found, skipping:", path)
-        return
-
-    print("[INFO] Processing UCI Maternal Health Risk dataset ...")
-    df = pd.read_csv(path)
-
-    # Try to standardize column names (strip spaces, etc.)
-    df.columns = [c.strip().replace(" ", "").replace("_", "") for c in df.columns]
-
-    col_map = {
-        "Age": "Age",
-        "SystolicBP": "SystolicBP",
-        "DiastolicBP": "DiastolicBP",
-        "BS": "BS",
-        "BodyTemp": "BodyTemp",
-        "HeartRate": "HeartRate",
-        "RiskLevel": "RiskLevel",
-        "Risk": "RiskLevel",
-        "HealthRisk": "RiskLevel",
-    }
-
-    # Build a new DataFrame with canonical columns
-    out = pd.DataFrame()
-    for src, tgt in col_map.items():
-        if src in df.columns and tgt != "RiskLevel":
-            out[tgt] = df[src]
-
-    # Risk/target column
-    risk_col = None
-    for c in ["RiskLevel", "Risk", "HealthRisk"]:
-        if c in df.columns:
-            risk_col = c
-            break
-
-    if risk_col is None:
-        raise ValueError("No risk column found in UCI dataset")
-
-    out["RiskLevel"] = df[risk_col].apply(normalize_risk_label)
-    out = out.dropna(subset=TARGET_COLS)
 
-    out = out[TARGET_COLS]  # ensure column order
-    out_path = os.path.join(OUT_DIR, "maternal_health_uci_clean.csv")
-    out.to_csv(out_path, index=False)
-    print("[INFO] Wrote:", out_path, "rows:", len(out))
+def normalize_name(name):
+    return name.strip().lstrip("﻿").lower().replace(" ", "").replace("_", "")
 
 
-def process_kaggle_basic():
-    """
-    Kaggle Maternal Health Risk Data (same as UCI but mirrored).
-    """
-    path = os.path.join(RAW_DIR, "maternal_health_kaggle.csv")
-    if not os.path.exists(path):
-        print("[WARN] Kaggle basic file not found, skipping:", path)
-        return
-
-    print("[INFO] Processing Kaggle Maternal Health Risk dataset ...")
-    df = pd.read_csv(path)
-    df.columns = [c.strip().replace(" ", "").replace("_", "") for c in df.columns]
-
-    col_map = {
-        "Age": "Age",
-        "SystolicBP": "SystolicBP",
-        "DiastolicBP": "DiastolicBP",
-        "BS": "BS",
-        "BodyTemp": "BodyTemp",
-        "HeartRate": "HeartRate",
-        "RiskLevel": "RiskLevel",
-        "Risk": "RiskLevel",
-        "HealthRisk": "RiskLevel",
+def resolve_columns(header, aliases):
+    """Canonical column -> raw column name (None if no alias matches)."""
+    by_norm = {}
+    for col in header:
+        by_norm.setdefault(normalize_name(col), col)
+    return {
+        canonical: next(
+            (by_norm[normalize_name(c)] for c in candidates if normalize_name(c) in by_norm),
+            None,
+        )
+        for canonical, candidates in aliases.items()
     }
 
-    out = pd.DataFrame()
-    for src, tgt in col_map.items():
-        if src in df.columns and tgt != "RiskLevel":
-            out[tgt] = df[src]
-
-    risk_col = None
-    for c in ["RiskLevel", "Risk", "HealthRisk"]:
-        if c in df.columns:
-            risk_col = c
-            break
-
-    if risk_col is None:
-        raise ValueError("No risk column found in Kaggle basic dataset")
-
-    out["RiskLevel"] = df[risk_col].apply(normalize_risk_label)
-    out = out.dropna(subset=TARGET_COLS)
-    out = out[TARGET_COLS]
 
-    out_path = os.path.join(OUT_DIR, "maternal_health_kaggle_clean.csv")
-    out.to_csv(out_path, index=False)
-    print("[INFO] Wrote:", out_path, "rows:", len(out))
-
-
-def process_mendeley_assessment():
+def map_labels(raw, label_map):
     """
-    Mendeley Maternal Health Risk Assessment Dataset.
-    This dataset has more features; we pick the subset that matches our schema:
-      Age, SystolicBP, DiastolicBP, BS, BodyTemp, HeartRate, RiskLevel
-
-    If DiastolicBP is missing, we approximate it from SystolicBP.
+    Vectorized label normalisation: each distinct raw label is stripped,
+    lower-cased and looked up once, then broadcast back via category codes.
     """
-    path = os.path.join(RAW_DIR, "maternal_health_assessment_mendeley.csv")
-    if not os.path.exists(path):
-        print("[WARN] Mendeley assessment file not found, skipping:", path)
-        return
-
-    print("[INFO] Processing Mendeley Maternal Health Risk Assessment dataset ...")
-    df = pd.read_csv(path)
-
-    # Normalize column names for matching
-    original_cols = list(df.columns)
-    norm_cols = [c.strip().lower().replace(" ", "").replace("_", "") for c in df.columns]
-    col_map_norm = dict(zip(norm_cols, original_cols))
-
-    def get_col(*candidates):
-        for cand in candidates:
-            key = cand.lower().replace(" ", "").replace("_", "")
-            if key in col_map_norm:
-                return col_map_norm[key]
-        return None
-
-    age_col = get_col("Age")
-    sbp_col = get_col("SystolicBP", "SystolicBloodPressure", "Systolic BP")
-    dbp_col = get_col("DiastolicBP", "DiastolicBloodPressure", "Diastolic BP")
-    bs_col = get_col("BS", "BloodSugar", "BloodGlucose")
-    temp_col = get_col("BodyTemp", "BodyTemperature", "Body Temp")
-    hr_col = get_col("HeartRate", "Pulse", "Heart Rate")
-    risk_col = get_col("RiskLevel", "Risk", "HealthRisk", "Risk level")
-
-    # Required cols except DiastolicBP (we can approximate that if missing)
-    needed = [age_col, sbp_col, bs_col, temp_col, hr_col, risk_col]
-    if any(c is None for c in needed):
-        raise ValueError(
-            "Missing one or more required columns in Mendeley dataset. "
-            f"Resolved columns: {[age_col, sbp_col, dbp_col, bs_col, temp_col, hr_col, risk_col]}"
-        )
-
-    out = pd.DataFrame()
-    out["Age"] = df[age_col]
-    out["SystolicBP"] = df[sbp_col]
-
-    if dbp_col is not None:
-        out["DiastolicBP"] = df[dbp_col]
-    else:
-        # Approximate DiastolicBP from SystolicBP if missing
-        print("[WARN] DiastolicBP column not found in Mendeley dataset; "
-              "approximating DiastolicBP as SystolicBP - 40.")
-        approx_dbp = df[sbp_col] - 40
-        # clamp to a reasonable minimum
-        approx_dbp = approx_dbp.clip(lower=40)
-        out["DiastolicBP"] = approx_dbp
-
-    out["BS"] = df[bs_col]
-    out["BodyTemp"] = df[temp_col]
-    out["HeartRate"] = df[hr_col]
-    out["RiskLevel"] = df[risk_col].apply(normalize_risk_label)
-
-    out = out.dropna(subset=TARGET_COLS)
-    out = out[TARGET_COLS]
-
-    out_path = os.path.join(OUT_DIR, "maternal_health_mendeley_clean.csv")
-    out.to_csv(out_path, index=False)
-    print("[INFO] Wrote:", out_path, "rows:", len(out))
-
-def process_kaggle_mlready():
+    cat = raw.astype("category")
+    lookup = (
+        pd.Series(cat.cat.categories.astype(str))
+        .str.strip()
+        .str.lower()
+        .map(label_map)
+        .to_numpy(dtype=object)
+    )
+    codes = cat.cat.codes.to_numpy()
+    values = np.where(codes >= 0, lookup[codes], None)
+    unmapped = set(cat.cat.categories[pd.isna(lookup)].astype(str))
+    return pd.Categorical(values, categories=RISK_LEVELS), unmapped
+
+
+def process_source(source, raw_dir=RAW_DIR, out_dir=OUT_DIR, chunk_rows=CHUNK_ROWS):
     """
-    Optional: Kaggle ML-ready Maternal Health Risk Assessment dataset.
-    We'll try to map to our canonical features if present.
+    Clean one raw file into OUT_DIR/<out> with the canonical TARGET_COLS.
+    Returns (rows written or None if skipped, log lines) - workers don't print
+    directly so concurrent sources don't interleave their output.
     """
-    path = os.path.join(RAW_DIR, "maternal_health_assessment_mlready.csv")
+    log = []
+    path = os.path.join(raw_dir, source["raw"])
     if not os.path.exists(path):
-        print("[WARN] Kaggle ML-ready assessment file not found, skipping:", path)
-        return
-
-    print("[INFO] Processing Kaggle ML-ready Maternal Health Risk Assessment dataset ...")
-    df = pd.read_csv(path)
-
-    original_cols = list(df.columns)
-    norm_cols = [c.strip().lower().replace(" ", "").replace("_", "") for c in df.columns]
-    col_map_norm = dict(zip(norm_cols, original_cols))
-
-    def get_col(*candidates):
-        for cand in candidates:
-            key = cand.lower().replace(" ", "").replace("_", "")
-            if key in col_map_norm:
-                return col_map_norm[key]
-        return None
-
-    age_col = get_col("age")
-    sbp_col = get_col("systolicbp", "systolicbloodpressure")
-    dbp_col = get_col("diastolicbp", "diastolicbloodpressure")
-    bs_col = get_col("bs", "bloodsugar", "bloodglucose")
-    temp_col = get_col("bodytemp", "bodytemperature", "temperature")
-    hr_col = get_col("heartrate", "pulse")
-    risk_col = get_col("risklevel", "risk", "healthrisk")
-
-    needed = [age_col, sbp_col, dbp_col, bs_col, temp_col, hr_col, risk_col]
-    if any(c is None for c in needed):
-        print("[WARN] Could not resolve all required columns in Kaggle ML-ready dataset.")
-        print("[WARN] Skipping this dataset.")
-        return
-
-    out = pd.DataFrame()
-    out["Age"] = df[age_col]
-    out["SystolicBP"] = df[sbp_col]
-    out["DiastolicBP"] = df[dbp_col]
-    out["BS"] = df[bs_col]
-    out["BodyTemp"] = df[temp_col]
-    out["HeartRate"] = df[hr_col]
-    out["RiskLevel"] = df[risk_col].apply(normalize_risk_label)
-
-    out = out.dropna(subset=TARGET_COLS)
-    out = out[TARGET_COLS]
-
-    out_path = os.path.join(OUT_DIR, "maternal_health_mlready_clean.csv")
-    out.to_csv(out_path, index=False)
-    print("[INFO] Wrote:", out_path, "rows:", len(out))
+        log.append(f"[WARN] {source['description']} file not found, skipping: {path}")
+        return None, log
+
+    log.append(f"[INFO] Processing {source['description']} ...")
+    header = pd.read_csv(path, nrows=0).columns
+    resolved = resolve_columns(header, source["aliases"])
+
+    derived = {}
+    for canonical, rule in source["derived"].items():
+        if resolved.get(canonical) is None and resolved.get(rule["from"]) is not None:
+            derived[canonical] = rule
+            log.append(
+                f"[WARN] {canonical} column not found in {source['name']} dataset; "
+                f"approximating {canonical} as {rule['from']} {rule['offset']:+g} "
+                f"(min {rule['min']})."
+            )
+
+    missing = [c for c in TARGET_COLS if resolved.get(c) is None and c not in derived]
+    if missing:
+        message = f"Missing required columns {missing} in {source['name']} dataset. Resolved: {resolved}"
+        if source["on_missing"] == "skip":
+            log.append(f"[WARN] {message}; skipping this dataset.")
+            return None, log
+        raise ValueError(message)
+
+    usecols = sorted({raw for raw in resolved.values() if raw is not None})
+    dtypes = {resolved[c]: "float64" for c in FEATURE_COLS if resolved.get(c) is not None}
+    dtypes[resolved[LABEL_COL]] = "category"
+
+    out_path = os.path.join(out_dir, source["out"])
+    tmp_path = out_path + ".tmp"
+    rows = 0
+    dropped = 0
+    unmapped = set()
+    for chunk in pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunk_rows):
+        out = pd.DataFrame(index=chunk.index)
+        for col in FEATURE_COLS:
+            if col in derived:
+                rule = derived[col]
+                out[col] = (chunk[resolved[rule["from"]]] + rule["offset"]).clip(lower=rule["min"])
+            else:
+                out[col] = chunk[resolved[col]]
+        out[LABEL_COL], chunk_unmapped = map_labels(chunk[resolved[LABEL_COL]], source["labels"])
+        unmapped |= chunk_unmapped
+
+        n = len(out)
+        out = out.dropna(subset=TARGET_COLS)
+        dropped += n - len(out)
+
+        out.to_csv(tmp_path, mode="w" if rows == 0 else "a", header=rows == 0,
+                   index=False, float_format="%.15g")
+        rows += len(out)
+
+    if rows == 0:
+        pd.DataFrame(columns=TARGET_COLS).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, out_path)
+
+    if unmapped:
+        log.append(f"[WARN] Unmapped {source['name']} risk labels (rows dropped): {sorted(unmapped)}")
+    if dropped:
+        log.append(f"[INFO] Dropped {dropped} incomplete / unlabelled rows")
+    log.append(f"[INFO] Wrote: {out_path} rows: {rows}")
+    return rows, log
 
 
 def main():
     print(f"[INFO] RAW_DIR = {RAW_DIR}")
     print(f"[INFO] OUT_DIR = {OUT_DIR}")
 
-    process_uci()
-    process_kaggle_basic()
-    process_mendeley_assessment()
-    process_kaggle_mlready()
+    workers = max(1, min(len(SOURCES), os.cpu_count() or 1))
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(process_source, source) for source in SOURCES]
+        for future in futures:
+            _, log = future.result()
+            for line in log:
+                print(line)
 
     print("[INFO] Done preparing datasets.")
 
@@ -0,0 +1,239 @@
+"""
+Offline bulk re-scoring of exported readings (CSV or Parquet).
+
+    python rescore.py readings.csv
+    python rescore.py readings.parquet --output scored.csv --workers 8
+    python rescore.py readings.csv --resume      # after an interruption
+
+The export is read in chunks and the chunks are scored in parallel by a
+process pool. Each worker loads the models once, when it starts. Scoring
+uses the same fusion as predict.py and ml-api: heuristic rules, plus the
+RF and logistic class probabilities (risk_rules.ml_scores). Chunks are
+appended to the output CSV in input order as they finish; input columns
+are passed through untouched.
+
+Next to the output, <output>.progress records how many rows are safely
+written. --resume truncates anything past that point and carries on from
+there. The file is removed once the run completes.
+"""
+
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import risk_rules
+from inference import load_models
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+
+# Same defaults as predict.py; readings exports have no age / bs columns
+DEFAULTS = {
+    "maternal_hr": 90,
+    "systolic_bp": 120,
+    "diastolic_bp": 80,
+    "fetal_hr": 140,
+    "fetal_movement_count": 10,
+    "spo2": 98,
+    "temperature": 36.8,
+    "age": 25,
+    "bs": 90,
+}
+FIELDS = list(DEFAULTS)
+LR_FEATURES = ["age", "systolic_bp", "diastolic_bp", "bs", "temperature", "maternal_hr"]
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+
+
+# -----------------------------
+# Worker side
+# -----------------------------
+_models = None
+
+
+def init_worker(models_dir, engine):
+    global _models
+    _models = load_models(models_dir, engine)
+
+
+def score_columns(columns, models):
+    """Feature columns (name -> (n,) array) -> output columns, predict.py fusion."""
+    h_scores, h_masks = risk_rules.evaluate_rules(columns)
+
+    x_lr = np.column_stack([columns[k] for k in LR_FEATURES])
+    map_val = (columns["systolic_bp"] + 2 * columns["diastolic_bp"]) / 3
+    pulse_pressure = columns["systolic_bp"] - columns["diastolic_bp"]
+    x_rf = np.column_stack([x_lr, map_val, pulse_pressure])
+
+    rf_probs = models.rf_proba(x_rf)
+    lr_probs = models.logreg_proba(x_lr)
+    ml_scores = risk_rules.ml_scores([rf_probs, lr_probs])
+    rf_cls = rf_probs.argmax(axis=1)
+    lr_cls = lr_probs.argmax(axis=1)
+
+    final_scores = risk_rules.fuse(h_scores, ml_scores)
+    return {
+        "risk_level": risk_rules.risk_levels(final_scores),
+        "risk_score": final_scores,
+        "reason": risk_rules.reasons_from_masks(h_masks),
+        "ml_risk_level": rf_cls,
+        "ml_logreg_risk_level": lr_cls,
+    }
+
+
+def score_chunk(matrix):
+    return score_columns({k: matrix[:, i] for i, k in enumerate(FIELDS)}, _models)
+
+
+# -----------------------------
+# Input / output
+# -----------------------------
+def read_chunks(path, chunk_size, skip_rows=0):
+    """DataFrames of up to chunk_size rows, starting after skip_rows data rows."""
+    if path.lower().endswith(PARQUET_SUFFIXES):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("[ERROR] Reading Parquet needs pyarrow (pip install pyarrow)")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            if skip_rows >= batch.num_rows:
+                skip_rows -= batch.num_rows
+                continue
+            yield batch.slice(skip_rows).to_pandas()
+            skip_rows = 0
+    else:
+        # Strings throughout, so passthrough columns are written back verbatim
+        yield from pd.read_csv(
+            path,
+            chunksize=chunk_size,
+            dtype=str,
+            keep_default_na=False,
+            skiprows=range(1, skip_rows + 1) if skip_rows else None,
+        )
+
+
+def input_matrix(frame):
+    """
+    (n, len(FIELDS)) float matrix; missing columns and blank cells get the
+    predict.py defaults. Returns (matrix, number of non-numeric cells).
+    """
+    matrix = np.empty((len(frame), len(FIELDS)))
+    invalid = 0
+    for i, k in enumerate(FIELDS):
+        if k not in frame:
+            matrix[:, i] = DEFAULTS[k]
+            continue
+        raw = frame[k]
+        values = pd.to_numeric(raw, errors="coerce")
+        missing = values.isna()
+        if missing.any():
+            unparsed = raw[missing & raw.notna()].astype(str).str.strip()
+            invalid += int((unparsed != "").sum())
+        matrix[:, i] = values.fillna(DEFAULTS[k]).to_numpy(dtype=float)
+    return matrix, invalid
+
+
+def input_fingerprint(path):
+    st = os.stat(path)
+    return {"input": os.path.abspath(path), "size": st.st_size, "mtime": st.st_mtime}
+
+
+def load_progress(progress_path, fingerprint):
+    if not os.path.exists(progress_path):
+        return None
+    with open(progress_path) as f:
+        progress = json.load(f)
+    if {k: progress.get(k) for k in fingerprint} != fingerprint:
+        sys.exit(f"[ERROR] {progress_path} belongs to a different input; remove it or drop --resume")
+    return progress
+
+
+def save_progress(progress_path, progress):
+    tmp = progress_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(progress, f)
+    os.replace(tmp, progress_path)
+
+
+def default_output(path):
+    root, _ = os.path.splitext(path)
+    return root + ".scored.csv"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score a CSV/Parquet export of readings")
+    parser.add_argument("input", help="readings export (.csv or .parquet)")
+    parser.add_argument("--output", default=None, help="scored CSV (default: <input>.scored.csv)")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--engine", choices=["auto", "sklearn", "numpy"], default="auto")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run")
+    args = parser.parse_args()
+
+    output = args.output or default_output(args.input)
+    progress_path = output + ".progress"
+    fingerprint = input_fingerprint(args.input)
+
+    progress = load_progress(progress_path, fingerprint) if args.resume else None
+    if progress is None:
+        progress = dict(fingerprint, rows=0, bytes=0, invalid=0)
+        with open(output, "w"):
+            pass
+    else:
+        os.truncate(output, progress["bytes"])
+        print(f"[INFO] Resuming after {progress['rows']:,} rows")
+
+    print(f"[INFO] Scoring {args.input} -> {output} "
+          f"({args.workers} workers, {args.chunk_size:,} rows/chunk)")
+
+    t0 = time.perf_counter()
+    rows_start = progress["rows"]
+
+    with open(output, "a", newline="") as out, ProcessPoolExecutor(
+        args.workers, initializer=init_worker, initargs=(args.models_dir, args.engine)
+    ) as pool:
+
+        def write(frame, future, invalid):
+            scored = frame.assign(**future.result())
+            scored.to_csv(out, header=progress["bytes"] == 0, index=False)
+            out.flush()
+            os.fsync(out.fileno())
+            progress["rows"] += len(frame)
+            progress["bytes"] = os.fstat(out.fileno()).st_size
+            progress["invalid"] += invalid
+            save_progress(progress_path, progress)
+
+            done = progress["rows"] - rows_start
+            elapsed = time.perf_counter() - t0
+            print(f"[INFO] {progress['rows']:,} rows written ({done / elapsed:,.0f} rows/s)")
+
+        # Bounded read-ahead: at most 2 chunks per worker in memory
+        in_flight = deque()
+        for frame in read_chunks(args.input, args.chunk_size, progress["rows"]):
+            matrix, invalid = input_matrix(frame)
+            in_flight.append((frame, pool.submit(score_chunk, matrix), invalid))
+            if len(in_flight) >= 2 * args.workers:
+                write(*in_flight.popleft())
+        while in_flight:
+            write(*in_flight.popleft())
+
+    elapsed = time.perf_counter() - t0
+    done = progress["rows"] - rows_start
+    os.remove(progress_path)
+
+    print(f"[INFO] Scored {done:,} rows in {elapsed:.1f}s ({done / max(elapsed, 1e-9):,.0f} rows/s)")
+    if progress["invalid"]:
+        print(f"[INFO] {progress['invalid']:,} non-numeric values were replaced by defaults")
+    print(f"[INFO] Saved {output} ({progress['rows']:,} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Rule-based (heuristic) risk scoring shared by predict.py and ml-api.
+
+The rules are a data table instead of an if/elif chain, and they are
+evaluated with NumPy masks over whole feature columns, so scoring 1 reading
+or 10k readings is the same code path.
+
+Each fired rule sets one bit in an integer mask; reasons are looked up from
+the mask, which keeps string work out of the per-reading hot path.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+BASE_SCORE = 0.1
+
+# Fusion of heuristic score with the ML (RF + logistic) score
+HEURISTIC_WEIGHT = 0.45
+ML_WEIGHT = 0.55
+
+# (min score, level) - checked top to bottom, first match wins
+LEVEL_THRESHOLDS = (
+    (0.75, "critical"),
+    (0.35, "warning"),
+)
+DEFAULT_LEVEL = "normal"
+
+DEFAULT_REASON = "Vitals within normal ranges"
+
+# A rule fires when ANY of its conditions hold.
+# Rules sharing a `group` are exclusive: only the first one that fires counts
+# (this is the old `if ... elif ...` for blood pressure).
+Rule = namedtuple("Rule", ["code", "reason", "increment", "conditions", "group"])
+
+RULES = (
+    Rule(
+        "severe_hypertension",
+        "Severe hypertension",
+        0.35,
+        (("systolic_bp", ">=", 160), ("diastolic_bp", ">=", 110)),
+        "bp",
+    ),
+    Rule(
+        "elevated_bp",
+        "Elevated blood pressure",
+        0.2,
+        (("systolic_bp", ">=", 140), ("diastolic_bp", ">=", 90)),
+        "bp",
+    ),
+    Rule(
+        "abnormal_fetal_hr",
+        "Abnormal fetal heart rate",
+        0.25,
+        (("fetal_hr", "<", 110), ("fetal_hr", ">", 170)),
+        None,
+    ),
+    Rule(
+        "low_spo2",
+        "Low maternal oxygen saturation",
+        0.2,
+        (("spo2", "<", 94),),
+        None,
+    ),
+    Rule(
+        "maternal_fever",
+        "Maternal fever",
+        0.15,
+        (("temperature", ">=", 38),),
+        None,
+    ),
+)
+
+RULE_FEATURES = sorted({c[0] for rule in RULES for c in rule.conditions})
+
+_OPS = {
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+
+
+def _reason_for_mask(mask):
+    reasons = [rule.reason for i, rule in enumerate(RULES) if mask & (1 << i)]
+    return "; ".join(reasons) if reasons else DEFAULT_REASON
+
+
+# Every possible bitmask -> joined reason string (2 ** len(RULES) entries)
+REASON_TABLE = np.array(
+    [_reason_for_mask(m) for m in range(1 << len(RULES))], dtype=object
+)
+
+
+def evaluate_rules(columns):
+    """
+    Evaluate RULES over feature columns.
+
+    columns: mapping feature name -> 1-D array (all the same length)
+    Returns (scores, masks): float64 heuristic scores capped at 1.0 and the
+    uint16 bitmask of fired rules for each row.
+    """
+    n = len(np.asarray(columns[RULE_FEATURES[0]]))
+    scores = np.full(n, BASE_SCORE)
+    masks = np.zeros(n, dtype=np.uint16)
+    taken = {}
+
+    for i, rule in enumerate(RULES):
+        fired = np.zeros(n, dtype=bool)
+        for feature, op, threshold in rule.conditions:
+            fired |= _OPS[op](columns[feature], threshold)
+
+        if rule.group is not None:
+            seen = taken.get(rule.group)
+            if seen is not None:
+                fired &= ~seen
+                taken[rule.group] = seen | fired
+            else:
+                taken[rule.group] = fired
+
+        # Adding 0.0 for rows that did not fire keeps the sum identical to the
+        # sequential per-reading version.
+        scores += rule.increment * fired
+        masks |= fired.astype(np.uint16) << i
+
+    return np.minimum(scores, 1.0), masks
+
+
+def reasons_from_masks(masks):
+    """Bitmasks -> list of '; '-joined reason strings."""
+    return REASON_TABLE[masks].tolist()
+
+
+def ml_scores(class_probabilities):
+    """
+    ML half of the fusion: per model, the probability of any class above
+    "low risk" (P(mid) + P(high)), averaged over the models.
+    class_probabilities: list of (n, n_classes) arrays, one per model.
+    """
+    scores = [p[:, 1:].sum(axis=1) if p.shape[1] > 1 else p[:, 0] for p in class_probabilities]
+    return sum(scores) / len(scores)
+
+
+def fuse(heuristic_scores, ml_scores):
+    """Weighted heuristic + ML fusion, rounded to 2 decimals."""
+    return np.round(
+        (HEURISTIC_WEIGHT * heuristic_scores) + (ML_WEIGHT * ml_scores), 2
+    )
+
+
+def risk_levels(scores):
+    """Fused scores -> array of level strings."""
+    levels = np.full(np.shape(scores), DEFAULT_LEVEL, dtype=object)
+    for threshold, level in reversed(LEVEL_THRESHOLDS):
+        levels[np.asarray(scores) >= threshold] = level
+    return levels
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+pytest.importorskip("joblib")
+
+import export_numpy_models  # noqa: E402
+from inference import (  # noqa: E402
+    NUMPY_MODEL_DIR,
+    RF_MODEL_FILE,
+    RF_SCALER_FILE,
+    LOGREG_MODEL_FILE,
+    LOGREG_SCALER_FILE,
+    NumpyRiskModel,
+    SklearnRiskModel,
+    save_arrays,
+)
+
+MODEL_FILES = (RF_MODEL_FILE, RF_SCALER_FILE, LOGREG_MODEL_FILE, LOGREG_SCALER_FILE)
+
+pytestmark = pytest.mark.skipif(
+    not all(os.path.exists(os.path.join(export_numpy_models.MODELS_DIR, f)) for f in MODEL_FILES),
+    reason="trained joblib models not present in ml/models/",
+)
+
+
+@pytest.fixture(scope="module")
+def ref():
+    return SklearnRiskModel(export_numpy_models.MODELS_DIR)
+
+
+def test_numpy_export_matches_sklearn(ref, tmp_path):
+    out_path = str(tmp_path / NUMPY_MODEL_DIR)
+    save_arrays(out_path, export_numpy_models.export_arrays(ref))
+    fast = NumpyRiskModel.load(out_path)
+
+    x_rf, x_lr = export_numpy_models.parity_inputs(n_random=2000)
+    np.testing.assert_allclose(fast.rf_proba(x_rf), ref.rf_proba(x_rf), rtol=0, atol=1e-9)
+    np.testing.assert_allclose(fast.logreg_proba(x_lr), ref.logreg_proba(x_lr), rtol=0, atol=1e-9)
+    # Batch size doesn't change a row's result
+    np.testing.assert_allclose(fast.rf_proba(x_rf[:1]), fast.rf_proba(x_rf)[:1], rtol=0, atol=0)
+
+
+def test_failed_parity_writes_nothing(tmp_path, monkeypatch):
+    for name in MODEL_FILES:
+        os.symlink(os.path.join(export_numpy_models.MODELS_DIR, name), tmp_path / name)
+    monkeypatch.setattr(export_numpy_models, "check_parity", lambda *args, **kwargs: False)
+    monkeypatch.setattr(sys, "argv", ["export_numpy_models.py", "--models-dir", str(tmp_path)])
+
+    with pytest.raises(SystemExit):
+        export_numpy_models.main()
+    assert not os.path.exists(tmp_path / NUMPY_MODEL_DIR)
@@ -0,0 +1,157 @@
+import importlib
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import risk_rules  # noqa: E402
+from inference import NUMPY_MODEL_DIR, RF_MODEL_FILE  # noqa: E402
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ML_API_DIR = os.path.join(ML_DIR, "ml-api")
+MODELS_DIR = os.path.join(ML_DIR, "models")
+
+pytestmark = pytest.mark.skipif(
+    not (os.path.isdir(os.path.join(MODELS_DIR, NUMPY_MODEL_DIR))
+         or os.path.exists(os.path.join(MODELS_DIR, RF_MODEL_FILE))),
+    reason="trained models not present in ml/models/",
+)
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    """(main module, TestClient) serving the flat ml/models/ copy, no online model."""
+    tmp = tmp_path_factory.mktemp("ml_api")
+    patch = pytest.MonkeyPatch()
+    patch.syspath_prepend(ML_API_DIR)
+    main = importlib.import_module("main")
+    patch.setattr(main, "REGISTRY_DIR", str(tmp / "registry"))
+    patch.setattr(main, "ONLINE_MODEL_PATH", str(tmp / "online"))
+    patch.setattr(main, "MODEL_POLL_SECONDS", 3600.0)
+    with TestClient(main.app) as client:
+        deadline = time.monotonic() + 60
+        while client.get("/ready").status_code != 200:
+            assert time.monotonic() < deadline, client.get("/ready").json()
+            time.sleep(0.05)
+        yield main, client
+    patch.undo()
+
+
+def readings(seed=0):
+    """Random, null-field and rule-boundary readings."""
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(40):
+        out.append({
+            "maternal_hr": int(rng.integers(50, 150)),
+            "systolic_bp": int(rng.integers(85, 190)),
+            "diastolic_bp": int(rng.integers(45, 125)),
+            "fetal_hr": int(rng.integers(90, 200)),
+            "spo2": int(rng.integers(85, 101)),
+            "temperature": round(float(rng.uniform(35.5, 40.0)), 1),
+            "age": int(rng.integers(15, 50)),
+            "bs": round(float(rng.uniform(3, 250)), 1),
+        })
+    # Off the cache grid: always scored exactly
+    out.append({"temperature": 36.83, "bs": 91.27})
+    out.append({})
+    for field in ("maternal_hr", "systolic_bp", "diastolic_bp", "fetal_hr", "spo2",
+                  "temperature", "age", "bs", "fetal_movement_count"):
+        out.append({field: None})
+    out.append({k: None for k in out[0]})
+    for rule in risk_rules.RULES:
+        for feature, _, threshold in rule.conditions:
+            for delta in (-1, 0, 1):
+                out.append({feature: threshold + delta})
+    return out
+
+
+def rendered(result):
+    """A result dict as the bytes FastAPI's JSONResponse sends for it."""
+    return json.dumps(result, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def single_results(main, client, records):
+    out = []
+    for r in records:
+        main.cache.clear()
+        response = client.post("/predict", json=r)
+        assert response.status_code == 200, response.text
+        out.append(response.content)
+    return out
+
+
+def test_batch_matches_single_byte_for_byte(api):
+    main, client = api
+    records = readings()
+    singles = single_results(main, client, records)
+
+    main.cache.clear()
+    misses = client.post("/predict_batch", json={"readings": records}).json()["results"]
+    hits_before = main.cache.stats()["hits"]
+    hits = client.post("/predict_batch", json={"readings": records}).json()["results"]
+
+    assert main.cache.stats()["hits"] > hits_before
+    assert [rendered(r) for r in misses] == singles
+    assert [rendered(r) for r in hits] == singles
+
+
+def test_stream_matches_single(api):
+    main, client = api
+    records = readings(seed=1)
+    singles = single_results(main, client, records)
+
+    body = "".join(json.dumps(r) + "\n" for r in records) + "not json\n"
+    response = client.post("/predict_stream", content=body)
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.text.splitlines()]
+
+    assert [row.pop("line") for row in rows] == list(range(1, len(records) + 2))
+    assert "error" in rows[-1]
+    assert [rendered(row) for row in rows[:-1]] == singles
+
+
+def test_cli_matches_api(api):
+    pytest.importorskip("joblib")
+    import predict
+
+    main, client = api
+    for r in readings(seed=2):
+        cli = predict.predict(r)
+        served = client.post("/predict", json=r).json()
+        for key in ("risk_level", "risk_score", "reason", "ml_risk_level", "ml_logreg_risk_level"):
+            assert cli[key] == served[key], (r, key)
+
+
+def test_cache_key_follows_online_model(api, monkeypatch):
+    import online_logreg
+
+    main, client = api
+    main.cache.clear()
+    # A put that lands after the swap's cache.clear(), as in a racing request
+    monkeypatch.setattr(main.cache, "clear", lambda: None)
+    monkeypatch.setattr(main, "online", None)
+    assert "ml_online_class_probabilities" not in client.post("/predict", json={}).json()
+
+    monkeypatch.setattr(main, "online", online_logreg.OnlineLogReg.seed(MODELS_DIR))
+    served = client.post("/predict", json={}).json()
+    assert served["ml_online_class_probabilities"] is not None
+
+
+def test_forecast_score_is_mean_of_clipped_models(api):
+    main, client = api
+    # Steep rise: the linear fit extrapolates well past 1.0
+    body = {"patients": [{"scores": [0.3, 0.5, 0.7, 0.9, 0.95]}], "horizons": [6, 12]}
+    points = client.post("/forecast", json=body).json()["forecasts"][0]["points"]
+    assert points[-1]["models"]["linear"] == 1.0
+    for p in points:
+        models = list(p["models"].values())
+        assert abs(p["risk_score"] - sum(models) / len(models)) <= 0.001
+        assert p["lower"] <= p["risk_score"] <= p["upper"]
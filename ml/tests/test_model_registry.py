@@ -0,0 +1,63 @@
+import json
+import os
+
+import model_registry
+
+DISTILLED = "maternal_risk_distilled"
+
+
+def write(path, data=b"x"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def models_dir_with_student(tmp_path):
+    """Fake teacher files plus a student whose report records their hashes."""
+    models_dir = str(tmp_path / "models")
+    write(os.path.join(models_dir, "maternal_risk_logreg.joblib"), b"logreg v1")
+    write(os.path.join(models_dir, "maternal_risk_numpy", "classes.npy"), b"numpy v1")
+    write(os.path.join(models_dir, DISTILLED, "rf_value.npy"))
+    with open(os.path.join(models_dir, DISTILLED + ".json"), "w") as f:
+        json.dump({"teacher_artifacts": model_registry.teacher_hashes(models_dir)}, f)
+    return models_dir
+
+
+def test_derived_mismatch(tmp_path):
+    models_dir = models_dir_with_student(tmp_path)
+    assert model_registry.derived_mismatch(models_dir, DISTILLED) is None
+
+    # Teacher files that aren't shipped (joblib in the ml-api image) are skipped
+    os.remove(os.path.join(models_dir, "maternal_risk_logreg.joblib"))
+    assert model_registry.derived_mismatch(models_dir, DISTILLED) is None
+
+    write(os.path.join(models_dir, "maternal_risk_numpy", "classes.npy"), b"numpy v2")
+    assert "maternal_risk_numpy/classes.npy" in model_registry.derived_mismatch(models_dir, DISTILLED)
+
+    os.remove(os.path.join(models_dir, DISTILLED + ".json"))
+    assert model_registry.derived_mismatch(models_dir, DISTILLED) is not None
+
+
+def test_publish_skips_stale_student(tmp_path):
+    models_dir = models_dir_with_student(tmp_path)
+    registry_dir = str(tmp_path / "registry")
+
+    version = model_registry.publish(models_dir, registry_dir=registry_dir)
+    assert DISTILLED in os.listdir(model_registry.version_dir(version, registry_dir))
+
+    write(os.path.join(models_dir, "maternal_risk_logreg.joblib"), b"logreg v2")
+    version = model_registry.publish(models_dir, registry_dir=registry_dir)
+    published = os.listdir(model_registry.version_dir(version, registry_dir))
+    assert DISTILLED not in published and DISTILLED + ".json" not in published
+
+
+def test_remove_derived(tmp_path):
+    models_dir = models_dir_with_student(tmp_path)
+    model_registry.remove_derived(models_dir, keep=[DISTILLED])
+    assert os.path.isdir(os.path.join(models_dir, DISTILLED))
+
+    model_registry.remove_derived(models_dir)
+    assert not os.path.exists(os.path.join(models_dir, DISTILLED))
+    assert not os.path.exists(os.path.join(models_dir, DISTILLED + ".json"))
+    assert not os.path.exists(os.path.join(models_dir, "maternal_risk_numpy"))
+    assert os.path.exists(os.path.join(models_dir, "maternal_risk_logreg.joblib"))
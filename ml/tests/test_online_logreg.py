@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+
+import online_logreg
+from inference import LOGREG_MODEL_FILE, NUMPY_MODEL_DIR, NumpyRiskModel
+from online_logreg import OnlineLogReg
+
+MODELS_DIR = online_logreg.MODELS_DIR
+
+pytestmark = pytest.mark.skipif(
+    not os.path.isdir(os.path.join(MODELS_DIR, NUMPY_MODEL_DIR)),
+    reason="NumPy export not present in ml/models/",
+)
+
+
+def vitals(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lo = np.array([15, 90, 50, 3, 35, 60], dtype=float)
+    hi = np.array([50, 180, 120, 20, 40, 130], dtype=float)
+    return lo + (hi - lo) * rng.random((n, len(lo)))
+
+
+def labelled(n, seed=0):
+    x = vitals(n, seed)
+    return x, np.random.default_rng(seed).integers(0, 3, n)
+
+
+@pytest.fixture(scope="module")
+def batch():
+    return NumpyRiskModel.load(os.path.join(MODELS_DIR, NUMPY_MODEL_DIR))
+
+
+def test_seed_reproduces_batch_model(batch):
+    x = vitals(2000)
+    expected = batch.logreg_proba(x)
+    seeded = OnlineLogReg.from_numpy_export(MODELS_DIR)
+    np.testing.assert_allclose(seeded.predict_proba(x), expected, rtol=0, atol=1e-12)
+
+    if os.path.exists(os.path.join(MODELS_DIR, LOGREG_MODEL_FILE)):
+        pytest.importorskip("joblib")
+        from_joblib = OnlineLogReg.from_batch_model(MODELS_DIR)
+        np.testing.assert_allclose(from_joblib.predict_proba(x), expected, rtol=0, atol=1e-12)
+
+
+def test_rescaling_keeps_decision_function():
+    model = OnlineLogReg.from_numpy_export(MODELS_DIR)
+    x = vitals(500, seed=1)
+    before = model.predict_proba(x)
+    mean_before = model.scaler_mean.copy()
+
+    # No gradient step: only the scaler moves and the weights are re-expressed
+    model.partial_fit(*labelled(300, seed=2), learning_rate=0.0, alpha=0.0)
+    assert not np.allclose(model.scaler_mean, mean_before)
+    np.testing.assert_allclose(model.predict_proba(x), before, rtol=0, atol=1e-10)
+
+
+def test_update_learns_and_checkpoint_round_trips(tmp_path):
+    path = str(tmp_path / online_logreg.ONLINE_MODEL_DIR)
+    x, y = labelled(400, seed=3)
+    model = online_logreg.update_checkpoint(path, x, y, seed_dir=MODELS_DIR)
+    seeded = OnlineLogReg.from_numpy_export(MODELS_DIR)
+    assert model.n_updates == 1
+    assert not np.allclose(model.predict_proba(x), seeded.predict_proba(x))
+
+    loaded = OnlineLogReg.load(path)
+    np.testing.assert_array_equal(loaded.predict_proba(x), model.predict_proba(x))
+    assert loaded.version == model.version == online_logreg.checkpoint_version(path)
+
+
+def test_reseed_changes_version(tmp_path):
+    path = str(tmp_path / online_logreg.ONLINE_MODEL_DIR)
+    online_logreg.update_checkpoint(path, *labelled(200, seed=4), seed_dir=MODELS_DIR)
+    first = online_logreg.checkpoint_version(path)
+
+    # Re-seeded and updated once more with other data: same update count
+    OnlineLogReg.from_numpy_export(MODELS_DIR).save(path)
+    online_logreg.update_checkpoint(path, *labelled(200, seed=5))
+    second = online_logreg.checkpoint_version(path)
+
+    assert OnlineLogReg.load(path).n_updates == 1
+    assert first != second
@@ -0,0 +1,239 @@
+"""
+Train every maternal-risk model in one run and publish them as one set.
+
+    python train_all.py
+    python train_all.py --multi-fidelity --pso-workers 6
+    python train_all.py --no-activate      # publish, but keep serving the old version
+
+The corpus is loaded once (training_data.py cache) and handed to one worker
+process per model - RF with SMOTE, PSO-tuned RF, logistic regression - so
+the fits run in parallel on copy-on-write shared arrays. Each worker writes
+its artifacts into a staging directory; nothing is published unless every
+fit (and the NumPy export parity check) succeeds.
+
+Publishing:
+  - the staging directory becomes a new registry version via
+    model_registry.publish() (temp dir + rename) and is activated, so
+    ml-api only ever sees complete, checksummed sets;
+  - the flat ml/models/ copy read by predict.py and rescore.py is then
+    refreshed file by file with os.replace.
+
+predict.py feeds its RF the 6 base features + MAP + PulsePressure, which
+is what the SMOTE RF is trained on, so that model is served under the
+maternal_risk_rf_pso_multi.* names. The PSO-tuned RF (6 base features) is
+published alongside as maternal_risk_rf_pso_tuned.*.
+
+TRAINING_RUN_FILE holds the combined metadata: data cache key, dedup
+summary, per-model files, metrics and fit time.
+"""
+
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from threadpoolctl import threadpool_limits
+
+import model_registry
+import train_logreg_multi
+import train_pso_multi
+import train_rf_balanced_multi
+from export_numpy_models import check_parity, export_arrays
+from inference import NUMPY_MODEL_DIR, NumpyRiskModel, SklearnRiskModel, save_arrays
+from training_data import load_training_data
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+
+TRAINING_RUN_FILE = "training_run.json"
+PSO_TUNED_FILES = (
+    "maternal_risk_rf_pso_tuned.joblib",
+    "maternal_risk_scaler_pso_tuned.joblib",
+    "maternal_risk_meta_pso_tuned.json",
+)
+
+# name -> (trainer module, files it writes)
+MODELS = {
+    "rf_smote": (
+        train_rf_balanced_multi,
+        (train_rf_balanced_multi.MODEL_FILE, train_rf_balanced_multi.SCALER_FILE,
+         train_rf_balanced_multi.META_FILE),
+    ),
+    "rf_pso": (train_pso_multi, PSO_TUNED_FILES),
+    "logreg": (
+        train_logreg_multi,
+        (train_logreg_multi.MODEL_FILE, train_logreg_multi.SCALER_FILE,
+         train_logreg_multi.META_FILE),
+    ),
+}
+
+
+# -----------------------------
+# Worker side
+# -----------------------------
+_data = None
+
+
+def _init_worker(data):
+    # With fork this is inherited, not pickled: the arrays are shared
+    # copy-on-write by all workers
+    global _data
+    _data = data
+
+
+def fit_model(name, staging_dir, pso_options):
+    """
+    Fit one model on the shared data and save it into staging_dir.
+    Returns (name, meta, wall seconds, captured output) - workers don't
+    print directly so the three logs don't interleave.
+    """
+    trainer, files = MODELS[name]
+    out = io.StringIO()
+    t0 = time.perf_counter()
+    # One thread per fit: the parallelism is across models (and, for PSO,
+    # its own particle pool)
+    options = pso_options if name == "rf_pso" else {}
+    with contextlib.redirect_stdout(out), threadpool_limits(limits=1):
+        model, scaler, meta = trainer.fit(_data, n_jobs=1, **options)
+        fit_seconds = time.perf_counter() - t0
+        # Stored forests behave like the ones the standalone trainers write
+        # (n_jobs is deprecated on LogisticRegression)
+        if name != "logreg":
+            model.n_jobs = -1
+        trainer.save(staging_dir, model, scaler, meta, files)
+    return name, meta, fit_seconds, out.getvalue()
+
+
+# -----------------------------
+# Publishing
+# -----------------------------
+def export_numpy(staging_dir):
+    """NumPy export of the served RF + logreg; False if parity fails."""
+    ref = SklearnRiskModel(staging_dir)
+    out_path = os.path.join(staging_dir, NUMPY_MODEL_DIR)
+    save_arrays(out_path, export_arrays(ref))
+    return check_parity(ref, NumpyRiskModel.load(out_path), tolerance=1e-9)
+
+
+def sync_models_dir(staging_dir, models_dir=MODELS_DIR):
+    """
+    Move the staged artifacts over the flat models/ copy. Derived artifacts
+    (distilled student, ...) this run didn't rebuild are deleted: they
+    were built from the old models.
+    """
+    model_registry.remove_derived(
+        models_dir, keep=[n for n in model_registry.DERIVED_ARTIFACTS
+                          if os.path.exists(os.path.join(staging_dir, n))]
+    )
+    for name in model_registry.ARTIFACTS:
+        src = os.path.join(staging_dir, name)
+        dst = os.path.join(models_dir, name)
+        if not os.path.exists(src):
+            continue
+        if os.path.isdir(src):
+            old_dir = tempfile.mkdtemp(prefix=".old-", dir=models_dir)
+            if os.path.exists(dst):
+                os.rename(dst, os.path.join(old_dir, name))
+            os.rename(src, dst)
+            shutil.rmtree(old_dir)
+        else:
+            os.replace(src, dst)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and publish all maternal-risk models")
+    parser.add_argument("--workers", type=int, default=min(len(MODELS), os.cpu_count() or 1),
+                        help="models fitted at the same time")
+    parser.add_argument("--pso-workers", type=int, default=max(1, (os.cpu_count() or 1) - 2),
+                        help="processes for the PSO particle x fold fits")
+    parser.add_argument("--fitness-cache", default=None,
+                        help="JSON file to persist PSO fitness values across runs")
+    parser.add_argument("--multi-fidelity", action="store_true",
+                        help="screen PSO particles by OOB score before full CV")
+    parser.add_argument("--no-activate", action="store_true",
+                        help="publish the new registry version without activating it")
+    parser.add_argument("--no-sync", action="store_true",
+                        help="leave the flat ml/models/ copy untouched")
+    args = parser.parse_args()
+
+    data = load_training_data()
+    print(f"[INFO] Dataset shape: {data.X.shape}")
+
+    pso_options = {
+        "workers": args.pso_workers,
+        "fitness_cache": args.fitness_cache,
+        "fidelity": {"screen_trees": 50, "eta": 3.0} if args.multi_fidelity else None,
+    }
+
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix=".staging-", dir=MODELS_DIR)
+    # Swarm state lives and dies with the run (not in ARTIFACTS, so unpublished)
+    pso_options["checkpoint"] = os.path.join(staging_dir, "pso_checkpoint.npz")
+    try:
+        t0 = time.perf_counter()
+        results = {}
+        with ProcessPoolExecutor(
+            args.workers, initializer=_init_worker, initargs=(data,)
+        ) as pool:
+            futures = [pool.submit(fit_model, name, staging_dir, pso_options) for name in MODELS]
+            for future in as_completed(futures):
+                name, meta, fit_seconds, output = future.result()
+                print(f"[INFO] ---- {name} ({fit_seconds:.1f}s) ----")
+                print(output, end="")
+                results[name] = (meta, fit_seconds)
+        wall_seconds = time.perf_counter() - t0
+
+        if not export_numpy(staging_dir):
+            sys.exit("[ERROR] NumPy export differs from sklearn; nothing published")
+
+        run = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "data": {
+                "cache_key": data.meta["key"],
+                "n_samples": int(len(data.y)),
+                "sources": data.meta["sources"],
+                "dedup": data.meta.get("dedup"),
+            },
+            "served_rf": "rf_smote",
+            "models": {
+                name: {
+                    "files": list(MODELS[name][1]),
+                    "fit_seconds": round(results[name][1], 3),
+                    "meta": results[name][0],
+                }
+                for name in MODELS
+            },
+            "wall_seconds": round(wall_seconds, 3),
+        }
+        with open(os.path.join(staging_dir, TRAINING_RUN_FILE), "w") as f:
+            json.dump(run, f, indent=2)
+
+        metrics = {
+            "rf_val_macro_f1": results["rf_smote"][0]["val_macro_f1"],
+            "pso_best_macro_f1": results["rf_pso"][0]["best_macro_f1"],
+            "logreg_val_macro_f1": results["logreg"][0]["val_macro_f1"],
+        }
+        version = model_registry.publish(staging_dir, metrics, activate_now=not args.no_activate)
+        print(f"[INFO] Published {version}" + ("" if args.no_activate else " (active)"))
+        if not args.no_sync:
+            sync_models_dir(staging_dir)
+            print(f"[INFO] Updated {MODELS_DIR}")
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    total_fit = sum(fit_seconds for _, fit_seconds in results.values())
+    print("[INFO] Fit time per model:")
+    for name in MODELS:
+        print(f"  {name}: {results[name][1]:.1f}s")
+    print(f"[INFO] Wall time {wall_seconds:.1f}s for {total_fit:.1f}s of fits "
+          f"({total_fit / max(wall_seconds, 1e-9):.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
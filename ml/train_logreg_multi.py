@@ -2,7 +2,7 @@
 Train a Logistic Regression baseline model on the same maternal
 risk datasets as the RF+PSO model.
 
-Inputs:  All CSVs in ml/data_multi/ with columns:
+Inputs:  All CSVs in ml/data_multi/ (via the training_data.py cache) with columns:
     Age, SystolicBP, DiastolicBP, BS, BodyTemp, HeartRate, RiskLevel
 
 Outputs (saved in ml/models/):
@@ -12,91 +12,34 @@ Outputs (saved in ml/models/):
 """
 
 import os
-import glob
 import json
 
 import numpy as np
-import pandas as pd
 from sklearn.preprocessing import StandardScaler
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, f1_score
 import joblib
 
+import model_registry
+from training_data import DATA_DIR, load_training_data
+
 BASE_DIR = os.path.dirname(__file__)
-DATA_DIR = os.path.join(BASE_DIR, "data_multi")
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 
-os.makedirs(MODELS_DIR, exist_ok=True)
-
-EXPECTED_COLS = [
-    "Age",
-    "SystolicBP",
-    "DiastolicBP",
-    "BS",
-    "BodyTemp",
-    "HeartRate",
-    "RiskLevel",
-]
-
-
-def load_all_data():
-    csv_files = glob.glob(os.path.join(DATA_DIR, "*.csv"))
-    if not csv_files:
-        raise FileNotFoundError(
-            f"No CSV files found in {DATA_DIR}. Put your datasets there."
-        )
-
-    dfs = []
-    for path in csv_files:
-        df = pd.read_csv(path)
-        missing = set(EXPECTED_COLS) - set(df.columns)
-        if missing:
-            print(
-                f"[WARN] {os.path.basename(path)} is missing columns: {missing}. Skipping."
-            )
-            continue
-        dfs.append(df[EXPECTED_COLS].copy())
-
-    if not dfs:
-        raise ValueError("No valid CSVs with required columns were found.")
-
-    data = pd.concat(dfs, ignore_index=True)
-    return data
+MODEL_FILE = "maternal_risk_logreg.joblib"
+SCALER_FILE = "maternal_risk_logreg_scaler.joblib"
+META_FILE = "maternal_risk_logreg_meta.json"
 
 
-def main():
-    print(f"[INFO] Loading data from {DATA_DIR} ...")
-    data = load_all_data()
-    print(f"[INFO] Combined dataset shape: {data.shape}")
-
-    # Drop rows with any missing values in features/label
-    data = data.dropna(subset=EXPECTED_COLS)
-    print(f"[INFO] After dropping NaNs: {data.shape}")
-
-    # Map RiskLevel to integers
-    risk_mapping = {
-        "low risk": 0,
-        "mid risk": 1,
-        "high risk": 2,
-        "low": 0,
-        "medium": 1,
-        "mid": 1,
-        "normal": 0,
-        "high": 2,
-    }
-
-    def map_risk(x):
-        x = str(x).strip().lower()
-        return risk_mapping.get(x, None)
-
-    data["RiskInt"] = data["RiskLevel"].apply(map_risk)
-    data = data.dropna(subset=["RiskInt"])
-    data["RiskInt"] = data["RiskInt"].astype(int)
-
-    feature_cols = ["Age", "SystolicBP", "DiastolicBP", "BS", "BodyTemp", "HeartRate"]
-    X = data[feature_cols].values.astype(float)
-    y = data["RiskInt"].values
+def fit(data, n_jobs=-1):
+    """
+    Scaler + balanced multinomial logistic regression -> (clf, scaler, meta).
+    n_jobs is accepted for train_all.py but unused: lbfgs is single-process.
+    """
+    feature_cols = data.feature_cols
+    X = data.X
+    y = data.y
 
     # Show class distribution (to see imbalance)
     unique, counts = np.unique(y, return_counts=True)
@@ -116,10 +59,8 @@ def main():
 
     # Logistic Regression with class balancing so it doesn't collapse to majority class
     clf = LogisticRegression(
-        multi_class="multinomial",
-        solver="lbfgs",
+        solver="lbfgs",  # multinomial for multi-class targets
         max_iter=1000,
-        n_jobs=-1,
         class_weight="balanced",  # <-- important change
         C=2.0,                    # <-- a bit less regularization than default
     )
@@ -133,26 +74,22 @@ def main():
     print("[INFO] Classification report:\n")
     print(classification_report(y_val, y_pred))
 
-    # Save model, scaler, and metadata
-    model_path = os.path.join(MODELS_DIR, "maternal_risk_logreg.joblib")
-    scaler_path = os.path.join(MODELS_DIR, "maternal_risk_logreg_scaler.joblib")
-    meta_path = os.path.join(MODELS_DIR, "maternal_risk_logreg_meta.json")
-
-    joblib.dump(clf, model_path)
-    joblib.dump(scaler, scaler_path)
-
     # Store the label mapping in a consistent direction: name -> int
-    label_mapping = {
-        "low risk": 0,
-        "mid risk": 1,
-        "high risk": 2,
-    }
-
     meta = {
         "features": feature_cols,
-        "label_mapping": label_mapping,
+        "label_mapping": data.label_mapping,
+        "val_macro_f1": float(f1),
     }
+    return clf, scaler, meta
+
+
+def save(out_dir, clf, scaler, meta, files=(MODEL_FILE, SCALER_FILE, META_FILE)):
+    model_path, scaler_path, meta_path = (os.path.join(out_dir, name) for name in files)
+    # NumPy export / distilled student / lattice of the old models
+    model_registry.remove_derived(out_dir)
 
+    joblib.dump(clf, model_path)
+    joblib.dump(scaler, scaler_path)
     with open(meta_path, "w") as f:
         json.dump(meta, f, indent=2)
 
@@ -161,5 +98,14 @@ def main():
     print(f"[INFO] Saved meta to {meta_path}")
 
 
+def main():
+    print(f"[INFO] Loading data from {DATA_DIR} ...")
+    data = load_training_data()
+    print(f"[INFO] Dataset shape: {data.X.shape}")
+
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    save(MODELS_DIR, *fit(data))
+
+
 if __name__ == "__main__":
     main()
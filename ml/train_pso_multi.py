@@ -1,76 +1,30 @@
 import os
-import glob
+import argparse
+import math
+import hashlib
 import json
+import multiprocessing
+import time
 import joblib
 import numpy as np
-import pandas as pd
 from sklearn.model_selection import StratifiedKFold
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import f1_score
 from sklearn.ensemble import RandomForestClassifier
+from threadpoolctl import threadpool_limits
+
+import model_registry
+from training_data import DATA_DIR, FEATURE_COLS, load_training_data
 
 BASE_DIR = os.path.dirname(__file__)
-DATA_DIR = os.path.join(BASE_DIR, "data_multi")
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 os.makedirs(MODELS_DIR, exist_ok=True)
 
-FEATURE_COLS = ["Age", "SystolicBP", "DiastolicBP", "BS", "BodyTemp", "HeartRate"]
-TARGET_COL = "RiskLevel"
-
-
-def load_all_datasets():
-    csv_files = glob.glob(os.path.join(DATA_DIR, "*.csv"))
-    if not csv_files:
-        raise FileNotFoundError(f"No CSV files found in {DATA_DIR}")
-
-    dfs = []
-    for path in csv_files:
-        df = pd.read_csv(path)
-
-        missing = set(FEATURE_COLS + [TARGET_COL]) - set(df.columns)
-        if missing:
-            raise ValueError(f"{os.path.basename(path)} is missing columns: {missing}")
-
-        # Keep only required columns
-        dfs.append(df[FEATURE_COLS + [TARGET_COL]])
-
-    combined = pd.concat(dfs, ignore_index=True).dropna()
-
-    # Normalise labels to {low, mid, high}
-    combined[TARGET_COL] = (
-        combined[TARGET_COL]
-        .astype(str)
-        .str.strip()
-        .str.lower()
-        .replace(
-            {
-                "low": "low risk",
-                "low_risk": "low risk",
-                "mid": "mid risk",
-                "mid_risk": "mid risk",
-                "medium": "mid risk",
-                "high": "high risk",
-                "high_risk": "high risk",
-            }
-        )
-    )
-
-    return combined
-
-
-def encode_labels(y_series: pd.Series):
-    mapping = {"low risk": 0, "mid risk": 1, "high risk": 2}
-    encoded = y_series.map(mapping)
-    if encoded.isnull().any():
-        uniques = sorted(y_series.unique())
-        raise ValueError(
-            f"Unexpected risk labels {uniques}. "
-            f"Update mapping in encode_labels()."
-        )
-    return encoded.values, mapping
-
-
-def make_model_from_params(params):
+def effective_params(params):
+    """
+    Float PSO position -> the integer RF config it actually trains:
+    (n_estimators, max_depth, min_samples_split, min_samples_leaf).
+    """
     # params = [n_estimators, max_depth, min_samples_split, min_samples_leaf]
     n_estimators = int(params[0])
     max_depth = int(params[1])
@@ -81,6 +35,11 @@ def make_model_from_params(params):
     max_depth = max(2, min(max_depth, 20))
     min_samples_split = max(2, min(min_samples_split, 20))
     min_samples_leaf = max(1, min(min_samples_leaf, 20))
+    return n_estimators, max_depth, min_samples_split, min_samples_leaf
+
+
+def make_model_from_params(params, n_jobs=-1):
+    n_estimators, max_depth, min_samples_split, min_samples_leaf = effective_params(params)
 
     return RandomForestClassifier(
         n_estimators=n_estimators,
@@ -89,55 +48,356 @@ def make_model_from_params(params):
         min_samples_leaf=min_samples_leaf,
         random_state=42,
         class_weight="balanced_subsample",
-        n_jobs=-1,
+        n_jobs=n_jobs,
     )
 
 
-def pso_objective(params, X, y, n_splits=5):
+# StratifiedKFold seed for the PSO cross-validation
+FOLD_SEED = 42
+
+
+class FitnessCache:
+    """
+    Mean CV macro F1 per (effective RF config, n_splits, fold seed).
+
+    Many float positions truncate to the same integer config, and a seeded
+    forest on fixed folds always scores the same, so each config only needs
+    fitting once. With a path the cache is kept on disk across runs; it is
+    tied to a hash of the training data and ignored if that changed.
+    """
+
+    def __init__(self, path=None, data_key=None):
+        self.path = path
+        self.data_key = data_key
+        self.entries = {}  # key -> (mean F1, CPU seconds of its fits)
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+        if path and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get("data_key") == data_key:
+                self.entries = {tuple(k): (f1, sec) for k, f1, sec in saved["entries"]}
+                print(f"Loaded {len(self.entries)} cached fitness values from {path}")
+            else:
+                print(f"Ignoring {path}: training data changed")
+
+    @staticmethod
+    def data_fingerprint(X, y):
+        h = hashlib.sha256()
+        h.update(np.ascontiguousarray(X).tobytes())
+        h.update(np.ascontiguousarray(y).tobytes())
+        return h.hexdigest()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.seconds_saved += entry[1]
+        return entry[0]
+
+    def put(self, key, f1, seconds):
+        self.entries[key] = (f1, seconds)
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(
+                {
+                    "data_key": self.data_key,
+                    "entries": [[list(k), f1, sec] for k, (f1, sec) in self.entries.items()],
+                },
+                f,
+            )
+        os.replace(tmp, self.path)
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups if lookups else 0.0
+        return (f"fitness cache: {self.hits}/{lookups} hits ({rate:.0%}), "
+                f"~{self.seconds_saved:.1f}s of fitting saved")
+
+
+# Read-only training data for fit_fold(); set once per pool worker
+# (inherited copy-on-write under fork) or in-process for serial runs.
+_shared = {}
+
+
+def _set_shared(X, y, n_splits):
+    skf = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=FOLD_SEED)
+    _shared.update(X=X, y=y, folds=list(skf.split(X, y)))
+
+
+def _init_worker(X, y, n_splits):
+    # Parallelism comes from the pool; no BLAS/OpenMP threads inside a fit
+    threadpool_limits(limits=1)
+    _set_shared(X, y, n_splits)
+
+
+def make_pool(X, y, n_splits=5, workers=None):
+    """Process pool for pso_objective(), or None for serial evaluation."""
+    workers = workers or os.cpu_count()
+    if workers <= 1:
+        return None
+    return multiprocessing.Pool(workers, initializer=_init_worker, initargs=(X, y, n_splits))
+
+
+def fit_fold(particle, fold):
+    """Fit one particle's RF on one CV fold -> (macro F1, fit CPU seconds)."""
+    t0 = time.process_time()
+    X, y = _shared["X"], _shared["y"]
+    train_idx, val_idx = _shared["folds"][fold]
+    # n_jobs doesn't change a seeded forest, only how it is built
+    model = make_model_from_params(particle, n_jobs=1)
+    model.fit(X[train_idx], y[train_idx])
+    y_pred = model.predict(X[val_idx])
+    # CPU time of a single-threaded fit = what it costs when run serially
+    return f1_score(y[val_idx], y_pred, average="macro"), time.process_time() - t0
+
+
+def fit_oob(config):
+    """
+    Screening fit: one RF (config = effective params, usually with few trees)
+    on all of X, scored by out-of-bag macro F1 -> (macro F1, fit CPU seconds).
+    """
+    t0 = time.process_time()
+    X, y = _shared["X"], _shared["y"]
+    model = make_model_from_params(config, n_jobs=1)
+    model.set_params(n_estimators=config[0], oob_score=True)
+    model.fit(X, y)
+    oob = model.oob_decision_function_
+    seen = ~np.isnan(oob).any(axis=1)  # rows out-of-bag for at least one tree
+    y_pred = model.classes_[oob[seen].argmax(axis=1)]
+    return f1_score(y[seen], y_pred, average="macro"), time.process_time() - t0
+
+
+def pso_objective(params, X, y, n_splits=5, pool=None, stats=None, cache=None):
     """
     PSO objective: we want to MAXIMIZE macro F1, but PSO MINIMIZES,
     so we return -macro_f1.
     params: array of shape (n_particles, 4)
+
+    Every (particle, fold) fit is an independent task. With a pool
+    (make_pool) they all run in parallel; scores are identical to the
+    serial run because each forest is seeded and folds are fixed.
+    Configs found in `cache` (FitnessCache), or repeated within params,
+    are not refitted.
+    stats, if given, accumulates "fits" and "fit_seconds".
+    """
+    keys = [effective_params(particle) + (n_splits, FOLD_SEED) for particle in params]
+    mean_f1 = {}
+    todo = []
+    for key in keys:
+        if key in mean_f1:
+            continue
+        cached = cache.get(key) if cache is not None else None
+        if cached is None:
+            todo.append(key)
+        mean_f1[key] = cached
+
+    tasks = [(key[:4], fold) for key in todo for fold in range(n_splits)]
+    if not tasks:
+        results = []
+    elif pool is None:
+        _set_shared(X, y, n_splits)
+        results = [fit_fold(*task) for task in tasks]
+    else:
+        results = pool.starmap(fit_fold, tasks, chunksize=1)
+
+    if stats is not None:
+        stats["fits"] = stats.get("fits", 0) + len(results)
+        stats["fit_seconds"] = stats.get("fit_seconds", 0.0) + sum(r[1] for r in results)
+
+    for i, key in enumerate(todo):
+        fold_results = results[i * n_splits:(i + 1) * n_splits]
+        mean_f1[key] = np.mean([r[0] for r in fold_results])
+        if cache is not None:
+            cache.put(key, float(mean_f1[key]), sum(r[1] for r in fold_results))
+
+    # negative because PSO minimizes
+    return np.array([-mean_f1[key] for key in keys])
+
+
+def screen_objective(params, X, y, screen_trees, pool=None, stats=None, cache=None):
+    """
+    Cheap low-fidelity objective: -OOB macro F1 of a screen_trees-tree
+    forest per particle (one fit each instead of n_splits full-size ones).
+    stats, if given, accumulates "screen_fits" and "fit_seconds".
+    """
+    keys = [(screen_trees,) + effective_params(particle)[1:] + ("oob",) for particle in params]
+    oob_f1 = {}
+    todo = []
+    for key in keys:
+        if key in oob_f1:
+            continue
+        cached = cache.get(key) if cache is not None else None
+        if cached is None:
+            todo.append(key)
+        oob_f1[key] = cached
+
+    configs = [key[:4] for key in todo]
+    if not configs:
+        results = []
+    elif pool is None:
+        _shared.update(X=X, y=y)
+        results = [fit_oob(config) for config in configs]
+    else:
+        results = pool.map(fit_oob, configs, chunksize=1)
+
+    if stats is not None:
+        stats["screen_fits"] = stats.get("screen_fits", 0) + len(results)
+        stats["fit_seconds"] = stats.get("fit_seconds", 0.0) + sum(r[1] for r in results)
+
+    for key, (f1, seconds) in zip(todo, results):
+        oob_f1[key] = f1
+        if cache is not None:
+            cache.put(key, float(f1), seconds)
+    return np.array([-oob_f1[key] for key in keys])
+
+
+def multi_fidelity_objective(params, X, y, fidelity, pool=None, stats=None, cache=None):
     """
-    skf = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42)
-    scores = []
+    Successive-halving style: screen every particle with screen_objective(),
+    promote the best 1/eta of them to the full pso_objective(). Particles
+    not promoted get +inf, so personal and global bests only ever hold
+    full-CV scores (comparable with the exhaustive search).
+    """
+    screen = screen_objective(params, X, y, fidelity["screen_trees"], pool, stats, cache)
+    n_promote = max(1, math.ceil(len(params) / fidelity["eta"]))
+    promoted = np.argsort(screen, kind="stable")[:n_promote]
 
-    for particle in params:
-        f1_scores = []
-        model = make_model_from_params(particle)
-        for train_idx, val_idx in skf.split(X, y):
-            X_train, X_val = X[train_idx], X[val_idx]
-            y_train, y_val = y[train_idx], y[val_idx]
-            model.fit(X_train, y_train)
-            y_pred = model.predict(X_val)
-            f1_scores.append(f1_score(y_val, y_pred, average="macro"))
-        scores.append(-np.mean(f1_scores))  # negative because PSO minimizes
-    return np.array(scores)
+    values = np.full(len(params), np.inf)
+    values[promoted] = pso_objective(params[promoted], X, y, pool=pool, stats=stats, cache=cache)
+    return values
 
 
-def run_pso(X, y, n_particles=12, n_iters=20):
+def timed_objective(params, X, y, pool, cache=None, fidelity=None, totals=None):
+    """
+    pso_objective() (or multi_fidelity_objective() if fidelity is set) plus
+    a log suffix comparing wall time with serial fit time. totals, if
+    given, accumulates fits, screen_fits and wall seconds for the run.
+    """
+    stats = {"fits": 0, "screen_fits": 0, "fit_seconds": 0.0}
+    t0 = time.perf_counter()
+    if fidelity:
+        values = multi_fidelity_objective(params, X, y, fidelity, pool, stats, cache)
+    else:
+        values = pso_objective(params, X, y, pool=pool, stats=stats, cache=cache)
+    wall = time.perf_counter() - t0
+
+    if totals is not None:
+        for k in ("fits", "screen_fits"):
+            totals[k] = totals.get(k, 0) + stats[k]
+        totals["wall_seconds"] = totals.get("wall_seconds", 0.0) + wall
+
+    if stats["fits"] or stats["screen_fits"]:
+        speedup = stats["fit_seconds"] / wall if wall else 0.0
+        timing = f"{stats['fits']} fits in {wall:.1f}s, {speedup:.1f}x vs serial"
+        if fidelity:
+            timing = (f"{stats['screen_fits']} screening + {timing}, "
+                      f"{int(np.isfinite(values).sum())}/{len(values)} promoted")
+    else:
+        timing = "no fits needed"
+    if cache is not None:
+        cache.save()
+        timing += f"; {cache.summary()}"
+    return values, timing
+
+
+CHECKPOINT_ARRAYS = ["pos", "vel", "pbest_pos", "pbest_val", "gbest_pos"]
+
+
+def save_checkpoint(path, arrays, meta):
+    """Swarm arrays + JSON meta (settings, RNG state, progress) in one .npz, atomically."""
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(tmp, meta=np.array(json.dumps(meta)), **arrays)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path):
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data["meta"]))
+        arrays = {name: data[name].copy() for name in CHECKPOINT_ARRAYS}
+    return arrays, meta
+
+
+def run_pso(X, y, n_particles=12, n_iters=20, pool=None, cache=None, fidelity=None,
+            totals=None, checkpoint=None, checkpoint_every=1, resume=False):
     """
     Simple PSO in 4D hyperparameter space.
+
+    fidelity: None for full 5-fold CV of every particle, or
+    {"screen_trees": int, "eta": float} for multi-fidelity evaluation
+    (see multi_fidelity_objective). totals: see timed_objective.
+
+    checkpoint: .npz path the full swarm state (positions, velocities,
+    bests, RNG state) is written to every checkpoint_every iterations.
+    With resume=True the search continues from it and ends exactly where
+    an uninterrupted run would.
     """
     dim = 4
     lb = np.array([50, 2, 2, 1], dtype=float)
     ub = np.array([400, 20, 20, 20], dtype=float)
 
+    settings = {
+        "n_particles": n_particles,
+        "n_iters": n_iters,
+        "fidelity": fidelity,
+        "data_key": FitnessCache.data_fingerprint(X, y),
+    }
+
     rng = np.random.default_rng(42)
-    pos = lb + (ub - lb) * rng.random((n_particles, dim))
-    vel = rng.normal(scale=5.0, size=(n_particles, dim))
+    if resume and checkpoint and os.path.exists(checkpoint):
+        state, meta = load_checkpoint(checkpoint)
+        if meta["settings"] != settings:
+            raise ValueError(
+                f"Checkpoint {checkpoint} was written with different settings or data: "
+                f"{meta['settings']}"
+            )
+        pos, vel = state["pos"], state["vel"]
+        pbest_pos, pbest_val = state["pbest_pos"], state["pbest_val"]
+        gbest_pos = state["gbest_pos"]
+        gbest_val = pbest_val[np.argmin(pbest_val)]
+        rng.bit_generator.state = meta["rng_state"]
+        start_it = meta["iteration"]
+        if totals is not None:
+            totals.update(meta["totals"])
+        print(f"Resumed from {checkpoint} after iteration {start_it}/{n_iters} "
+              f"- best macro F1: {-gbest_val:.4f}")
+    else:
+        pos = lb + (ub - lb) * rng.random((n_particles, dim))
+        vel = rng.normal(scale=5.0, size=(n_particles, dim))
+
+        pbest_pos = pos.copy()
+        pbest_val, timing = timed_objective(pos, X, y, pool, cache, fidelity, totals)
+        print(f"Initial swarm - {timing}")
+        gbest_idx = np.argmin(pbest_val)
+        gbest_pos = pbest_pos[gbest_idx].copy()
+        gbest_val = pbest_val[gbest_idx]
+        start_it = 0
+
+    def write_checkpoint(iteration):
+        save_checkpoint(
+            checkpoint,
+            {"pos": pos, "vel": vel, "pbest_pos": pbest_pos, "pbest_val": pbest_val,
+             "gbest_pos": gbest_pos},
+            {"settings": settings, "iteration": iteration,
+             "rng_state": rng.bit_generator.state, "totals": totals or {}},
+        )
 
-    pbest_pos = pos.copy()
-    pbest_val = pso_objective(pos, X, y)
-    gbest_idx = np.argmin(pbest_val)
-    gbest_pos = pbest_pos[gbest_idx].copy()
-    gbest_val = pbest_val[gbest_idx]
+    if checkpoint and start_it == 0:
+        write_checkpoint(0)
 
     c1 = 1.5
     c2 = 1.5
     w_max, w_min = 0.9, 0.4
 
-    for it in range(n_iters):
+    for it in range(start_it, n_iters):
         w = w_max - (w_max - w_min) * (it / max(1, n_iters - 1))
         r1 = rng.random((n_particles, dim))
         r2 = rng.random((n_particles, dim))
@@ -150,7 +410,7 @@ def run_pso(X, y, n_particles=12, n_iters=20):
         pos = pos + vel
         pos = np.clip(pos, lb, ub)
 
-        obj_vals = pso_objective(pos, X, y)
+        obj_vals, timing = timed_objective(pos, X, y, pool, cache, fidelity, totals)
 
         improved = obj_vals < pbest_val
         pbest_pos[improved] = pos[improved]
@@ -160,51 +420,134 @@ def run_pso(X, y, n_particles=12, n_iters=20):
         gbest_pos = pbest_pos[gbest_idx].copy()
         gbest_val = pbest_val[gbest_idx]
 
-        print(f"Iteration {it+1}/{n_iters} - best macro F1: {-gbest_val:.4f}")
+        print(f"Iteration {it+1}/{n_iters} - best macro F1: {-gbest_val:.4f} ({timing})")
+
+        if checkpoint and ((it + 1) % checkpoint_every == 0 or it + 1 == n_iters):
+            write_checkpoint(it + 1)
 
     return gbest_pos, -gbest_val
 
 
-def main():
-    df = load_all_datasets()
-    X_raw = df[FEATURE_COLS].values
-    y_raw, label_mapping = encode_labels(df[TARGET_COL])
+def print_search_totals(totals, n_particles, n_iters, n_splits=5):
+    exhaustive = (n_iters + 1) * n_particles * n_splits
+    print(f"Search: {totals.get('fits', 0)} full CV fits + {totals.get('screen_fits', 0)} "
+          f"screening fits in {totals.get('wall_seconds', 0.0):.1f}s "
+          f"(exhaustive, uncached: {exhaustive} full CV fits)")
+
+
+MODEL_FILE = "maternal_risk_rf_pso_multi.joblib"
+SCALER_FILE = "maternal_risk_scaler_multi.joblib"
+META_FILE = "maternal_risk_meta_multi.json"
+
+
+def fit(data, workers=None, fitness_cache=None, fidelity=None, compare_exhaustive=False,
+        checkpoint=None, checkpoint_every=1, resume=False, n_jobs=-1):
+    """PSO search + final fit on a TrainingData -> (best_model, scaler, meta)."""
+    X_raw, y_raw, label_mapping = data.X, data.y, data.label_mapping
 
     scaler = StandardScaler()
     X = scaler.fit_transform(X_raw)
 
-    print(f"Loaded {len(df)} samples from {DATA_DIR}")
     print("Running PSO hyperparameter search over RF model...")
-    best_params, best_score = run_pso(X, y_raw, n_particles=14, n_iters=25)
+    cache = FitnessCache(fitness_cache, FitnessCache.data_fingerprint(X, y_raw))
+    n_particles, n_iters = 14, 25
+    pool = make_pool(X, y_raw, workers=workers)
+    try:
+        totals = {}
+        best_params, best_score = run_pso(
+            X, y_raw, n_particles=n_particles, n_iters=n_iters, pool=pool, cache=cache,
+            fidelity=fidelity, totals=totals, checkpoint=checkpoint,
+            checkpoint_every=checkpoint_every, resume=resume,
+        )
+        print(cache.summary())
+        print_search_totals(totals, n_particles, n_iters)
+
+        if fidelity and compare_exhaustive:
+            print("Running exhaustive full-CV search for comparison...")
+            full_totals = {}
+            _, full_score = run_pso(
+                X, y_raw, n_particles=n_particles, n_iters=n_iters, pool=pool,
+                cache=FitnessCache(), totals=full_totals,
+            )
+            print_search_totals(full_totals, n_particles, n_iters)
+            saved = full_totals["wall_seconds"] - totals["wall_seconds"]
+            print(f"Multi-fidelity best macro F1 {best_score:.4f} vs exhaustive {full_score:.4f} "
+                  f"({best_score - full_score:+.4f}); wall-clock saved {saved:.1f}s "
+                  f"({saved / full_totals['wall_seconds']:.0%})")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
     print("Best hyperparameters (float vector):", best_params)
     print(f"Best cross-validated macro F1: {best_score:.4f}")
 
-    best_model = make_model_from_params(best_params)
+    best_model = make_model_from_params(best_params, n_jobs=n_jobs)
     best_model.fit(X, y_raw)
 
-    model_path = os.path.join(MODELS_DIR, "maternal_risk_rf_pso_multi.joblib")
-    scaler_path = os.path.join(MODELS_DIR, "maternal_risk_scaler_multi.joblib")
-    meta_path = os.path.join(MODELS_DIR, "maternal_risk_meta_multi.json")
+    meta = {
+        "features": FEATURE_COLS,
+        "label_mapping": label_mapping,
+        "best_params": best_params.tolist(),
+        "best_macro_f1": best_score,
+        "n_samples": int(len(y_raw)),
+    }
+    return best_model, scaler, meta
+
+
+def save(out_dir, best_model, scaler, meta, files=(MODEL_FILE, SCALER_FILE, META_FILE)):
+    model_path, scaler_path, meta_path = (os.path.join(out_dir, name) for name in files)
+    # NumPy export / distilled student / lattice of the old models
+    model_registry.remove_derived(out_dir)
 
     joblib.dump(best_model, model_path)
     joblib.dump(scaler, scaler_path)
     with open(meta_path, "w") as f:
-        json.dump(
-            {
-                "features": FEATURE_COLS,
-                "label_mapping": label_mapping,
-                "best_params": best_params.tolist(),
-                "best_macro_f1": best_score,
-                "n_samples": int(len(df)),
-            },
-            f,
-            indent=2,
-        )
+        json.dump(meta, f, indent=2)
 
     print(f"Saved NEW model to {model_path}")
     print(f"Saved NEW scaler to {scaler_path}")
     print(f"Saved NEW metadata to {meta_path}")
 
 
+def main():
+    parser = argparse.ArgumentParser(description="PSO-tuned RandomForest on data_multi/")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="processes for the particle x fold fits (1 = serial)")
+    parser.add_argument("--fitness-cache", default=None,
+                        help="JSON file to persist fitness values across runs")
+    parser.add_argument("--multi-fidelity", action="store_true",
+                        help="screen particles by OOB score before full CV")
+    parser.add_argument("--screen-trees", type=int, default=50,
+                        help="trees per screening forest (multi-fidelity)")
+    parser.add_argument("--eta", type=float, default=3.0,
+                        help="promote the best 1/eta of the swarm to full CV (multi-fidelity)")
+    parser.add_argument("--compare-exhaustive", action="store_true",
+                        help="also run the full-CV search and compare (multi-fidelity)")
+    parser.add_argument("--checkpoint", default=os.path.join(MODELS_DIR, "pso_checkpoint.npz"),
+                        help="swarm state file, rewritten during the search and removed "
+                             "once the model is saved")
+    parser.add_argument("--checkpoint-every", type=int, default=1,
+                        help="iterations between checkpoints")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue from --checkpoint instead of starting over")
+    args = parser.parse_args()
+
+    data = load_training_data()
+    print(f"Loaded {len(data.y)} samples from {DATA_DIR}")
+
+    fidelity = (
+        {"screen_trees": args.screen_trees, "eta": args.eta} if args.multi_fidelity else None
+    )
+    model, scaler, meta = fit(
+        data, workers=args.workers, fitness_cache=args.fitness_cache, fidelity=fidelity,
+        compare_exhaustive=args.compare_exhaustive, checkpoint=args.checkpoint,
+        checkpoint_every=args.checkpoint_every, resume=args.resume,
+    )
+    save(MODELS_DIR, model, scaler, meta)
+    # Only needed to resume an interrupted search
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+
 if __name__ == "__main__":
     main()
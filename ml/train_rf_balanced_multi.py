@@ -1,7 +1,7 @@
 """
 Train a balanced RandomForest model on maternal risk datasets.
 
-- Uses all CSVs in ml/data_multi/ with columns:
+- Uses all CSVs in ml/data_multi/ (via the training_data.py cache) with columns:
     Age, SystolicBP, DiastolicBP, BS, BodyTemp, HeartRate, RiskLevel
 - Balances classes using SMOTE.
 - Adds simple engineered features: MAP, PulsePressure.
@@ -13,11 +13,9 @@ Train a balanced RandomForest model on maternal risk datasets.
 """
 
 import os
-import glob
 import json
 
 import numpy as np
-import pandas as pd
 
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
@@ -26,88 +24,32 @@ from sklearn.metrics import classification_report, f1_score
 from imblearn.over_sampling import SMOTE
 import joblib
 
+import model_registry
+from training_data import DATA_DIR, load_training_data
+
 BASE_DIR = os.path.dirname(__file__)
-DATA_DIR = os.path.join(BASE_DIR, "data_multi")
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 
-os.makedirs(MODELS_DIR, exist_ok=True)
-
-EXPECTED_COLS = [
-    "Age",
-    "SystolicBP",
-    "DiastolicBP",
-    "BS",
-    "BodyTemp",
-    "HeartRate",
-    "RiskLevel",
-]
-
-
-def load_all_data():
-    csv_files = glob.glob(os.path.join(DATA_DIR, "*.csv"))
-    if not csv_files:
-        raise FileNotFoundError(
-            f"No CSV files found in {DATA_DIR}. Put your datasets there."
-        )
-
-    dfs = []
-    for path in csv_files:
-        df = pd.read_csv(path)
-        missing = set(EXPECTED_COLS) - set(df.columns)
-        if missing:
-            print(
-                f"[WARN] {os.path.basename(path)} is missing columns: {missing}. Skipping."
-            )
-            continue
-        dfs.append(df[EXPECTED_COLS].copy())
-
-    if not dfs:
-        raise ValueError("No valid CSVs with required columns were found.")
-
-    data = pd.concat(dfs, ignore_index=True)
-    return data
+MODEL_FILE = "maternal_risk_rf_pso_multi.joblib"
+SCALER_FILE = "maternal_risk_scaler_multi.joblib"
+META_FILE = "maternal_risk_meta_multi.json"
 
 
-def main():
-    print(f"[INFO] Loading data from {DATA_DIR} ...")
-    data = load_all_data()
-    print(f"[INFO] Combined dataset shape: {data.shape}")
-
-    # Drop rows with any missing values in features/label
-    data = data.dropna(subset=EXPECTED_COLS)
-    print(f"[INFO] After dropping NaNs: {data.shape}")
-
-    # Map RiskLevel to integers
-    risk_mapping = {
-        "low risk": 0,
-        "mid risk": 1,
-        "high risk": 2,
-        "low": 0,
-        "medium": 1,
-        "mid": 1,
-        "normal": 0,
-        "high": 2,
-    }
-
-    def map_risk(x):
-        x = str(x).strip().lower()
-        return risk_mapping.get(x, None)
-
-    data["RiskInt"] = data["RiskLevel"].apply(map_risk)
-    data = data.dropna(subset=["RiskInt"])
-    data["RiskInt"] = data["RiskInt"].astype(int)
-
+def fit(data, n_jobs=-1):
+    """SMOTE + scaler + RF on a TrainingData -> (rf, scaler, meta)."""
     # Base feature columns
-    base_features = ["Age", "SystolicBP", "DiastolicBP", "BS", "BodyTemp", "HeartRate"]
+    base_features = data.feature_cols
+    sbp = data.X[:, base_features.index("SystolicBP")]
+    dbp = data.X[:, base_features.index("DiastolicBP")]
 
     # Simple feature engineering
-    data["MAP"] = (data["SystolicBP"] + 2 * data["DiastolicBP"]) / 3.0
-    data["PulsePressure"] = data["SystolicBP"] - data["DiastolicBP"]
+    map_val = (sbp + 2 * dbp) / 3.0
+    pulse_pressure = sbp - dbp
 
     feature_cols = base_features + ["MAP", "PulsePressure"]
 
-    X = data[feature_cols].values.astype(float)
-    y = data["RiskInt"].values
+    X = np.column_stack([data.X, map_val, pulse_pressure])
+    y = data.y
 
     # Show class distribution before balancing
     unique, counts = np.unique(y, return_counts=True)
@@ -143,7 +85,7 @@ def main():
         min_samples_leaf=2,
         class_weight="balanced_subsample",
         random_state=42,
-        n_jobs=-1,
+        n_jobs=n_jobs,
     )
 
     print("[INFO] Training RandomForest...")
@@ -156,26 +98,23 @@ def main():
     print("[INFO] Classification report:\n")
     print(classification_report(y_val, y_pred))
 
-    # Save model, scaler, and metadata using the SAME filenames predict.py expects
-    model_path = os.path.join(MODELS_DIR, "maternal_risk_rf_pso_multi.joblib")
-    scaler_path = os.path.join(MODELS_DIR, "maternal_risk_scaler_multi.joblib")
-    meta_path = os.path.join(MODELS_DIR, "maternal_risk_meta_multi.json")
-
-    joblib.dump(rf, model_path)
-    joblib.dump(scaler, scaler_path)
-
     # Label mapping: name -> int (so predict.py can invert it)
-    label_mapping = {
-        "low risk": 0,
-        "mid risk": 1,
-        "high risk": 2,
-    }
-
     meta = {
         "features": feature_cols,
-        "label_mapping": label_mapping,
+        "label_mapping": data.label_mapping,
+        "val_macro_f1": float(f1),
     }
+    return rf, scaler, meta
+
+
+def save(out_dir, rf, scaler, meta, files=(MODEL_FILE, SCALER_FILE, META_FILE)):
+    """Write model, scaler and metadata using the SAME filenames predict.py expects."""
+    model_path, scaler_path, meta_path = (os.path.join(out_dir, name) for name in files)
+    # NumPy export / distilled student / lattice of the old models
+    model_registry.remove_derived(out_dir)
 
+    joblib.dump(rf, model_path)
+    joblib.dump(scaler, scaler_path)
     with open(meta_path, "w") as f:
         json.dump(meta, f, indent=2)
 
@@ -184,5 +123,14 @@ def main():
     print(f"[INFO] Saved meta to {meta_path}")
 
 
+def main():
+    print(f"[INFO] Loading data from {DATA_DIR} ...")
+    data = load_training_data()
+    print(f"[INFO] Dataset shape: {data.X.shape}")
+
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    save(MODELS_DIR, *fit(data))
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,212 @@
+"""
+Shared training-data loader for the RF / PSO-RF / logistic trainers.
+
+Parsing every CSV in data_multi/ on each run is replaced by a columnar
+cache: the cleaned, cross-source deduplicated (see dedup.py) feature
+matrix, label vector and per-row source index are stored as .npy files
+under data_cache/<key>/, where key is a sha256
+over the source files' names and contents plus PREPROCESSING_SPEC. The
+cache is rebuilt only when an input file or the spec changes; otherwise
+loading is a few np.load calls.
+
+    from training_data import load_training_data
+    data = load_training_data()
+    data.X, data.y, data.feature_cols, data.label_mapping
+"""
+
+from collections import namedtuple
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from dedup import DedupIndex, row_hashes
+from inference import save_arrays
+from prepare_datasets import CHUNK_ROWS, RISK_LEVELS, RISK_MAP, map_labels
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data_multi")
+CACHE_DIR = os.environ.get("TRAINING_CACHE_DIR", os.path.join(BASE_DIR, "data_cache"))
+
+FEATURE_COLS = ["Age", "SystolicBP", "DiastolicBP", "BS", "BodyTemp", "HeartRate"]
+TARGET_COL = "RiskLevel"
+
+# Everything that shapes the cached arrays; bump "version" when the build
+# logic itself changes.
+PREPROCESSING_SPEC = {
+    "version": 1,
+    "features": FEATURE_COLS,
+    "target": TARGET_COL,
+    "dtype": "float64",
+    "label_map": dict(
+        RISK_MAP,
+        **{
+            "low_risk": "low risk",
+            "normal": "low risk",
+            "mid_risk": "mid risk",
+            "high_risk": "high risk",
+        },
+    ),
+    "label_mapping": {level: i for i, level in enumerate(RISK_LEVELS)},
+    # "cross_source": drop rows an earlier source (sorted file order) already
+    # had - the cleaned UCI and Kaggle files are copies of one dataset.
+    # "none": keep every row.
+    "dedup": "cross_source",
+}
+
+META_FILE = "meta.json"
+
+TrainingData = namedtuple(
+    "TrainingData", ["X", "y", "source", "feature_cols", "label_mapping", "meta"]
+)
+
+
+def source_files(data_dir=DATA_DIR):
+    # Sorted so the row order (and the cache key) don't depend on the filesystem
+    return sorted(glob.glob(os.path.join(data_dir, "*.csv")))
+
+
+def cache_key(files, spec=PREPROCESSING_SPEC):
+    h = hashlib.sha256(json.dumps(spec, sort_keys=True).encode())
+    for path in files:
+        h.update(os.path.basename(path).encode() + b"\0")
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def build_arrays(files, spec=PREPROCESSING_SPEC, chunk_rows=CHUNK_ROWS):
+    """
+    Parse + clean the CSVs in chunks -> (arrays dict, per-source info list,
+    dedup report or None).
+    """
+    features, target = spec["features"], spec["target"]
+    dtypes = dict({c: spec["dtype"] for c in features}, **{target: "category"})
+    index = DedupIndex([os.path.basename(p) for p in files]) if spec["dedup"] != "none" else None
+
+    xs, ys, srcs, sources = [], [], [], []
+    for i, path in enumerate(files):
+        name = os.path.basename(path)
+        header = pd.read_csv(path, nrows=0).columns
+        missing = set(features + [target]) - set(header)
+        if missing:
+            print(f"[WARN] {name} is missing columns: {missing}. Skipping.")
+            sources.append({"file": name, "rows": 0, "skipped": True})
+            continue
+
+        if index is not None:
+            index.begin_source(name)
+        rows = 0
+        unmapped = set()
+        for df in pd.read_csv(path, usecols=features + [target], dtype=dtypes, chunksize=chunk_rows):
+            df = df.dropna(subset=features + [target])
+            labels, chunk_unmapped = map_labels(df[target], spec["label_map"])
+            unmapped |= chunk_unmapped
+            keep = labels.codes >= 0
+
+            X = df[features].to_numpy(dtype=spec["dtype"])[keep]
+            y = labels.codes[keep].astype(np.int64)
+            if index is not None:
+                new = index.keep_mask(row_hashes(X, y))
+                X, y = X[new], y[new]
+
+            xs.append(X)
+            ys.append(y)
+            srcs.append(np.full(len(y), i, dtype=np.int16))
+            rows += len(y)
+        if index is not None:
+            index.end_source()
+        if unmapped:
+            print(f"[WARN] {name}: dropping rows with unknown risk labels {sorted(unmapped)}")
+        sources.append({"file": name, "rows": rows, "skipped": False})
+
+    if not xs:
+        raise ValueError("No valid CSVs with required columns were found.")
+
+    arrays = {
+        "X": np.concatenate(xs),
+        "y": np.concatenate(ys),
+        "source": np.concatenate(srcs),
+    }
+    return arrays, sources, index.report() if index is not None else None
+
+
+def print_dedup_report(report):
+    print(f"[INFO] Dedup: {report['rows_in']} rows in, {report['distinct_rows']} distinct, "
+          f"{report['cross_source_duplicates']} cross-source duplicates dropped")
+    for info in report["sources"]:
+        print(f"  {info['file']}: {info['rows_in']} rows, "
+              f"{info['cross_source_duplicates']} already in an earlier source, "
+              f"{info['within_source_duplicates']} repeated within the file (kept)")
+    for pair, n in report["overlap"].items():
+        print(f"  overlap {pair}: {n} distinct rows")
+
+
+def load_training_data(data_dir=DATA_DIR, cache_dir=CACHE_DIR, rebuild=False):
+    files = source_files(data_dir)
+    if not files:
+        raise FileNotFoundError(f"No CSV files found in {data_dir}. Put your datasets there.")
+
+    key = cache_key(files)
+    path = os.path.join(cache_dir, key)
+    if rebuild or not os.path.exists(os.path.join(path, META_FILE)):
+        t0 = time.perf_counter()
+        arrays, sources, dedup_report = build_arrays(files)
+        meta = {
+            "key": key,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "spec": PREPROCESSING_SPEC,
+            "sources": sources,
+            "dedup": dedup_report,
+            "n_samples": int(len(arrays["y"])),
+        }
+        os.makedirs(cache_dir, exist_ok=True)
+        save_arrays(path, arrays)
+        with open(os.path.join(path, META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+        prune(cache_dir, keep=key)
+        print(f"[INFO] Built training-data cache {key[:12]} "
+              f"({meta['n_samples']} rows) in {time.perf_counter() - t0:.2f}s")
+        if dedup_report:
+            print_dedup_report(dedup_report)
+
+    t0 = time.perf_counter()
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+    arrays = {name: np.load(os.path.join(path, name + ".npy")) for name in ("X", "y", "source")}
+    print(f"[INFO] Loaded {meta['n_samples']} training rows from cache {key[:12]} "
+          f"in {(time.perf_counter() - t0) * 1000:.1f}ms")
+
+    return TrainingData(
+        arrays["X"],
+        arrays["y"],
+        arrays["source"],
+        list(meta["spec"]["features"]),
+        dict(meta["spec"]["label_mapping"]),
+        meta,
+    )
+
+
+def prune(cache_dir=CACHE_DIR, keep=None):
+    """Drop cache entries other than `keep` (stale inputs / spec)."""
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name != keep and os.path.isdir(path) and not name.startswith("."):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    # python training_data.py [--rebuild]   (prints the dedup / overlap report)
+    data = load_training_data(rebuild="--rebuild" in sys.argv[1:])
+    for info in data.meta["sources"]:
+        print(f"  {info['file']}: {info['rows']} rows")
+    if data.meta.get("dedup"):
+        print_dedup_report(data.meta["dedup"])